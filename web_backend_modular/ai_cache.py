@@ -0,0 +1,139 @@
+"""
+Content-addressed cache for AI completions.
+
+Oral exam evaluations and hints send the same prompts over and over: the
+same question with the same correct answer, and transcripts that differ
+only in case, punctuation or spacing. Each completion is stored under
+sha256(feature, model, normalized inputs), so any later request with the
+same inputs is answered from the cache without tokens or latency.
+
+Entries live in one `ai_cache` table: in the app database when it is SQL,
+in a local SQLite file otherwise (any SQLAlchemy engine works). They expire
+after `ttl` seconds, and every `prune_every` writes the table is cut back to
+`max_entries` rows, least recently used first. Hits, misses and the tokens
+the hits saved are counted per process (see stats()).
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+metadata = MetaData()
+
+ai_cache_table = Table(
+    'ai_cache', metadata,
+    Column('key', String(64), primary_key=True),
+    Column('feature', String(50), nullable=False),
+    Column('model', String(50), nullable=False),
+    Column('content', Text, nullable=False),
+    Column('tokens', Integer, nullable=False, default=0),  # tokens the completion cost (saved by each hit)
+    Column('created_at', Float, nullable=False),
+    Column('expires_at', Float, nullable=False),
+    Column('last_used_at', Float, nullable=False, index=True),
+    Column('hits', Integer, nullable=False, default=0)
+)
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_input(text: Any) -> str:
+    """Case, punctuation and spacing do not change an AI answer: 'Ohmův  zákon!' == 'ohmův zákon'"""
+    text = unicodedata.normalize('NFC', str(text or '')).casefold()
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+def cache_key(feature: str, model: str, inputs: Iterable[Any]) -> str:
+    material = json.dumps([feature, model, [normalize_input(value) for value in inputs]], ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AICache:
+    """Completions by content hash; `engine` is an SQLAlchemy engine or a callable returning one."""
+
+    def __init__(self, engine: Union[Engine, Callable[[], Engine]], ttl: float = 30 * 86400,
+                 max_entries: int = 10000, prune_every: int = 100, clock: Callable[[], float] = time.time):
+        self._engine = engine
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.clock = clock
+        self._created = set()  # engines the table is known to exist in
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def engine(self) -> Engine:
+        engine = self._engine() if callable(self._engine) else self._engine
+        if id(engine) not in self._created:
+            ai_cache_table.create(engine, checkfirst=True)
+            self._created.add(id(engine))
+        return engine
+
+    def get(self, feature: str, model: str, inputs: Iterable[Any]) -> Optional[Tuple[str, int]]:
+        """(content, tokens) of a live entry, or None."""
+        key, now = cache_key(feature, model, inputs), self.clock()
+        with self.engine().begin() as conn:
+            row = conn.execute(select(ai_cache_table.c.content, ai_cache_table.c.tokens)
+                               .where(ai_cache_table.c.key == key, ai_cache_table.c.expires_at > now)).first()
+            if row is not None:
+                conn.execute(update(ai_cache_table).where(ai_cache_table.c.key == key)
+                             .values(hits=ai_cache_table.c.hits + 1, last_used_at=now))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tokens_saved += row.tokens
+        return row.content, row.tokens
+
+    def put(self, feature: str, model: str, inputs: Iterable[Any], content: str, tokens: int = 0):
+        key, now = cache_key(feature, model, inputs), self.clock()
+        values = dict(key=key, feature=feature, model=model, content=content, tokens=int(tokens or 0),
+                      created_at=now, expires_at=now + self.ttl, last_used_at=now, hits=0)
+        engine = self.engine()
+        try:
+            with engine.begin() as conn:
+                conn.execute(delete(ai_cache_table).where(ai_cache_table.c.key == key))
+                conn.execute(insert(ai_cache_table).values(**values))
+        except IntegrityError:
+            pass  # another worker stored the same completion at the same moment
+        with self._lock:
+            self._writes += 1
+            prune = self.prune_every and self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired entries, then the least recently used ones beyond `max_entries`."""
+        now = self.clock()
+        with self.engine().begin() as conn:
+            removed = conn.execute(delete(ai_cache_table).where(ai_cache_table.c.expires_at <= now)).rowcount
+            excess = conn.execute(select(func.count()).select_from(ai_cache_table)).scalar() - self.max_entries
+            if excess > 0:
+                oldest = select(ai_cache_table.c.key).order_by(ai_cache_table.c.last_used_at).limit(excess)
+                removed += conn.execute(delete(ai_cache_table)
+                                        .where(ai_cache_table.c.key.in_(oldest))).rowcount
+        return removed
+
+    def clear(self):
+        with self.engine().begin() as conn:
+            conn.execute(delete(ai_cache_table))
+        with self._lock:
+            self.hits = self.misses = self.tokens_saved = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'tokens_saved': self.tokens_saved,
+                    'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0}
@@ -0,0 +1,181 @@
+"""
+HTTP client for the Monica AI chat completions API.
+
+MonicaAIService.chat was declared `async` but called a blocking
+requests.post(timeout=30) on a fresh connection, and its callers used the
+un-awaited coroutine as a dict, so the AI path never worked. AIClient is
+the replacement:
+
+  - one httpx.AsyncClient per process with a keep-alive connection pool
+    (`max_connections`), so requests skip the TCP/TLS handshake;
+  - a semaphore capping requests in flight (`max_concurrency`); a request
+    that cannot get a slot within `queue_timeout` fails fast with
+    AIClientSaturated instead of queueing behind a slow provider;
+  - a deadline per request (`timeout`, default MONICA_TIMEOUT) covering the
+    wait for a slot and the whole HTTP exchange.
+
+Flask handlers call chat(), the sync facade: the request runs on the
+client's own event loop thread and the handler waits at most the deadline,
+never the old 30 s. Async code can await achat() directly, but a client
+serves a single event loop: code running its own loop needs its own client.
+The loop thread and the pool are created lazily and again after a fork,
+so a client made before gunicorn forks its workers is safe to use.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import httpx
+except ImportError:  # AI features are disabled without httpx
+    httpx = None
+
+
+class AIError(Exception):
+    """A completion request failed; `kind` is timeout, http, transport, response or disabled."""
+
+    def __init__(self, message: str, kind: str = 'transport', status_code: Optional[int] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status_code = status_code
+
+
+class AIClientSaturated(AIError):
+    """All `max_concurrency` slots stayed busy for `queue_timeout` seconds."""
+
+    def __init__(self):
+        super().__init__("AI client is saturated", kind='saturated')
+
+
+class AIClient:
+    """Pooled, concurrency-limited chat completions client (async core, sync facade)."""
+
+    def __init__(self, url: str, api_key: str, timeout: float = 10.0, max_concurrency: int = 8,
+                 max_connections: int = 16, queue_timeout: float = 1.0, transport=None):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_connections = max(self.max_concurrency, max_connections)
+        self.queue_timeout = queue_timeout
+        self.transport = transport  # httpx transport override (tests)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters = {'requests': 0, 'ok': 0, 'errors': 0, 'timeouts': 0, 'rejected': 0}
+
+    @property
+    def available(self) -> bool:
+        return httpx is not None
+
+    # -- async core ------------------------------------------------------------
+
+    async def achat(self, messages: Union[str, List[Dict[str, str]]], model: str = "gpt-3.5-turbo",
+                    max_tokens: int = 1000, temperature: float = 0.7, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Completion JSON for `messages`; raises AIError (AIClientSaturated when no slot frees up in time)."""
+        if httpx is None:
+            raise AIError("httpx is not installed", kind='disabled')
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        http, slots = self._http_client(), self._slots
+        self.counters['requests'] += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), max(0.0, min(self.queue_timeout, deadline - time.monotonic())))
+        except asyncio.TimeoutError:
+            self.counters['rejected'] += 1
+            raise AIClientSaturated()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            payload = {
+                "model": model,
+                "messages": messages if isinstance(messages, list) else [{"role": "user", "content": messages}],
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            response = await asyncio.wait_for(http.post(self.url, json=payload, timeout=remaining), remaining)
+            if response.status_code >= 400:
+                raise AIError(f"Monica AI returned HTTP {response.status_code}", kind='http',
+                              status_code=response.status_code)
+            try:
+                data = response.json()
+            except ValueError:
+                raise AIError("Monica AI returned a non-JSON body", kind='response')
+            self.counters['ok'] += 1
+            return data
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self.counters['timeouts'] += 1
+            raise AIError("Monica AI request timed out", kind='timeout')
+        except httpx.HTTPError as e:
+            self.counters['errors'] += 1
+            raise AIError(f"Monica AI request failed: {e}", kind='transport')
+        except AIError:
+            self.counters['errors'] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            slots.release()
+
+    def _http_client(self):
+        if self._http is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._http = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections, keepalive_expiry=30.0),
+                transport=self.transport or httpx.AsyncHTTPTransport(retries=1)  # retries failed connects only
+            )
+        return self._http
+
+    # -- sync facade -----------------------------------------------------------
+
+    def submit(self, messages, timeout: Optional[float] = None, **kwargs) -> Future:
+        """Start achat() on the client's loop thread; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self.achat(messages, timeout=timeout, **kwargs), self._ensure_loop())
+
+    def chat(self, messages, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        """Blocking achat() for Flask handlers; waits at most the request deadline."""
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(messages, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout + 1.0)  # achat enforces the deadline itself; this is a backstop
+        except FutureTimeoutError:
+            future.cancel()
+            raise AIError("Monica AI request timed out", kind='timeout')
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                # First use in this process (a loop inherited across fork has no thread running it)
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='ai-client', daemon=True).start()
+                self._loop, self._pid, self._http, self._slots = loop, os.getpid(), None, None
+                self.in_flight = 0
+            return self._loop
+
+    def close(self):
+        with self._lock:
+            loop, http = self._loop, self._http
+            self._loop, self._http, self._slots = None, None, None
+        if loop is None or self._pid != os.getpid():
+            return
+        if http is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(http.aclose(), loop).result(5)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    def stats(self) -> Dict[str, int]:
+        return {'in_flight': self.in_flight, 'peak_in_flight': self.peak_in_flight,
+                'max_concurrency': self.max_concurrency, **self.counters}
@@ -110,49 +110,7 @@ def submit_battle_result():
         'new_rating': User.query.get(user_id).battle_rating
     })
 
-@app.route('/api/battle/leaderboard', methods=['GET'])
-@login_required
-def battle_leaderboard():
-    """Get battle leaderboard"""
-    period = request.args.get('period', 'all')  # all, week, month
-    
-    query = User.query.filter(User.battle_rating > 1000)
-    
-    if period == 'week':
-        # Filter by battles in last week - simplified for demo
-        query = query.order_by(User.battle_wins.desc())
-    elif period == 'month':
-        # Filter by battles in last month - simplified for demo
-        query = query.order_by(User.battle_wins.desc())
-    else:
-        query = query.order_by(User.battle_rating.desc())
-    
-    users = query.limit(50).all()
-    current_user_rank = None
-    
-    # Find current user rank
-    for idx, user in enumerate(users):
-        if user.id == request.current_user['user_id']:
-            current_user_rank = idx + 1
-            break
-    
-    leaderboard = []
-    for idx, user in enumerate(users):
-        leaderboard.append({
-            'rank': idx + 1,
-            'username': user.username,
-            'avatar': user.avatar,
-            'rating': user.battle_rating,
-            'wins': user.battle_wins,
-            'losses': user.battle_losses,
-            'win_rate': round((user.battle_wins / max(user.battle_wins + user.battle_losses, 1)) * 100, 1)
-        })
-    
-    return jsonify({
-        'leaderboard': leaderboard,
-        'current_user_rank': current_user_rank,
-        'total_players': len(users)
-    })
+# GET /api/battle/leaderboard lives in app.py (served from the materialized boards, see leaderboard.py)
 
 def calculate_rating_change(user_rating, opponent_rating, k_factor=32):
     """Calculate Elo rating change"""
@@ -173,8 +131,9 @@ def start_oral_exam():
     if not data or 'table_name' not in data:
         return jsonify({'error': 'Missing table_name'}), 400
     
-    # Get random question
-    question = Question.query.filter_by(table_name=data['table_name']).order_by(db.func.random()).first()
+    # Get random question (drawn from the cached id array, see question_sampler.py)
+    sampled = sample_questions(data['table_name'], 1)
+    question = sampled[0] if sampled else None
     
     if not question:
         return jsonify({'error': 'No questions found'}), 404
@@ -192,112 +151,8 @@ def start_oral_exam():
         'instructions': 'Odpovězte na otázku mluvením do mikrofonu. Máte 2 minuty na odpověď.'
     })
 
-@app.route('/api/oral-exam/submit-audio', methods=['POST'])
-@login_required
-def submit_oral_audio():
-    """Submit audio for oral exam evaluation"""
-    data = request.get_json()
-    
-    if not data or not all(k in data for k in ('question_id', 'transcript')):
-        return jsonify({'error': 'Missing required fields'}), 400
-    
-    question = Question.query.get(data['question_id'])
-    if not question:
-        return jsonify({'error': 'Question not found'}), 404
-    
-    # Get correct answer text
-    correct_answer = [question.answer_a, question.answer_b, question.answer_c][question.correct_answer]
-    
-    # Evaluate using Monica AI if available
-    if MONICA_ENABLED:
-        try:
-            ai_response = monica_ai.evaluate_oral_answer(
-                question.question_text,
-                correct_answer,
-                data['transcript']
-            )
-            
-            if 'error' not in ai_response:
-                ai_evaluation = ai_response.get('choices', [{}])[0].get('message', {}).get('content', '{}')
-                try:
-                    evaluation_data = json.loads(ai_evaluation)
-                except json.JSONDecodeError:
-                    evaluation_data = {
-                        "score": 50,
-                        "feedback": "Nepodařilo se automaticky vyhodnotit odpověď",
-                        "pronunciation_score": 70,
-                        "grammar_score": 70,
-                        "content_score": 50
-                    }
-            else:
-                evaluation_data = {
-                    "score": 50,
-                    "feedback": "Monica AI není dostupná pro vyhodnocení",
-                    "pronunciation_score": 70,
-                    "grammar_score": 70,
-                    "content_score": 50
-                }
-        except Exception as e:
-            evaluation_data = {
-                "score": 50,
-                "feedback": f"Chyba při vyhodnocování: {str(e)}",
-                "pronunciation_score": 70,
-                "grammar_score": 70,
-                "content_score": 50
-            }
-    else:
-        # Simple keyword-based evaluation
-        transcript_lower = data['transcript'].lower()
-        correct_lower = correct_answer.lower()
-        
-        # Simple scoring based on keyword matching
-        keywords = correct_lower.split()
-        matches = sum(1 for word in keywords if word in transcript_lower)
-        score = min(100, (matches / len(keywords)) * 100) if keywords else 50
-        
-        evaluation_data = {
-            "score": int(score),
-            "feedback": f"Automatické vyhodnocení na základě klíčových slov. Skóre: {int(score)}/100",
-            "pronunciation_score": 75,
-            "grammar_score": 75,
-            "content_score": int(score)
-        }
-    
-    # Save oral exam result
-    oral_exam = OralExam(
-        user_id=request.current_user['user_id'],
-        question_id=data['question_id'],
-        audio_transcript=data['transcript'],
-        ai_evaluation=json.dumps(evaluation_data),
-        score=evaluation_data.get('score', 50),
-        feedback=evaluation_data.get('feedback', ''),
-        pronunciation_score=evaluation_data.get('pronunciation_score', 75),
-        grammar_score=evaluation_data.get('grammar_score', 75)
-    )
-    
-    db.session.add(oral_exam)
-    
-    # Track Monica usage if used
-    if MONICA_ENABLED:
-        monica_usage = MonicaUsage(
-            user_id=request.current_user['user_id'],
-            feature='oral_exam',
-            tokens_used=len(data['transcript']) // 4,  # Rough estimate
-            cost=0.002  # Approximate cost
-        )
-        db.session.add(monica_usage)
-    
-    db.session.commit()
-    
-    return jsonify({
-        'evaluation': evaluation_data,
-        'exam_id': data.get('exam_id'),
-        'question': {
-            'text': question.question_text,
-            'correct_answer': correct_answer,
-            'explanation': question.explanation
-        }
-    })
+# POST /api/oral-exam/submit-audio and GET /api/oral-exam/result/<job_id> live in app.py
+# (keyword score at once, AI evaluation through the job queue, see job_queue.py)
 
 @app.route('/api/oral-exam/history', methods=['GET'])
 @login_required
@@ -531,11 +386,11 @@ def admin_system_logs():
 def user_settings():
     """Get or update user settings"""
     user = User.query.get(request.current_user['user_id'])
-    
+
     if request.method == 'GET':
         settings = json.loads(user.settings) if user.settings else {}
         return jsonify({'settings': settings})
-    
+
     elif request.method == 'PUT':
         data = request.get_json()
         
@@ -590,186 +445,8 @@ def websocket_info():
 # API ROUTES - MONICA AI
 # ===============================================
 
-@app.route('/api/monica/evaluate', methods=['POST', 'OPTIONS'])
-def evaluate_answer_with_ai():
-    """Evaluate answer using Monica AI (no auth required for compatibility)"""
-    if request.method == 'OPTIONS':
-        response = jsonify({'status': 'ok'})
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-        return response
-    
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        # Extract required fields
-        question = data.get('question', '')
-        correct_answer = data.get('correctAnswer', '')  
-        user_answer = data.get('userAnswer', '')
-        
-        if not all([question, correct_answer, user_answer]):
-            return jsonify({'error': 'Missing required fields: question, correctAnswer, userAnswer'}), 400
-        
-        # Use Monica AI if available
-        if MONICA_ENABLED:
-            try:
-                ai_response = monica_ai.evaluate_oral_answer(question, correct_answer, user_answer)
-                
-                if 'error' not in ai_response and 'choices' in ai_response:
-                    ai_content = ai_response['choices'][0]['message']['content']
-                    
-                    try:
-                        # Parse AI response as JSON
-                        evaluation_data = json.loads(ai_content)
-                        
-                        # Ensure all required fields are present
-                        result = {
-                            'summary': evaluation_data.get('feedback', 'AI vyhodnocení odpovědi'),
-                            'score': evaluation_data.get('score', 50),
-                            'positives': evaluation_data.get('suggestions', [])[:3] if evaluation_data.get('correctness') == 'correct' else [],
-                            'negatives': evaluation_data.get('suggestions', [])[:3] if evaluation_data.get('correctness') != 'correct' else [],
-                            'recommendations': evaluation_data.get('suggestions', []),
-                            'grade': calculate_grade(evaluation_data.get('score', 50)),
-                            'scoreBreakdown': {
-                                'factual': evaluation_data.get('content_score', 50),
-                                'completeness': min(100, evaluation_data.get('score', 50) + 10),
-                                'clarity': evaluation_data.get('grammar_score', 75),
-                                'structure': evaluation_data.get('pronunciation_score', 75)
-                            },
-                            'method': 'ai-monica'
-                        }
-                        
-                        # Log successful AI usage
-                        if hasattr(request, 'current_user') and request.current_user:
-                            monica_usage = MonicaUsage(
-                                user_id=request.current_user['user_id'],
-                                feature='answer_evaluation',
-                                tokens_used=len(user_answer) // 4,
-                                cost=0.001
-                            )
-                            db.session.add(monica_usage)
-                            db.session.commit()
-                        
-                        return jsonify(result)
-                        
-                    except json.JSONDecodeError:
-                        # AI didn't return valid JSON, fall back to local evaluation
-                        print(f"AI returned non-JSON response: {ai_content}")
-                        pass
-                
-            except Exception as e:
-                print(f"Monica AI error: {str(e)}")
-                pass
-        
-        # Fallback to local evaluation
-        result = evaluate_answer_locally(question, correct_answer, user_answer)
-        return jsonify(result)
-        
-    except Exception as e:
-        print(f"Evaluation error: {str(e)}")
-        return jsonify({
-            'summary': 'Došlo k chybě při vyhodnocování',
-            'score': 50,
-            'positives': ['Odpověď byla zaznamenána'],
-            'negatives': ['Automatické vyhodnocení selhalo'],
-            'recommendations': ['Zkuste odpověď zformulovat jinak'],
-            'grade': 'C',
-            'method': 'error-fallback'
-        })
-
-def calculate_grade(score):
-    """Calculate letter grade from numeric score"""
-    if score >= 90: return 'A'
-    elif score >= 75: return 'B'
-    elif score >= 60: return 'C'
-    elif score >= 45: return 'D'
-    else: return 'F'
-
-def evaluate_answer_locally(question, correct_answer, user_answer):
-    """Local fallback evaluation when AI is not available"""
-    import re
-    
-    def normalize_text(text):
-        """Normalize text for comparison"""
-        if not text:
-            return ''
-        text = text.lower()
-        # Remove diacritics (simplified)
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ý': 'y',
-            'ě': 'e', 'š': 's', 'č': 'c', 'ř': 'r', 'ž': 'z', 'ů': 'u',
-            'ň': 'n', 'ť': 't', 'ď': 'd'
-        }
-        for czech, ascii_char in replacements.items():
-            text = text.replace(czech, ascii_char)
-        # Remove punctuation and normalize whitespace
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
-    
-    normalized_correct = normalize_text(correct_answer)
-    normalized_user = normalize_text(user_answer)
-    
-    # Calculate similarity
-    correct_words = set(normalized_correct.split())
-    user_words = set(normalized_user.split())
-    
-    if len(correct_words) == 0:
-        similarity = 0.5
-    else:
-        common_words = correct_words.intersection(user_words)
-        similarity = len(common_words) / len(correct_words)
-    
-    # Calculate score
-    base_score = int(similarity * 70)  # Max 70 points for word match
-    length_bonus = min(15, len(user_answer.split()) * 2)  # Up to 15 points for length
-    effort_bonus = 15 if len(user_answer.strip()) > 0 else 0  # 15 points for trying
-    
-    score = min(100, base_score + length_bonus + effort_bonus)
-    
-    # Generate feedback
-    positives = []
-    negatives = []
-    recommendations = []
-    
-    if similarity > 0.7:
-        positives.append('Odpověď obsahuje většinu klíčových pojmů')
-    elif similarity > 0.4:
-        positives.append('Odpověď obsahuje některé správné pojmy')
-    else:
-        negatives.append('Odpověď neobsahuje hlavní klíčové pojmy')
-    
-    if len(user_answer.split()) > 10:
-        positives.append('Podrobná a rozvinutá odpověď')
-    elif len(user_answer.split()) < 5:
-        negatives.append('Odpověď je příliš stručná')
-        recommendations.append('Pokuste se odpověď více rozvinout')
-    
-    if similarity < 0.5:
-        recommendations.append('Zaměřte se na klíčové pojmy ze správné odpovědi')
-        recommendations.append('Použijte více konkrétních termínů')
-    
-    if len(recommendations) == 0:
-        recommendations.append('Dobrá práce, pokračujte v učení')
-    
-    return {
-        'summary': f'Vaše odpověď obsahuje {len(user_words.intersection(correct_words))} z {len(correct_words)} klíčových pojmů.',
-        'score': score,
-        'positives': positives,
-        'negatives': negatives,
-        'recommendations': recommendations,
-        'grade': calculate_grade(score),
-        'scoreBreakdown': {
-            'factual': int(similarity * 100),
-            'completeness': min(100, base_score + length_bonus),
-            'clarity': max(50, min(100, len(user_answer.split()) * 8)),
-            'structure': 75
-        },
-        'method': 'local-evaluation'
-    }
+# POST /api/monica/evaluate (with calculate_grade and evaluate_answer_locally) lives in app.py,
+# behind the Monica circuit breaker and the optional hedge (see circuit_breaker.py)
 
 # Import additional modules if needed
 import random
@@ -5,30 +5,63 @@ Modular Quiz App - Backend API Server
 Optimized for Render.com with Monica AI integration
 """
 
-from flask import Flask, request, jsonify, send_from_directory, redirect, g
+from flask import Flask, Response, request, jsonify, send_from_directory, redirect, g, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from sqlalchemy import create_engine, event
 import os
 import jwt
-import hashlib
 import secrets
-import requests
 import json
+import random
 import asyncio
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
 # Import GitHubStorage with an absolute import so this file can be loaded
 # both as a package module and as a top-level module (e.g., gunicorn app:app)
 try:
-    from github_storage import GitHubStorage
+    from github_storage import GitHubConflictError, GitHubStorage, QUESTIONS_MANIFEST
+    from question_bank import normalize_correct_answer
+    from review_scheduler import Schedule, from_epoch, next_schedule, to_epoch
+    from question_sampler import QuestionIdSampler
+    from response_cache import ResponseCache
+    from password_hashing import HashingPool, HashingPoolSaturated, PasswordPolicy, parse_params
+    from auth_cache import TTLCache, TokenCache, UserContextCache
+    from shared_store import open_store
+    from matchmaking import Matchmaker
+    from battle_engine import BattleEngine, BattleQuestion
+    from leaderboard import Leaderboard
+    from ai_client import AIClient, AIClientSaturated, AIError
+    from ai_cache import AICache
+    from circuit_breaker import CircuitBreaker
+    from job_queue import DONE, FAILED, JobQueue, JobWorkers
+    from text_normalize import answer_tokens, common_words
 except ImportError:  # Fallback when Python path doesn't include this directory
     import sys, os
     sys.path.append(os.path.dirname(__file__))
-    from github_storage import GitHubStorage
+    from github_storage import GitHubConflictError, GitHubStorage, QUESTIONS_MANIFEST
+    from question_bank import normalize_correct_answer
+    from review_scheduler import Schedule, from_epoch, next_schedule, to_epoch
+    from question_sampler import QuestionIdSampler
+    from response_cache import ResponseCache
+    from password_hashing import HashingPool, HashingPoolSaturated, PasswordPolicy, parse_params
+    from auth_cache import TTLCache, TokenCache, UserContextCache
+    from shared_store import open_store
+    from matchmaking import Matchmaker
+    from battle_engine import BattleEngine, BattleQuestion
+    from leaderboard import Leaderboard
+    from ai_client import AIClient, AIClientSaturated, AIError
+    from ai_cache import AICache
+    from circuit_breaker import CircuitBreaker
+    from job_queue import DONE, FAILED, JobQueue, JobWorkers
+    from text_normalize import answer_tokens, common_words
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -58,18 +91,92 @@ migrate = Migrate(app, db)
 cors_origins = os.environ.get('CORS_ORIGINS', '*').split(',')
 CORS(app, origins=cors_origins, supports_credentials=True)
 
+# Store shared by all workers for rate limits and caches (see shared_store.py):
+# memory:// (per process) | sqlite:////dev/shm/quiz_store.db (one host) | redis://host:6379/0
+SHARED_STORE_URI = os.environ.get('SHARED_STORE_URI', 'memory://')
+SHARED_STORE_PREFIX = os.environ.get('SHARED_STORE_PREFIX', 'quiz:')
+shared_store = None
+if not SHARED_STORE_URI.startswith('memory://'):
+    try:
+        shared_store = open_store(SHARED_STORE_URI, SHARED_STORE_PREFIX)
+    except Exception as e:
+        print(f"⚠️ Shared store unavailable ({e}); rate limits and caches stay per worker")
+
 # Rate limiting
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["1000 per day", "100 per hour"],
-    storage_uri="memory://"
+    storage_uri="shared://" if shared_store else "memory://",
+    storage_options={'store': shared_store} if shared_store else {}
 )
 limiter.init_app(app)
 
+# Password hashing pool (see password_hashing.py): threads hashing at once, jobs allowed to wait
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', '16'))
+# Algorithm and cost of new hashes (pbkdf2_sha256 | scrypt | argon2id); older hashes are upgraded on login
+PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2_sha256')
+PASSWORD_HASH_PARAMS = os.environ.get('PASSWORD_HASH_PARAMS', '')  # e.g. "i=600000" or "n=16384,r=8,p=1"
+
+# Serialized responses of /api/quiz/tables and /api/quiz/questions (see response_cache.py)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '512'))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Random question sampling (see question_sampler.py)
+QUESTION_ID_CACHE_TTL = float(os.environ.get('QUESTION_ID_CACHE_TTL', '60'))  # seconds a table's id array is reused
+
+# Verified JWT payloads and per-user context (see auth_cache.py); seconds entries are reused
+AUTH_TOKEN_CACHE_TTL = float(os.environ.get('AUTH_TOKEN_CACHE_TTL', '300'))
+USER_CONTEXT_CACHE_TTL = float(os.environ.get('USER_CONTEXT_CACHE_TTL', '30'))
+
+# Ranked matchmaking (see matchmaking.py): rating gap accepted at first, growth per second waited, cap
+MATCH_BASE_WINDOW = int(os.environ.get('MATCH_BASE_WINDOW', '50'))
+MATCH_WINDOW_GROWTH = float(os.environ.get('MATCH_WINDOW_GROWTH', '10'))
+MATCH_MAX_WINDOW = int(os.environ.get('MATCH_MAX_WINDOW', '400'))
+
+# Real-time battles (see battle_engine.py): WebSocket server started next to the app when BATTLE_WS_PORT is set
+BATTLE_WS_HOST = os.environ.get('BATTLE_WS_HOST', '0.0.0.0')
+BATTLE_WS_PORT = os.environ.get('BATTLE_WS_PORT')
+BATTLE_WS_URL = os.environ.get('WEBSOCKET_URL', f"ws://localhost:{BATTLE_WS_PORT or 8765}")  # advertised to clients
+BATTLE_QUESTIONS = int(os.environ.get('BATTLE_QUESTIONS', '10'))
+BATTLE_TIME_LIMIT = float(os.environ.get('BATTLE_TIME_LIMIT', '20'))  # seconds per question
+BATTLE_MAX_ROOMS = int(os.environ.get('BATTLE_MAX_ROOMS', '5000'))
+
+# Battle leaderboard: seconds before a worker rebuilds its boards (picks up battles saved by other workers)
+LEADERBOARD_REFRESH = float(os.environ.get('LEADERBOARD_REFRESH', '300'))
+
 # Monica AI configuration
-MONICA_API_URL = "https://openapi.monica.im/v1/chat/completions"
+MONICA_API_URL = os.environ.get('MONICA_API_URL', "https://openapi.monica.im/v1/chat/completions")
 MONICA_API_KEY = os.environ.get('MONICA_API_KEY', '')
 MONICA_ENABLED = bool(MONICA_API_KEY and MONICA_API_KEY != 'your-monica-api-key-here')
+# Per-request deadline (s), requests in flight per worker, pooled connections, seconds to wait for a free slot
+MONICA_TIMEOUT = float(os.environ.get('MONICA_TIMEOUT', '10'))
+MONICA_MAX_CONCURRENCY = int(os.environ.get('MONICA_MAX_CONCURRENCY', '8'))
+MONICA_MAX_CONNECTIONS = int(os.environ.get('MONICA_MAX_CONNECTIONS', '16'))
+MONICA_QUEUE_TIMEOUT = float(os.environ.get('MONICA_QUEUE_TIMEOUT', '1'))
+MONICA_COST_PER_1K_TOKENS = float(os.environ.get('MONICA_COST_PER_1K_TOKENS', '0.002'))
+# Cache of AI answers by content hash (see ai_cache.py), kept in the app database
+AI_CACHE_TTL = float(os.environ.get('AI_CACHE_TTL', str(30 * 86400)))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '10000'))
+# Circuit breaker (see circuit_breaker.py): error rate or p95 latency (s) over at least MIN_CALLS calls within
+# WINDOW seconds that opens it, seconds it stays open, calls let through to probe the provider before closing
+MONICA_BREAKER_ERROR_RATE = float(os.environ.get('MONICA_BREAKER_ERROR_RATE', '0.5'))
+MONICA_BREAKER_SLOW_SECONDS = float(os.environ.get('MONICA_BREAKER_SLOW_SECONDS', str(MONICA_TIMEOUT * 0.8)))
+MONICA_BREAKER_MIN_CALLS = int(os.environ.get('MONICA_BREAKER_MIN_CALLS', '10'))
+MONICA_BREAKER_WINDOW = float(os.environ.get('MONICA_BREAKER_WINDOW', '60'))
+MONICA_BREAKER_OPEN_SECONDS = float(os.environ.get('MONICA_BREAKER_OPEN_SECONDS', '30'))
+MONICA_BREAKER_PROBES = int(os.environ.get('MONICA_BREAKER_PROBES', '2'))
+# /api/monica/evaluate: seconds to wait for the AI before answering with the local score (0 = always wait),
+# and how long the upgraded result of such an answer can be fetched
+MONICA_HEDGE_BUDGET = float(os.environ.get('MONICA_HEDGE_BUDGET', '0'))
+MONICA_EVALUATION_TTL = float(os.environ.get('MONICA_EVALUATION_TTL', '3600'))
+
+# Oral exam AI evaluation jobs (see job_queue.py): worker threads per process (0 = only enqueue here),
+# queue database (default: the app database; e.g. sqlite:////var/tmp/quiz_jobs.db), days finished jobs are kept
+ORAL_EXAM_WORKERS = int(os.environ.get('ORAL_EXAM_WORKERS', '2'))
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL')
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', '7'))
+ORAL_EXAM_EVENTS_TIMEOUT = float(os.environ.get('ORAL_EXAM_EVENTS_TIMEOUT', '60'))  # max seconds of one SSE stream
 
 # JWT configuration
 JWT_SECRET = app.config['SECRET_KEY']
@@ -83,6 +190,13 @@ GH_OWNER = os.environ.get('GH_OWNER')
 GH_REPO = os.environ.get('GH_REPO')
 GH_BRANCH = os.environ.get('GH_BRANCH', 'main')
 GH_BASE_DIR = os.environ.get('GH_BASE_DIR', 'data')
+GH_CACHE_TTL = float(os.environ.get('GH_CACHE_TTL', '10'))  # seconds before a cached read is revalidated
+GH_CACHE_MAX_ENTRIES = int(os.environ.get('GH_CACHE_MAX_ENTRIES', '256'))
+GH_PROGRESS_WRITE_BEHIND = os.environ.get('GH_PROGRESS_WRITE_BEHIND', '1').lower() not in ('0', 'false', 'no')
+GH_PROGRESS_SPOOL_DIR = os.environ.get('GH_PROGRESS_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'quiz_progress_spool'))
+GH_PROGRESS_FLUSH_SIZE = int(os.environ.get('GH_PROGRESS_FLUSH_SIZE', '20'))  # pending answers per flush
+GH_PROGRESS_FLUSH_INTERVAL = float(os.environ.get('GH_PROGRESS_FLUSH_INTERVAL', '30'))  # max seconds buffered
+GH_PROGRESS_SEGMENT_SIZE = int(os.environ.get('GH_PROGRESS_SEGMENT_SIZE', '500'))  # entries per progress segment file
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin123')
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@quiz.app')
@@ -94,13 +208,51 @@ if STORAGE_BACKEND == 'github' and GH_TOKEN and GH_OWNER and GH_REPO:
         owner=GH_OWNER,
         repo=GH_REPO,
         branch=GH_BRANCH,
-        base_dir=GH_BASE_DIR
+        base_dir=GH_BASE_DIR,
+        cache_ttl=GH_CACHE_TTL,
+        cache_max_entries=GH_CACHE_MAX_ENTRIES,
+        progress_segment_size=GH_PROGRESS_SEGMENT_SIZE
     )
+    if GH_PROGRESS_WRITE_BEHIND:
+        try:
+            github_store.enable_write_behind(
+                GH_PROGRESS_SPOOL_DIR,
+                max_pending=GH_PROGRESS_FLUSH_SIZE,
+                max_age=GH_PROGRESS_FLUSH_INTERVAL
+            )
+        except OSError as e:
+            print(f"⚠️ Progress write-behind disabled (spool dir unusable): {e}")
     print("✅ GitHub storage enabled")
 else:
     if STORAGE_BACKEND == 'github':
         print("⚠️ GitHub storage requested but env vars are missing; falling back to SQL")
 
+password_pool = HashingPool(workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_QUEUE)
+try:
+    password_policy = PasswordPolicy(PASSWORD_HASH_ALGORITHM, parse_params(PASSWORD_HASH_PARAMS))
+except ValueError as e:
+    print(f"⚠️ {e}; falling back to pbkdf2_sha256")
+    password_policy = PasswordPolicy()
+
+def hash_new_password(password):
+    """(salt, password_hash) for a new password, computed on the hashing pool"""
+    return password_pool.run(password_policy.hash, password)
+
+def check_password(password, salt, password_hash):
+    """
+    Verify a password on the hashing pool (constant-time comparison).
+    Returns (ok, upgrade) where upgrade is a new (salt, password_hash) to store
+    when the stored hash predates the current policy.
+    """
+    return password_pool.run(password_policy.verify_and_update, password, password_hash, salt)
+
+@app.errorhandler(HashingPoolSaturated)
+def handle_hashing_saturated(e):
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 # Ensure default admin exists in GitHub storage (bootstrap)
 def ensure_admin_github():
     if not (STORAGE_BACKEND == 'github' and github_store):
@@ -109,11 +261,9 @@ def ensure_admin_github():
         idx = github_store.read_json('users/_index.json') or {"next_id": 1, "usernames": {}}
         if ADMIN_USERNAME in idx.get('usernames', {}):
             return  # already present
-        # Create admin user
-        new_id = int(idx.get('next_id', 1))
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', ADMIN_PASSWORD.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
-        admin_user = {
+        # Create admin user (user file and index in one commit)
+        salt, password_hash = hash_new_password(ADMIN_PASSWORD)
+        admin_user = github_store.create_user(ADMIN_USERNAME, lambda new_id: {
             'id': new_id,
             'username': ADMIN_USERNAME,
             'email': ADMIN_EMAIL,
@@ -127,15 +277,23 @@ def ensure_admin_github():
             'battle_wins': 0,
             'battle_losses': 0,
             'settings': {}
-        }
-        github_store.save_user(admin_user)
-        idx['usernames'][ADMIN_USERNAME] = new_id
-        idx['next_id'] = new_id + 1
-        github_store.write_json('users/_index.json', idx, message='Bootstrap admin user')
+        }, message='Bootstrap admin user')
+        if admin_user is None:
+            return  # created concurrently by another worker
         print("✅ Bootstrapped admin user in GitHub storage")
     except Exception as e:
         print(f"⚠️ Failed to ensure admin in GitHub storage: {e}")
 
+# One-time migration of the monolithic questions.json to per-table shards
+def ensure_question_shards_github():
+    if not (STORAGE_BACKEND == 'github' and github_store):
+        return
+    try:
+        if github_store.migrate_questions_to_shards():
+            print("✅ Migrated questions.json to per-table shards")
+    except Exception as e:
+        print(f"⚠️ Failed to migrate questions to shards: {e}")
+
 # ===============================================
 # DATABASE MODELS
 # ===============================================
@@ -166,6 +324,7 @@ class User(db.Model):
     quiz_progress = db.relationship('QuizProgress', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     battle_history = db.relationship('BattleResult', foreign_keys='BattleResult.user_id', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     oral_exams = db.relationship('OralExam', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    review_states = db.relationship('ReviewState', backref='user', lazy='dynamic', cascade='all, delete-orphan')
 
 class Question(db.Model):
     __tablename__ = 'questions'
@@ -186,8 +345,30 @@ class Question(db.Model):
     ai_hint = db.Column(db.Text)
     ai_explanation = db.Column(db.Text)
 
+class QuizTable(db.Model):
+    """Catalog of question tables with a materialized question count"""
+    __tablename__ = 'quiz_tables'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    display_name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    question_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class QuizCatalog(db.Model):
+    """Single row whose version is bumped on every catalog change (process cache key, ETag)"""
+    __tablename__ = 'quiz_catalog'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, default=1, nullable=False)
+
 class QuizProgress(db.Model):
     __tablename__ = 'quiz_progress'
+    __table_args__ = (
+        # Per-user progress lookups; max(id) per user is the progress version of cached responses
+        db.Index('ix_quiz_progress_user_id', 'user_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -198,6 +379,35 @@ class QuizProgress(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     quiz_session_id = db.Column(db.String(50))
 
+class ReviewState(db.Model):
+    """SM-2 schedule of one question for one user (see review_scheduler.py)"""
+    __tablename__ = 'review_states'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'question_id', name='uq_review_state_user_question'),
+        # Serves mode=review: due questions of one table for one user, most overdue first
+        db.Index('ix_review_states_due', 'user_id', 'table_name', 'due_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    table_name = db.Column(db.String(100), nullable=False)
+    ease = db.Column(db.Float, nullable=False)
+    interval_days = db.Column(db.Float, nullable=False)
+    repetitions = db.Column(db.Integer, default=0, nullable=False)
+    last_reviewed = db.Column(db.DateTime, nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)
+
+    def schedule(self):
+        return Schedule(self.ease, self.interval_days, self.repetitions, to_epoch(self.last_reviewed))
+
+    def apply(self, schedule):
+        self.ease = schedule.ease
+        self.interval_days = schedule.interval
+        self.repetitions = schedule.repetitions
+        self.last_reviewed = from_epoch(schedule.reviewed_at)
+        self.due_at = from_epoch(schedule.due)
+
 class BattleResult(db.Model):
     __tablename__ = 'battle_results'
     
@@ -246,11 +456,174 @@ class MonicaUsage(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    feature = db.Column(db.String(50), nullable=False)  # oral_exam, hint, battle_ai
+    # oral_exam, hint, explanation, battle_ai; "<feature>_cached" rows were answered from the AI cache
+    # and their tokens_used are the tokens the cache saved (cost 0)
+    feature = db.Column(db.String(50), nullable=False)
     tokens_used = db.Column(db.Integer, default=0)
     cost = db.Column(db.Float, default=0.0)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+# ===============================================
+# QUIZ TABLE CATALOG
+# ===============================================
+
+# quiz_tables.question_count is kept current by a before_flush hook on every
+# ORM insert/delete/move of a Question, and the sampler's id arrays of the
+# tables involved are dropped after the commit. Bulk statements (Query.delete(),
+# Table.insert()) bypass the session and must call rebuild_quiz_catalog().
+
+def _table_display_name(table_name):
+    return table_name.replace('_', ' ').title()
+
+def _question_count_deltas(session):
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Question):
+            deltas[obj.table_name] = deltas.get(obj.table_name, 0) + 1
+    for obj in session.deleted:
+        if isinstance(obj, Question):
+            history = db.inspect(obj).attrs.table_name.history
+            name = history.deleted[0] if history.deleted else obj.table_name
+            deltas[name] = deltas.get(name, 0) - 1
+    for obj in session.dirty:
+        if isinstance(obj, Question):
+            history = db.inspect(obj).attrs.table_name.history
+            if history.deleted and history.added:
+                deltas[history.deleted[0]] = deltas.get(history.deleted[0], 0) - 1
+                deltas[history.added[0]] = deltas.get(history.added[0], 0) + 1
+    return {name: d for name, d in deltas.items() if d}
+
+def rebuild_quiz_catalog(session=None):
+    """Recount quiz_tables from the questions table (one GROUP BY) and bump the catalog version"""
+    session = session or db.session
+    session.info.setdefault('changed_question_tables', set()).add(None)  # drop every cached id array on commit
+    with session.no_autoflush:
+        counts = dict(session.query(Question.table_name, db.func.count(Question.id)).group_by(Question.table_name).all())
+        for table in session.query(QuizTable).all():
+            table.question_count = counts.pop(table.name, 0)
+        for name, count in counts.items():
+            session.add(QuizTable(name=name, display_name=_table_display_name(name), question_count=count))
+        catalog = session.get(QuizCatalog, 1)
+        if catalog is None:
+            # Start from the clock so a re-created database never reuses a version another process has cached
+            session.add(QuizCatalog(id=1, version=time.time_ns() // 1000))
+        else:
+            catalog.version = QuizCatalog.version + 1
+
+def _questions_changed(session):
+    return any(isinstance(obj, Question) for obj in session.new) \
+        or any(isinstance(obj, Question) for obj in session.deleted) \
+        or any(isinstance(obj, Question) and session.is_modified(obj) for obj in session.dirty)
+
+@event.listens_for(db.session, 'before_flush')
+def _maintain_quiz_catalog(session, flush_context, instances):
+    # Any question change bumps the version (it also keys cached question responses)
+    if not _questions_changed(session):
+        return
+    deltas = _question_count_deltas(session)
+    with session.no_autoflush:
+        catalog = session.get(QuizCatalog, 1)
+        if catalog is None:
+            # Catalog never built: count what is already stored (creates the version row), then add this flush
+            rebuild_quiz_catalog(session)
+        else:
+            catalog.version = QuizCatalog.version + 1
+        for name, delta in deltas.items():
+            table = next((obj for obj in session.new if isinstance(obj, QuizTable) and obj.name == name), None) \
+                or session.query(QuizTable).filter_by(name=name).first()
+            if table is None:
+                session.add(QuizTable(name=name, display_name=_table_display_name(name), question_count=max(delta, 0)))
+            elif table in session.new:
+                table.question_count = max((table.question_count or 0) + delta, 0)
+            else:
+                # Relative UPDATE so concurrent writers do not lose increments
+                table.question_count = QuizTable.question_count + delta
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_question_tables(session, flush_context):
+    # Tables whose question ids changed (added, deleted or moved rows); attribute history is still there
+    changed = set()
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if isinstance(obj, Question):
+            history = db.inspect(obj).attrs.table_name.history
+            if obj not in session.dirty or history.deleted:
+                changed.update(history.deleted)
+                changed.add(obj.table_name)
+    if changed:
+        session.info.setdefault('changed_question_tables', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_question_ids(session):
+    changed = session.info.pop('changed_question_tables', ())
+    if None in changed:  # rebuild_quiz_catalog() after a bulk statement: any table may have changed
+        question_sampler.invalidate()
+    else:
+        for table_name in changed:
+            question_sampler.invalidate(table_name)
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_changed_question_tables(session):
+    session.info.pop('changed_question_tables', None)
+
+def quiz_catalog_version():
+    """Current catalog version; builds the catalog on first use"""
+    catalog = db.session.get(QuizCatalog, 1)
+    if catalog is None:
+        rebuild_quiz_catalog()
+        db.session.commit()
+        catalog = db.session.get(QuizCatalog, 1)
+    return catalog.version
+
+def quiz_table_list():
+    """Table listing for /api/quiz/tables"""
+    tables = QuizTable.query.filter(QuizTable.question_count > 0).order_by(QuizTable.name).all()
+    return [{
+        'name': t.name,
+        'display_name': t.display_name,
+        'question_count': t.question_count
+    } for t in tables]
+
+# ===============================================
+# RESPONSE CACHE (ETag / If-None-Match)
+# ===============================================
+
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES, store=shared_store)
+
+def cached_json_response(key, build):
+    """
+    JSON response identified by `key` (everything the payload depends on).
+    Answers If-None-Match with 304 without calling `build`, and reuses the
+    serialized body of an earlier identical response when it is still cached.
+    """
+    etag = response_cache.etag(key)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get(etag)
+        if body is None:
+            body = (app.json.dumps(build()) + '\n').encode('utf-8')
+            response_cache.put(etag, body)
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+def question_bank_version(table_name=None):
+    """Version of the stored questions (of one table when the backend can tell them apart)"""
+    if STORAGE_BACKEND == 'github' and github_store:
+        if table_name is None:
+            return ('github', github_store.question_catalog_version())
+        return ('github', github_store.question_table_version(table_name))
+    return ('sql', quiz_catalog_version())
+
+def progress_version(user_id):
+    """Changes whenever the user's quiz progress does"""
+    if STORAGE_BACKEND == 'github' and github_store:
+        return ('github', github_store.progress_index(int(user_id)).revision)
+    # Latest progress row id, read from ix_quiz_progress_user_id
+    return ('sql', db.session.query(db.func.max(QuizProgress.id)).filter(QuizProgress.user_id == user_id).scalar())
+
 # ===============================================
 # AUTHENTICATION & AUTHORIZATION
 # ===============================================
@@ -275,23 +648,102 @@ def verify_token(token):
     except jwt.InvalidTokenError:
         return None
 
+token_cache = TokenCache(verify_token, ttl=AUTH_TOKEN_CACHE_TTL, store=shared_store)
+
+def _user_context(user):
+    """Fields handlers need from a user row or GitHub user dict (cached per user)"""
+    if isinstance(user, dict):
+        return {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user.get('email'),
+            'role': user.get('role', 'student'),
+            'is_active': user.get('is_active', True),
+            'avatar': user.get('avatar', '👤'),
+            'created_at': user.get('created_at'),
+            'last_login': user.get('last_login'),
+            'battle_rating': user.get('battle_rating', 1500),
+            'battle_wins': user.get('battle_wins', 0),
+            'battle_losses': user.get('battle_losses', 0),
+            'settings': user.get('settings', {})
+        }
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'role': user.role,
+        'is_active': user.is_active,
+        'avatar': user.avatar,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+        'last_login': user.last_login.isoformat() if user.last_login else None,
+        'battle_rating': user.battle_rating,
+        'battle_wins': user.battle_wins,
+        'battle_losses': user.battle_losses,
+        'settings': json.loads(user.settings) if user.settings else {}
+    }
+
+def _load_user_context(user_id):
+    if STORAGE_BACKEND == 'github' and github_store:
+        user = github_store.read_user_by_id(user_id, shared=True)
+    else:
+        user = db.session.get(User, user_id)
+    return _user_context(user) if user else None
+
+user_context_cache = UserContextCache(_load_user_context, ttl=USER_CONTEXT_CACHE_TTL, store=shared_store)
+
+def invalidate_user_context(user_id=None):
+    """Call after changing a user's role, profile, settings, rating or active flag"""
+    user_context_cache.invalidate(user_id)
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    # Collections still hold the pre-flush state here
+    changed = {obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+               if isinstance(obj, User) and (obj not in session.dirty or session.is_modified(obj))}
+    if changed:
+        session.info.setdefault('changed_users', set()).update(changed)
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_users', ()):
+        invalidate_user_context(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_users', None)
+
+def _authenticate():
+    """(payload, context, error response) for the request's bearer token"""
+    token = request.headers.get('Authorization')
+    if not token:
+        return None, None, (jsonify({'error': 'Token missing'}), 401)
+
+    if token.startswith('Bearer '):
+        token = token[7:]
+
+    payload = token_cache.payload(token)
+    if not payload:
+        return None, None, (jsonify({'error': 'Invalid token'}), 401)
+
+    context = user_context_cache.get(payload['user_id'])
+    if context is not None:
+        if not context['is_active']:
+            return None, None, (jsonify({'error': 'Account is disabled'}), 403)
+        # The stored role wins over the one signed into the token, so demotions apply immediately
+        payload = {**payload, 'role': context['role']}
+    return payload, context, None
+
 def login_required(f):
     """Decorator to require authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token missing'}), 401
+        payload, context, error = _authenticate()
+        if error:
+            return error
 
-        if token.startswith('Bearer '):
-            token = token[7:]
-
-        payload = verify_token(token)
-        if not payload:
-            return jsonify({'error': 'Invalid token'}), 401
-
-        # Store on flask.g for request scope
+        # Store on flask.g for request scope; g.user_context is None for a user that no longer exists
         g.current_user = payload
+        g.user_context = context
         return f(*args, **kwargs)
 
     return decorated
@@ -300,19 +752,17 @@ def admin_required(f):
     """Decorator to require admin role"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Token missing'}), 401
-
-        if token.startswith('Bearer '):
-            token = token[7:]
-
-        payload = verify_token(token)
-        if not payload or payload.get('role') != 'admin':
+        payload, context, error = _authenticate()
+        if error and error[1] == 401:
+            return jsonify({'error': 'Admin access required'}), 403
+        if error:
+            return error
+        if payload.get('role') != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
 
         # Store on flask.g for request scope
         g.current_user = payload
+        g.user_context = context
         return f(*args, **kwargs)
 
     return decorated
@@ -321,35 +771,80 @@ def admin_required(f):
 # MONICA AI SERVICE
 # ===============================================
 
+def completion_text(response):
+    """Assistant message of a completion response (None for an error or an empty reply)"""
+    try:
+        return response['choices'][0]['message']['content'] or None
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def _is_json(text):
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
 class MonicaAIService:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=MONICA_API_URL, timeout=MONICA_TIMEOUT, cache=None, breaker=None):
         self.api_key = api_key
-        self.base_url = MONICA_API_URL
+        self.base_url = base_url
         self.enabled = bool(api_key and api_key != 'your-monica-api-key-here')
+        # Pooled async client with a concurrency cap and per-request deadlines (see ai_client.py)
+        self.client = AIClient(base_url, api_key, timeout=timeout, max_concurrency=MONICA_MAX_CONCURRENCY,
+                               max_connections=MONICA_MAX_CONNECTIONS, queue_timeout=MONICA_QUEUE_TIMEOUT)
+        if self.enabled and not self.client.available:
+            print("⚠️ Monica AI disabled: the httpx package is not installed")
+            self.enabled = False
+        self.cache = cache  # AICache: identical prompts are answered without an AI call
+        # While the provider fails or is slow, calls are refused at once instead of each waiting for its deadline
+        self.breaker = breaker or CircuitBreaker(
+            error_rate=MONICA_BREAKER_ERROR_RATE, slow_call_seconds=MONICA_BREAKER_SLOW_SECONDS,
+            min_calls=MONICA_BREAKER_MIN_CALLS, window=MONICA_BREAKER_WINDOW,
+            open_seconds=MONICA_BREAKER_OPEN_SECONDS, probes=MONICA_BREAKER_PROBES)
     
-    async def chat(self, messages, model="gpt-3.5-turbo", max_tokens=1000):
-        """Send chat request to Monica AI"""
+    def chat(self, messages, model="gpt-3.5-turbo", max_tokens=1000, timeout=None):
+        """Send chat request to Monica AI; blocks the handler at most `timeout` (MONICA_TIMEOUT) seconds"""
         if not self.enabled:
             return {"error": "Monica AI not configured"}
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": model,
-            "messages": messages if isinstance(messages, list) else [{"role": "user", "content": messages}],
-            "max_tokens": max_tokens,
-            "temperature": 0.7
-        }
-        
+        if not self.breaker.allow():
+            return {"error": "Monica AI is temporarily unavailable", "error_kind": "circuit_open"}
+        start = time.monotonic()
         try:
-            response = requests.post(self.base_url, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            return {"error": f"Monica AI request failed: {str(e)}"}
+            response = self.client.chat(messages, model=model, max_tokens=max_tokens, timeout=timeout)
+        except AIClientSaturated as e:
+            self.breaker.cancel()  # our own back-pressure says nothing about the provider
+            return {"error": f"Monica AI request failed: {str(e)}", "error_kind": e.kind}
+        except AIError as e:
+            self.breaker.record(False, time.monotonic() - start)
+            return {"error": f"Monica AI request failed: {str(e)}", "error_kind": e.kind}
+        self.breaker.record(True, time.monotonic() - start)
+        return response
+    
+    def cached_chat(self, feature, inputs, prompt, max_tokens, model="gpt-3.5-turbo", valid=None):
+        """
+        chat() through the AI cache, keyed on (feature, model, normalized inputs).
+        A hit comes back as a completion with "cached": True and "tokens_saved";
+        only replies passing `valid` are stored.
+        """
+        if self.cache is not None:
+            try:
+                hit = self.cache.get(feature, model, inputs)
+            except Exception as e:
+                print(f"⚠️ AI cache read failed: {e}")
+                hit = None
+            if hit is not None:
+                content, tokens = hit
+                return {"choices": [{"message": {"role": "assistant", "content": content}}],
+                        "usage": {"total_tokens": 0}, "cached": True, "tokens_saved": tokens}
+        response = self.chat(prompt, model=model, max_tokens=max_tokens)
+        content = completion_text(response)
+        if self.cache is not None and content is not None and (valid is None or valid(content)):
+            try:
+                self.cache.put(feature, model, inputs, content, (response.get('usage') or {}).get('total_tokens', 0))
+            except Exception as e:
+                print(f"⚠️ AI cache write failed: {e}")
+        return response
     
     def evaluate_oral_answer(self, question_text, correct_answer, user_answer):
         """Evaluate oral exam answer using Monica AI"""
@@ -372,7 +867,8 @@ class MonicaAIService:
         }}
         """
         
-        return self.chat(prompt, max_tokens=500)
+        return self.cached_chat('oral_exam', (question_text, correct_answer, user_answer), prompt, 500,
+                                valid=_is_json)
     
     def generate_hint(self, question_text, difficulty="medium"):
         """Generate smart hint for question"""
@@ -390,14 +886,47 @@ class MonicaAIService:
         Vrať pouze text nápovědy bez dalšího formátování.
         """
         
-        return self.chat(prompt, max_tokens=200)
+        return self.cached_chat('hint', (question_text, difficulty), prompt, 200)
+    
+    def generate_explanation(self, question_text, correct_answer):
+        """Short explanation of why the correct answer is right"""
+        prompt = f"""
+        Vysvětli stručně (max 3 věty, česky), proč je u této otázky správná uvedená odpověď:
+        
+        OTÁZKA: {question_text}
+        SPRÁVNÁ ODPOVĚĎ: {correct_answer}
+        
+        Vrať pouze text vysvětlení bez dalšího formátování.
+        """
+        
+        return self.cached_chat('explanation', (question_text, correct_answer), prompt, 300)
+
+def record_monica_usage(user_id, feature, response):
+    """MonicaUsage row for one AI answer (the caller commits): tokens spent, or tokens a cache hit saved"""
+    if response.get('cached'):
+        db.session.add(MonicaUsage(user_id=user_id, feature=f"{feature}_cached",
+                                   tokens_used=response.get('tokens_saved', 0), cost=0.0))
+    elif completion_text(response) is not None:
+        tokens = (response.get('usage') or {}).get('total_tokens', 0)
+        db.session.add(MonicaUsage(user_id=user_id, feature=feature, tokens_used=tokens,
+                                   cost=tokens * MONICA_COST_PER_1K_TOKENS / 1000))
 
 # Initialize Monica AI service
-monica_ai = MonicaAIService(MONICA_API_KEY)
+def _app_engine():
+    """The app's SQLAlchemy engine, also from threads without an app context"""
+    with app.app_context():
+        return db.engine
+
+ai_cache = AICache(_app_engine, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_MAX_ENTRIES)
+monica_ai = MonicaAIService(MONICA_API_KEY, cache=ai_cache)
+# Hedged evaluations: AI calls that outlive the request, and the results clients poll for
+evaluation_pool = ThreadPoolExecutor(max_workers=MONICA_MAX_CONCURRENCY, thread_name_prefix='ai-evaluate')
+evaluation_results = TTLCache(ttl=MONICA_EVALUATION_TTL, store=shared_store, namespace='evaluation:')
 
 # Attempt admin bootstrap early (non-fatal)
 try:
     ensure_admin_github()
+    ensure_question_shards_github()
 except Exception as _e:
     print(f"Bootstrap admin (early) skipped: {_e}")
 
@@ -427,6 +956,16 @@ def health_check():
     "storage_backend": STORAGE_BACKEND,
     "github_storage": bool(github_store is not None),
         "monica_ai": "enabled" if MONICA_ENABLED else "disabled",
+        "ai_client": monica_ai.client.stats(),
+        "ai_cache": ai_cache.stats(),
+        "ai_breaker": monica_ai.breaker.stats(),
+        "password_hashing": password_pool.stats(),
+        "auth_cache": {'tokens': token_cache.cache.stats(), 'users': user_context_cache.cache.stats()},
+        "shared_store": type(shared_store).__name__ if shared_store else "per-worker",
+        "matchmaking": matchmaker.stats(),
+        "battles": battle_engine.stats(),
+        "leaderboard": leaderboard.stats(),
+        "jobs": job_workers.stats(),
         "timestamp": datetime.utcnow().isoformat(),
         "version": "2.0.0-modular"
     })
@@ -532,37 +1071,32 @@ def register():
     
     if STORAGE_BACKEND == 'github' and github_store:
         # index: usernames -> id, next_id (do not create on read)
-        idx = github_store.read_json('users/_index.json') or {"next_id": 1, "usernames": {}}
+        idx = github_store.read_json('users/_index.json', shared=True) or {"next_id": 1, "usernames": {}}
         username = data['username']
         if username in idx.get('usernames', {}):
             return jsonify({'error': 'Username already exists'}), 409
         # email uniqueness optional (check if we want to enforce)
-        # derive new id
-        new_id = int(idx.get('next_id', 1))
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', data['password'].encode('utf-8'), salt.encode('utf-8'), 100000).hex()
-        user = {
-            'id': new_id,
-            'username': username,
-            'email': email,
-            'password_hash': password_hash,
-            'salt': salt,
-            'role': 'student',
-            'avatar': data.get('avatar', '👤'),
-            'created_at': datetime.utcnow().isoformat(),
-            'is_active': True,
-            'battle_rating': 1500,
-            'battle_wins': 0,
-            'battle_losses': 0,
-            'settings': {}
-        }
+        salt, password_hash = hash_new_password(data['password'])
         # Try GitHub write; if it fails (token missing or no perms), fallback to SQL registration
         try:
-            github_store.save_user(user)
-            # update index
-            idx['usernames'][username] = new_id
-            idx['next_id'] = new_id + 1
-            github_store.write_json('users/_index.json', idx, message='Update users index')
+            # user file + index in one commit; the id is derived from the fresh index
+            user = github_store.create_user(username, lambda new_id: {
+                'id': new_id,
+                'username': username,
+                'email': email,
+                'password_hash': password_hash,
+                'salt': salt,
+                'role': 'student',
+                'avatar': data.get('avatar', '👤'),
+                'created_at': datetime.utcnow().isoformat(),
+                'is_active': True,
+                'battle_rating': 1500,
+                'battle_wins': 0,
+                'battle_losses': 0,
+                'settings': {}
+            }, message='Register user')
+            if user is None:
+                return jsonify({'error': 'Username already exists'}), 409
             token = generate_token(user['id'], user['role'])
         except Exception as e:
             print(f"GitHub storage write failed, falling back to SQL registration: {e}")
@@ -584,8 +1118,7 @@ def register():
             return jsonify({'error': 'Username already exists'}), 409
         if email and User.query.filter_by(email=email).first():
             return jsonify({'error': 'Email already exists'}), 409
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', data['password'].encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+        salt, password_hash = hash_new_password(data['password'])
         user = User(
             username=data['username'],
             email=email,
@@ -634,22 +1167,31 @@ def login():
     
     if STORAGE_BACKEND == 'github' and github_store:
         # Read index without creating it on first access
-        idx = github_store.read_json('users/_index.json') or {"next_id": 1, "usernames": {}}
+        idx = github_store.read_json('users/_index.json', shared=True) or {"next_id": 1, "usernames": {}}
         user_id = idx.get('usernames', {}).get(data['username'])
+        if not user_id:
+            # The cached index may predate a registration handled by another worker
+            idx = github_store.read_json('users/_index.json', shared=True, max_age=0) or {"next_id": 1, "usernames": {}}
+            user_id = idx.get('usernames', {}).get(data['username'])
         if not user_id:
             return jsonify({'error': 'Invalid credentials'}), 401
         user = github_store.read_user_by_id(int(user_id))
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
-        ph = hashlib.pbkdf2_hmac('sha256', data['password'].encode('utf-8'), user['salt'].encode('utf-8'), 100000).hex()
-        if ph != user['password_hash']:
+        ok, upgrade = check_password(data['password'], user.get('salt'), user.get('password_hash'))
+        if not ok:
             return jsonify({'error': 'Invalid credentials'}), 401
         if not user.get('is_active', True):
             return jsonify({'error': 'Account is disabled'}), 403
-        # Best-effort last_login update; ignore write failures to avoid 500
+        # Best-effort last_login update (plus a rehash under the current policy); ignore write failures to avoid 500
         try:
-            user['last_login'] = datetime.utcnow().isoformat()
-            github_store.save_user(user)
+            stamp = {'last_login': datetime.utcnow().isoformat()}
+            if upgrade:
+                stamp['salt'], stamp['password_hash'] = upgrade
+            user.update(stamp)
+            # On a concurrent edit keep the remote user and only apply our fields
+            github_store.save_user(user, merge=lambda remote, ours: {**remote, **stamp})
+            invalidate_user_context(user['id'])
         except Exception as e:
             print(f"GitHub save_user(last_login) skipped: {e}")
         token = generate_token(user['id'], user.get('role', 'student'))
@@ -657,11 +1199,13 @@ def login():
         user = User.query.filter_by(username=data['username']).first()
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
-        password_hash = hashlib.pbkdf2_hmac('sha256', data['password'].encode('utf-8'), user.salt.encode('utf-8'), 100000).hex()
-        if password_hash != user.password_hash:
+        ok, upgrade = check_password(data['password'], user.salt, user.password_hash)
+        if not ok:
             return jsonify({'error': 'Invalid credentials'}), 401
         if not user.is_active:
             return jsonify({'error': 'Account is disabled'}), 403
+        if upgrade:
+            user.salt, user.password_hash = upgrade
         user.last_login = datetime.utcnow()
         db.session.commit()
         token = generate_token(user.id, user.role)
@@ -698,59 +1242,12 @@ def login():
 @login_required
 def get_profile():
     """Get user profile"""
-    if STORAGE_BACKEND == 'github' and github_store:
-        user = github_store.read_user_by_id(int(g.current_user['user_id']))
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        return jsonify({
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user.get('email'),
-                'role': user.get('role', 'student'),
-                'avatar': user.get('avatar', '👤'),
-                'created_at': user.get('created_at'),
-                'last_login': user.get('last_login'),
-                'battle_rating': user.get('battle_rating', 1500),
-                'battle_wins': user.get('battle_wins', 0),
-                'battle_losses': user.get('battle_losses', 0),
-                'settings': user.get('settings', {})
-            }
-        })
-    else:
-        user = User.query.get(g.current_user['user_id'])
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        return jsonify({
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'role': user.role,
-                'avatar': user.avatar,
-                'created_at': user.created_at.isoformat(),
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-                'battle_rating': user.battle_rating,
-                'battle_wins': user.battle_wins,
-                'battle_losses': user.battle_losses,
-                'settings': json.loads(user.settings) if user.settings else {}
-            }
-        })
-    
+    user = g.user_context
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     return jsonify({
-        'user': {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'role': user.role,
-            'avatar': user.avatar,
-            'created_at': user.created_at.isoformat(),
-            'last_login': user.last_login.isoformat() if user.last_login else None,
-            'battle_rating': user.battle_rating,
-            'battle_wins': user.battle_wins,
-            'battle_losses': user.battle_losses,
-            'settings': json.loads(user.settings) if user.settings else {}
-        }
+        'user': {key: user[key] for key in ('id', 'username', 'email', 'role', 'avatar', 'created_at', 'last_login',
+                                            'battle_rating', 'battle_wins', 'battle_losses', 'settings')}
     })
 
 # ===============================================
@@ -762,40 +1259,10 @@ def get_profile():
 def get_quiz_tables():
     """Get available quiz tables"""
     if STORAGE_BACKEND == 'github' and github_store:
-        data = github_store.read_json('questions.json') or {}
-        tables = data.get('quiz_tables')
-        if tables:
-            # Already have display_name & counts
-            table_list = [{
-                'name': t.get('name'),
-                'display_name': t.get('display_name') or t.get('name', '').replace('_', ' ').title(),
-                'question_count': t.get('question_count', 0)
-            } for t in tables]
-            return jsonify({'tables': table_list})
-        # Fallback: infer from questions
-        questions = data.get('questions', [])
-        counts = {}
-        for q in questions:
-            tn = q.get('table_name')
-            counts[tn] = counts.get(tn, 0) + 1
-        table_list = [{
-            'name': tn,
-            'display_name': tn.replace('_', ' ').title() if tn else 'Unknown',
-            'question_count': cnt
-        } for tn, cnt in counts.items()]
-        return jsonify({'tables': table_list})
+        build = lambda: {'tables': github_store.question_tables()}
     else:
-        tables = db.session.query(Question.table_name).distinct().all()
-        table_list = []
-        for table in tables:
-            table_name = table[0]
-            question_count = Question.query.filter_by(table_name=table_name).count()
-            table_list.append({
-                'name': table_name,
-                'display_name': table_name.replace('_', ' ').title(),
-                'question_count': question_count
-            })
-        return jsonify({'tables': table_list})
+        build = lambda: {'tables': quiz_table_list()}
+    return cached_json_response(('tables', question_bank_version()), build)
 
 @app.route('/api/quiz/questions/<table_name>', methods=['GET'])
 @login_required
@@ -804,30 +1271,37 @@ def get_questions(table_name):
     mode = request.args.get('mode', 'normal')
     limit = request.args.get('limit', type=int)
 
+    if mode in ('random', 'review'):
+        # A fresh draw / what is due right now: never served from the response cache
+        return jsonify({'questions': select_questions(table_name, mode, limit)})
+    key = ('questions', table_name, mode, limit, question_bank_version(table_name))
+    if mode in ('unanswered', 'wrong'):
+        user_id = g.current_user['user_id']
+        key += (user_id, progress_version(user_id))
+    return cached_json_response(key, lambda: {'questions': select_questions(table_name, mode, limit)})
+
+def select_questions(table_name, mode, limit=None):
+    """Question payloads of a table for a quiz mode (normal, random, unanswered, wrong, review)"""
     if STORAGE_BACKEND == 'github' and github_store:
-        data = github_store.read_json('questions.json') or {}
-        all_q = [q for q in (data.get('questions') or []) if q.get('table_name') == table_name]
-        # Map to unified shape
-        mapped = []
-        for q in all_q:
-            mapped.append({
-                'id': q.get('id'),
-                'text': q.get('question') or q.get('question_text'),
-                'answers': [q.get('answer_a'), q.get('answer_b'), q.get('answer_c')],
-                'difficulty': q.get('difficulty') or 'medium',
-                'category': q.get('category'),
-                'explanation': q.get('explanation')
-            })
-        # TODO: implement mode filters using stored progress if needed
-        if mode == 'random':
-            import random
-            random.shuffle(mapped)
+        bank = github_store.table_question_bank(table_name)
+        mapped = bank.table_payloads(table_name) if bank else []
+        if mode == 'review' and bank:
+            index = github_store.progress_index(int(g.current_user['user_id']))
+            mapped = index.review(mapped, bank.table_payload_index(table_name), time.time(), limit)
+        elif mode in ('unanswered', 'wrong'):
+            # Same semantics as the SQL subqueries: never answered / answered wrong at least once
+            mapped = github_store.progress_index(int(g.current_user['user_id'])).filter(mapped, mode)
+        elif mode == 'random':
+            # Partial shuffle of the in-memory payload list: only `limit` draws
+            mapped = random.sample(mapped, min(limit, len(mapped)) if limit else len(mapped))
         if limit:
             mapped = mapped[:limit]
-        return jsonify({'questions': mapped})
+        return mapped
 
     # SQL path
     query = Question.query.filter_by(table_name=table_name)
+    if mode == 'review':
+        return [_question_payload(q) for q in _review_questions_sql(g.current_user['user_id'], table_name, time.time(), limit)]
     if mode == 'unanswered':
         answered_ids = db.session.query(QuizProgress.question_id).filter_by(
             user_id=g.current_user['user_id']
@@ -840,20 +1314,96 @@ def get_questions(table_name):
         ).subquery()
         query = query.filter(Question.id.in_(wrong_ids))
     elif mode == 'random':
-        query = query.order_by(db.func.random())
+        if limit:
+            return [_question_payload(q) for q in sample_questions(table_name, limit)]
+        questions = query.all()
+        question_sampler.rng.shuffle(questions)
+        return [_question_payload(q) for q in questions]
     if limit:
         query = query.limit(limit)
-    questions = query.all()
-    return jsonify({
-        'questions': [{
-            'id': q.id,
-            'text': q.question_text,
-            'answers': [q.answer_a, q.answer_b, q.answer_c],
-            'difficulty': q.difficulty,
-            'category': q.category,
-            'explanation': q.explanation
-        } for q in questions]
-    })
+    return [_question_payload(q) for q in query.all()]
+
+def _question_payload(q):
+    return {
+        'id': q.id,
+        'text': q.question_text,
+        'answers': [q.answer_a, q.answer_b, q.answer_c],
+        'difficulty': q.difficulty,
+        'category': q.category,
+        'explanation': q.explanation
+    }
+
+def _load_question_ids(table_name):
+    return db.session.execute(db.select(Question.id).where(Question.table_name == table_name)).scalars()
+
+question_sampler = QuestionIdSampler(_load_question_ids, ttl=QUESTION_ID_CACHE_TTL)
+
+def sample_questions(table_name, limit):
+    """Up to `limit` random questions of a table: ids drawn from the cached id array, rows fetched with IN"""
+    for attempt in range(2):
+        ids = question_sampler.sample(table_name, limit)
+        if not ids:
+            return []
+        by_id = {q.id: q for q in Question.query.filter(Question.id.in_(ids)).all()}
+        if len(by_id) == len(ids) or attempt:
+            return [by_id[qid] for qid in ids if qid in by_id]
+        # Some ids were deleted since the array was loaded; reload it once
+        question_sampler.invalidate(table_name)
+    return []
+
+def due_review_question_ids(user_id, table_name, now, limit=None):
+    """Ids of questions due for review, most overdue first (walks ix_review_states_due)"""
+    query = db.session.query(ReviewState.question_id).filter(
+        ReviewState.user_id == user_id,
+        ReviewState.table_name == table_name,
+        ReviewState.due_at <= from_epoch(now)
+    ).order_by(ReviewState.due_at, ReviewState.question_id)
+    if limit:
+        query = query.limit(limit)
+    return [row[0] for row in query.all()]
+
+def _review_questions_sql(user_id, table_name, now, limit=None):
+    """mode=review: due questions first, then questions without a schedule in id order"""
+    due_ids = due_review_question_ids(user_id, table_name, now, limit)
+    by_id = {q.id: q for q in Question.query.filter(Question.id.in_(due_ids)).all()} if due_ids else {}
+    questions = [by_id[qid] for qid in due_ids if qid in by_id]
+    if not limit or len(questions) < limit:
+        scheduled = db.select(ReviewState.question_id).where(ReviewState.user_id == user_id)
+        new_query = Question.query.filter(Question.table_name == table_name, ~Question.id.in_(scheduled)).order_by(Question.id)
+        if limit:
+            new_query = new_query.limit(limit - len(questions))
+        questions.extend(new_query.all())
+    return questions
+
+def record_review_sql(user_id, question, is_correct, reviewed_at, response_time=None):
+    """Advance the user's SM-2 schedule for a question (added to the current session, not committed)"""
+    return record_reviews_sql(user_id, [(question, is_correct, reviewed_at, response_time)])[0]
+
+def record_reviews_sql(user_id, answers):
+    """
+    Bulk variant of record_review_sql: `answers` is a list of
+    (question, is_correct, reviewed_at, response_time) applied in order,
+    with one query for the existing schedules.
+    """
+    question_ids = {question.id for question, _, _, _ in answers}
+    states = {state.question_id: state for state in ReviewState.query.filter(
+        ReviewState.user_id == user_id, ReviewState.question_id.in_(question_ids))}
+    touched = []
+    for question, is_correct, reviewed_at, response_time in answers:
+        state = states.get(question.id)
+        if state is None:
+            state = ReviewState(user_id=user_id, question_id=question.id, table_name=question.table_name)
+            db.session.add(state)
+            states[question.id] = state
+            prev = None
+        else:
+            prev = state.schedule() if state.last_reviewed is not None else None
+            if prev is not None and to_epoch(reviewed_at) <= prev.reviewed_at:
+                touched.append(state)
+                continue
+        state.apply(next_schedule(prev, is_correct, to_epoch(reviewed_at), response_time))
+        touched.append(state)
+    return touched
 
 @app.route('/api/quiz/submit-answer', methods=['POST'])
 @login_required
@@ -866,25 +1416,14 @@ def submit_answer():
     
     question = Question.query.get(data['question_id']) if STORAGE_BACKEND != 'github' else None
     if STORAGE_BACKEND == 'github' and github_store:
-        # We don't have SQL questions; verify correctness against GitHub questions.json
-        gh_data = github_store.read_json('questions.json') or {}
-        qmap = {q.get('id'): q for q in (gh_data.get('questions') or [])}
-        q = qmap.get(data['question_id'])
+        # We don't have SQL questions; verify correctness against the GitHub question shard
+        q, bank = github_store.find_question(data['question_id'])
         if not q:
             return jsonify({'error': 'Question not found'}), 404
         # Support both numeric index (0/1/2) and letter (A/B/C) stored in GitHub
-        ca_raw = q.get('correct_answer')
-        if isinstance(ca_raw, str):
-            letter_map = {'A': 0, 'a': 0, 'B': 1, 'b': 1, 'C': 2, 'c': 2}
-            correct_answer = letter_map.get(ca_raw.strip(), None)
-        else:
-            try:
-                correct_answer = int(ca_raw) if ca_raw is not None else None
-            except Exception:
-                correct_answer = None
+        correct_answer = bank.correct_answer(q)
         is_correct = int(data['selected_answer']) == correct_answer if correct_answer is not None else False
         uid = int(g.current_user['user_id'])
-        prog = github_store.read_progress(uid)
         entry = {
             'question_id': data['question_id'],
             'selected_answer': data['selected_answer'],
@@ -893,8 +1432,7 @@ def submit_answer():
             'quiz_session_id': data.get('session_id'),
             'timestamp': datetime.utcnow().isoformat()
         }
-        prog.setdefault('entries', []).append(entry)
-        github_store.write_progress(uid, prog)
+        github_store.append_progress(uid, entry)
         return jsonify({
             'correct': is_correct,
             'correct_answer': correct_answer,
@@ -904,15 +1442,18 @@ def submit_answer():
         if not question:
             return jsonify({'error': 'Question not found'}), 404
         is_correct = int(data['selected_answer']) == question.correct_answer
+        answered_at = datetime.utcnow()
         progress = QuizProgress(
             user_id=g.current_user['user_id'],
             question_id=data['question_id'],
             selected_answer=data['selected_answer'],
             is_correct=is_correct,
             response_time=data.get('response_time'),
+            timestamp=answered_at,
             quiz_session_id=data.get('session_id')
         )
         db.session.add(progress)
+        record_review_sql(g.current_user['user_id'], question, is_correct, answered_at, data.get('response_time'))
         db.session.commit()
 
         return jsonify({
@@ -921,6 +1462,760 @@ def submit_answer():
             'explanation': question.explanation or question.ai_explanation
         })
 
+MAX_SUBMIT_BATCH = 200
+
+@app.route('/api/quiz/submit-answers', methods=['POST'])
+@login_required
+def submit_answers():
+    """
+    Submit a batch of quiz answers (e.g. a whole quiz session).
+    Body: { session_id?, answers: [{question_id, selected_answer, response_time?}, ...] }
+    Questions are fetched in bulk and all answers are stored with one commit
+    (one progress write on GitHub). Unknown questions are reported per item.
+    """
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    if not isinstance(answers, list) or not answers:
+        return jsonify({'error': 'Missing answers'}), 400
+    if len(answers) > MAX_SUBMIT_BATCH:
+        return jsonify({'error': f'At most {MAX_SUBMIT_BATCH} answers per request'}), 400
+    try:
+        for item in answers:
+            item['selected_answer'] = int(item['selected_answer'])
+            item['question_id'] = int(item['question_id'])
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'error': 'Each answer needs a numeric question_id and selected_answer'}), 400
+
+    uid = int(g.current_user['user_id'])
+    session_id = data.get('session_id')
+    # One timestamp per request, a microsecond apart so repeated questions keep their order
+    now = datetime.utcnow()
+    results = []
+
+    if STORAGE_BACKEND == 'github' and github_store:
+        entries = []
+        for i, item in enumerate(answers):
+            q, bank = github_store.find_question(item['question_id'])
+            if not q:
+                results.append({'question_id': item['question_id'], 'error': 'Question not found'})
+                continue
+            correct_answer = bank.correct_answer(q)
+            is_correct = item['selected_answer'] == correct_answer if correct_answer is not None else False
+            entries.append({
+                'question_id': item['question_id'],
+                'selected_answer': item['selected_answer'],
+                'is_correct': is_correct,
+                'response_time': item.get('response_time'),
+                'quiz_session_id': item.get('session_id', session_id),
+                'timestamp': (now + timedelta(microseconds=i)).isoformat()
+            })
+            results.append({
+                'question_id': item['question_id'],
+                'correct': is_correct,
+                'correct_answer': correct_answer,
+                'explanation': q.get('explanation')
+            })
+        if entries:
+            github_store.append_progress_batch(uid, entries)
+    else:
+        questions = {q.id: q for q in Question.query.filter(Question.id.in_({a['question_id'] for a in answers}))}
+        rows, reviews = [], []
+        for i, item in enumerate(answers):
+            question = questions.get(item['question_id'])
+            if question is None:
+                results.append({'question_id': item['question_id'], 'error': 'Question not found'})
+                continue
+            is_correct = item['selected_answer'] == question.correct_answer
+            answered_at = now + timedelta(microseconds=i)
+            rows.append({
+                'user_id': uid,
+                'question_id': question.id,
+                'selected_answer': item['selected_answer'],
+                'is_correct': is_correct,
+                'response_time': item.get('response_time'),
+                'timestamp': answered_at,
+                'quiz_session_id': item.get('session_id', session_id)
+            })
+            reviews.append((question, is_correct, answered_at, item.get('response_time')))
+            results.append({
+                'question_id': question.id,
+                'correct': is_correct,
+                'correct_answer': question.correct_answer,
+                'explanation': question.explanation or question.ai_explanation
+            })
+        if rows:
+            db.session.execute(db.insert(QuizProgress), rows)  # executemany
+            record_reviews_sql(uid, reviews)
+            db.session.commit()
+
+    return jsonify({
+        'results': results,
+        'saved': sum(1 for r in results if 'error' not in r),
+        'correct': sum(1 for r in results if r.get('correct'))
+    })
+
+# ===============================================
+# API ROUTES - MONICA AI (EVALUATION, HINTS, EXPLANATIONS, USAGE)
+# ===============================================
+
+def calculate_grade(score):
+    """Calculate letter grade from numeric score"""
+    if score >= 90: return 'A'
+    elif score >= 75: return 'B'
+    elif score >= 60: return 'C'
+    elif score >= 45: return 'D'
+    else: return 'F'
+
+def evaluate_answer_locally(question, correct_answer, user_answer):
+    """Local fallback evaluation when AI is not available"""
+    # Calculate similarity
+    correct_words = answer_tokens(correct_answer or '')
+    common = common_words(correct_answer, user_answer)
+    
+    if len(correct_words) == 0:
+        similarity = 0.5
+    else:
+        similarity = len(common) / len(correct_words)
+    
+    # Calculate score
+    base_score = int(similarity * 70)  # Max 70 points for word match
+    length_bonus = min(15, len(user_answer.split()) * 2)  # Up to 15 points for length
+    effort_bonus = 15 if len(user_answer.strip()) > 0 else 0  # 15 points for trying
+    
+    score = min(100, base_score + length_bonus + effort_bonus)
+    
+    # Generate feedback
+    positives = []
+    negatives = []
+    recommendations = []
+    
+    if similarity > 0.7:
+        positives.append('Odpověď obsahuje většinu klíčových pojmů')
+    elif similarity > 0.4:
+        positives.append('Odpověď obsahuje některé správné pojmy')
+    else:
+        negatives.append('Odpověď neobsahuje hlavní klíčové pojmy')
+    
+    if len(user_answer.split()) > 10:
+        positives.append('Podrobná a rozvinutá odpověď')
+    elif len(user_answer.split()) < 5:
+        negatives.append('Odpověď je příliš stručná')
+        recommendations.append('Pokuste se odpověď více rozvinout')
+    
+    if similarity < 0.5:
+        recommendations.append('Zaměřte se na klíčové pojmy ze správné odpovědi')
+        recommendations.append('Použijte více konkrétních termínů')
+    
+    if len(recommendations) == 0:
+        recommendations.append('Dobrá práce, pokračujte v učení')
+    
+    return {
+        'summary': f'Vaše odpověď obsahuje {len(common)} z {len(correct_words)} klíčových pojmů.',
+        'score': score,
+        'positives': positives,
+        'negatives': negatives,
+        'recommendations': recommendations,
+        'grade': calculate_grade(score),
+        'scoreBreakdown': {
+            'factual': int(similarity * 100),
+            'completeness': min(100, base_score + length_bonus),
+            'clarity': max(50, min(100, len(user_answer.split()) * 8)),
+            'structure': 75
+        },
+        'method': 'local-evaluation'
+    }
+
+def _ai_evaluation(response):
+    """Evaluation in the local evaluator's format from a Monica completion, or None without a JSON evaluation"""
+    ai_content = completion_text(response)
+    if ai_content is None:
+        if response.get('error'):
+            print(f"Monica AI error: {response['error']}")
+        return None
+    try:
+        evaluation_data = json.loads(ai_content)
+    except json.JSONDecodeError:
+        print(f"AI returned non-JSON response: {ai_content}")
+        return None
+    if not isinstance(evaluation_data, dict):
+        return None
+    
+    suggestions = evaluation_data.get('suggestions', [])
+    correct = evaluation_data.get('correctness') == 'correct'
+    score = evaluation_data.get('score', 50)
+    return {
+        'summary': evaluation_data.get('feedback', 'AI vyhodnocení odpovědi'),
+        'score': score,
+        'positives': suggestions[:3] if correct else [],
+        'negatives': suggestions[:3] if not correct else [],
+        'recommendations': suggestions,
+        'grade': calculate_grade(score),
+        'scoreBreakdown': {
+            'factual': evaluation_data.get('content_score', 50),
+            'completeness': min(100, score + 10),
+            'clarity': evaluation_data.get('grammar_score', 75),
+            'structure': evaluation_data.get('pronunciation_score', 75)
+        },
+        'method': 'ai-monica'
+    }
+
+def evaluate_with_ai(question, correct_answer, user_answer, user_id=None):
+    """AI evaluation (through the cache and the circuit breaker) or None; logs usage for `user_id`"""
+    with app.app_context():  # also runs on evaluation_pool threads
+        response = monica_ai.evaluate_oral_answer(question, correct_answer, user_answer)
+        result = _ai_evaluation(response)
+        if result is not None and user_id is not None:
+            try:
+                record_monica_usage(user_id, 'answer_evaluation', response)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Monica usage not recorded: {e}")
+        return result
+
+def _hedged_evaluation(future, question, correct_answer, user_answer):
+    """Local evaluation for an AI call past MONICA_HEDGE_BUDGET; the AI result replaces it once it arrives"""
+    result = evaluate_answer_locally(question, correct_answer, user_answer)
+    evaluation_id = secrets.token_urlsafe(12)
+    result.update(evaluationId=evaluation_id, upgradePending=True)
+    evaluation_results.put(evaluation_id, {'status': 'pending', 'result': result})
+    
+    def upgrade(done):
+        try:
+            upgraded = done.result()
+        except Exception as e:
+            print(f"⚠️ Hedged AI evaluation failed: {e}")
+            upgraded = None
+        if upgraded is None:
+            evaluation_results.put(evaluation_id, {'status': 'local', 'result': {**result, 'upgradePending': False}})
+        else:
+            evaluation_results.put(evaluation_id, {'status': 'upgraded', 'result': {**upgraded, 'evaluationId': evaluation_id}})
+    
+    future.add_done_callback(upgrade)
+    return result
+
+def _optional_user_id():
+    """Id of the user behind a valid bearer token, if the request carries one"""
+    if not request.headers.get('Authorization'):
+        return None
+    payload, _, error = _authenticate()
+    return None if error else payload['user_id']
+
+@app.route('/api/monica/evaluate', methods=['POST', 'OPTIONS'])
+def evaluate_answer_with_ai():
+    """Evaluate answer using Monica AI (no auth required for compatibility)"""
+    if request.method == 'OPTIONS':
+        response = jsonify({'status': 'ok'})
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        return response
+    
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        # Extract required fields
+        question = data.get('question', '')
+        correct_answer = data.get('correctAnswer', '')  
+        user_answer = data.get('userAnswer', '')
+        
+        if not all([question, correct_answer, user_answer]):
+            return jsonify({'error': 'Missing required fields: question, correctAnswer, userAnswer'}), 400
+        
+        # Use Monica AI if available (an open circuit breaker answers at once and we fall through)
+        if MONICA_ENABLED:
+            user_id = _optional_user_id()
+            if MONICA_HEDGE_BUDGET > 0:
+                future = evaluation_pool.submit(evaluate_with_ai, question, correct_answer, user_answer, user_id)
+                try:
+                    result = future.result(MONICA_HEDGE_BUDGET)
+                except FutureTimeoutError:
+                    return jsonify(_hedged_evaluation(future, question, correct_answer, user_answer))
+            else:
+                result = evaluate_with_ai(question, correct_answer, user_answer, user_id)
+            if result is not None:
+                return jsonify(result)
+        
+        # Fallback to local evaluation
+        result = evaluate_answer_locally(question, correct_answer, user_answer)
+        return jsonify(result)
+        
+    except Exception as e:
+        print(f"Evaluation error: {str(e)}")
+        return jsonify({
+            'summary': 'Došlo k chybě při vyhodnocování',
+            'score': 50,
+            'positives': ['Odpověď byla zaznamenána'],
+            'negatives': ['Automatické vyhodnocení selhalo'],
+            'recommendations': ['Zkuste odpověď zformulovat jinak'],
+            'grade': 'C',
+            'method': 'error-fallback'
+        })
+
+@app.route('/api/monica/evaluate/<evaluation_id>', methods=['GET'])
+def evaluation_result(evaluation_id):
+    """Result of a hedged evaluation: status pending, upgraded (AI) or local (the AI gave no usable answer)"""
+    entry = evaluation_results.get(evaluation_id)
+    if entry is None:
+        return jsonify({'error': 'Evaluation not found'}), 404
+    return jsonify(entry)
+
+def _question_for_ai(question_id):
+    """(text, correct answer text, difficulty, SQL row or None) of a question, or None if it does not exist"""
+    if STORAGE_BACKEND == 'github' and github_store:
+        q, bank = github_store.find_question(question_id)
+        if q is None:
+            return None
+        correct = bank.correct_answer(q)
+        answers = [q.get('answer_a'), q.get('answer_b'), q.get('answer_c')]
+        return (q.get('question') or q.get('question_text'), answers[correct] if correct is not None else None,
+                q.get('difficulty') or 'medium', None)
+    question = db.session.get(Question, question_id)
+    if question is None:
+        return None
+    answers = [question.answer_a, question.answer_b, question.answer_c]
+    return question.question_text, answers[question.correct_answer], question.difficulty or 'medium', question
+
+def _question_ai_text(question_id, kind):
+    """Stored hint/explanation of a question, else one from the AI cache or Monica, written back to the row"""
+    found = _question_for_ai(question_id)
+    if found is None:
+        return jsonify({'error': 'Question not found'}), 404
+    text, correct_answer, difficulty, row = found
+    if row is not None:
+        stored = row.ai_hint if kind == 'hint' else (row.explanation or row.ai_explanation)
+        if stored:
+            return jsonify({kind: stored, 'source': 'stored'})
+    if kind == 'hint':
+        response = monica_ai.generate_hint(text, difficulty)
+    else:
+        response = monica_ai.generate_explanation(text, correct_answer)
+    content = completion_text(response)
+    if content is None:
+        return jsonify({'error': response.get('error', 'Monica AI returned no answer')}), 503
+    content = content.strip()
+    if not (STORAGE_BACKEND == 'github' and github_store):
+        if kind == 'hint':
+            row.ai_hint = content
+        else:
+            row.ai_explanation = content
+        record_monica_usage(g.current_user['user_id'], kind, response)
+        db.session.commit()
+    return jsonify({kind: content, 'source': 'cache' if response.get('cached') else 'ai'})
+
+@app.route('/api/monica/hint/<int:question_id>', methods=['GET'])
+@login_required
+def question_hint(question_id):
+    """AI hint for a question, generated once and then served from questions.ai_hint"""
+    return _question_ai_text(question_id, 'hint')
+
+@app.route('/api/monica/explanation/<int:question_id>', methods=['GET'])
+@login_required
+def question_explanation(question_id):
+    """Explanation of a question's answer (questions.explanation, else an AI one kept in ai_explanation)"""
+    return _question_ai_text(question_id, 'explanation')
+
+@app.route('/api/admin/monica/usage', methods=['GET'])
+@admin_required
+def admin_monica_usage():
+    """AI usage per feature over the last `days` days: calls, cache hit rate, tokens used and saved, cost"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 365)
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = db.session.query(MonicaUsage.feature, db.func.count(MonicaUsage.id), db.func.sum(MonicaUsage.tokens_used),
+                            db.func.sum(MonicaUsage.cost)).filter(MonicaUsage.timestamp >= since) \
+        .group_by(MonicaUsage.feature).all()
+    features = {}
+    for feature, count, tokens, cost in rows:
+        cached = feature.endswith('_cached')
+        entry = features.setdefault(feature[:-len('_cached')] if cached else feature, {
+            'requests': 0, 'cache_hits': 0, 'tokens_used': 0, 'tokens_saved': 0, 'cost': 0.0})
+        entry['requests'] += count
+        if cached:
+            entry['cache_hits'] += count
+            entry['tokens_saved'] += tokens or 0
+        else:
+            entry['tokens_used'] += tokens or 0
+            entry['cost'] = round(entry['cost'] + (cost or 0.0), 6)
+    for entry in features.values():
+        entry['hit_rate'] = round(entry['cache_hits'] / entry['requests'], 3) if entry['requests'] else 0.0
+    return jsonify({'days': days, 'features': features, 'cache': ai_cache.stats()})
+
+# ===============================================
+# API ROUTES - ORAL EXAM (EVALUATION JOBS)
+# ===============================================
+
+job_queue = JobQueue(create_engine(JOB_QUEUE_URL) if JOB_QUEUE_URL else _app_engine)
+
+def oral_keyword_evaluation(transcript, correct_answer):
+    """Simple keyword-based evaluation, returned at once while the AI one is queued"""
+    # Simple scoring based on keyword matching
+    keywords = answer_tokens(correct_answer or '')
+    matches = len(common_words(correct_answer, transcript))
+    score = min(100, (matches / len(keywords)) * 100) if keywords else 50
+    
+    return {
+        "score": int(score),
+        "feedback": f"Automatické vyhodnocení na základě klíčových slov. Skóre: {int(score)}/100",
+        "pronunciation_score": 75,
+        "grammar_score": 75,
+        "content_score": int(score),
+        "method": "keywords"
+    }
+
+def run_oral_exam_job(payload, job):
+    """Evaluate a stored oral exam answer with Monica and upgrade its OralExam row"""
+    with app.app_context():
+        exam = db.session.get(OralExam, payload['oral_exam_id'])
+        found = _question_for_ai(exam.question_id) if exam is not None else None
+        if found is None:
+            return {'status': 'missing'}
+        question_text, correct_answer, _, _ = found
+        response = monica_ai.evaluate_oral_answer(question_text, correct_answer, exam.audio_transcript)
+        content = completion_text(response)
+        try:
+            evaluation_data = json.loads(content) if content is not None else None
+        except json.JSONDecodeError:
+            evaluation_data = None
+        if not isinstance(evaluation_data, dict):
+            if response.get('error_kind') in ('timeout', 'transport', 'saturated') and \
+                    job['attempts'] < job_queue.max_attempts:
+                raise RuntimeError(response['error'])  # retried after job_queue.retry_delay
+            return {'status': 'local', 'error': response.get('error', 'Monica AI returned no JSON evaluation')}
+        
+        evaluation_data['method'] = 'ai-monica'
+        exam.ai_evaluation = json.dumps(evaluation_data)
+        exam.score = evaluation_data.get('score', exam.score)
+        exam.feedback = evaluation_data.get('feedback', exam.feedback)
+        exam.pronunciation_score = evaluation_data.get('pronunciation_score', exam.pronunciation_score)
+        exam.grammar_score = evaluation_data.get('grammar_score', exam.grammar_score)
+        # Track Monica usage (tokens from the reply, or tokens saved by the AI cache)
+        record_monica_usage(exam.user_id, 'oral_exam', response)
+        db.session.commit()
+        return {'status': 'upgraded'}
+
+job_workers = JobWorkers(job_queue, {'oral_exam': run_oral_exam_job}, workers=ORAL_EXAM_WORKERS)
+
+def start_job_workers():
+    """Start the evaluation workers in this process (once) and drop old finished jobs"""
+    if MONICA_ENABLED and ORAL_EXAM_WORKERS > 0 and not job_workers.running:
+        job_queue.prune(JOB_RETENTION_DAYS * 86400)
+        job_workers.start()
+
+@app.route('/api/oral-exam/submit-audio', methods=['POST'])
+@login_required
+def submit_oral_audio():
+    """Submit a transcript: the keyword score comes back at once, the AI evaluation follows as a job"""
+    data = request.get_json()
+    
+    if not data or not all(k in data for k in ('question_id', 'transcript')):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    found = _question_for_ai(data['question_id'])
+    if found is None:
+        return jsonify({'error': 'Question not found'}), 404
+    question_text, correct_answer, _, question = found
+    
+    evaluation_data = oral_keyword_evaluation(data['transcript'], correct_answer)
+    oral_exam = OralExam(
+        user_id=g.current_user['user_id'],
+        question_id=data['question_id'],
+        audio_transcript=data['transcript'],
+        ai_evaluation=json.dumps(evaluation_data),
+        score=evaluation_data['score'],
+        feedback=evaluation_data['feedback'],
+        pronunciation_score=evaluation_data['pronunciation_score'],
+        grammar_score=evaluation_data['grammar_score']
+    )
+    db.session.add(oral_exam)
+    db.session.commit()
+    
+    job_id = None
+    if MONICA_ENABLED:
+        try:
+            job_id = job_queue.enqueue('oral_exam', {'oral_exam_id': oral_exam.id,
+                                                     'user_id': g.current_user['user_id']})
+        except Exception as e:
+            print(f"⚠️ Oral exam evaluation not queued: {e}")  # the keyword score stays
+    
+    return jsonify({
+        'evaluation': evaluation_data,
+        'exam_id': data.get('exam_id'),
+        'oral_exam_id': oral_exam.id,
+        'job_id': job_id,
+        'status': 'pending' if job_id else 'local',
+        'question': {
+            'text': question_text,
+            'correct_answer': correct_answer,
+            'explanation': question.explanation if question is not None else None
+        }
+    })
+
+def _oral_exam_result(job_id, user_id):
+    """State of an evaluation job: pending, upgraded (AI), local (AI gave nothing) or failed; None if not the user's"""
+    job = job_queue.get(job_id)
+    if job is None or job['kind'] != 'oral_exam' or job['payload'].get('user_id') != user_id:
+        return None
+    if job['status'] == DONE:
+        status = (job['result'] or {}).get('status', 'local')
+    else:
+        status = 'failed' if job['status'] == FAILED else 'pending'
+    db.session.expire_all()  # the worker commits on its own session
+    exam = db.session.get(OralExam, job['payload']['oral_exam_id'])
+    return {
+        'job_id': job_id,
+        'oral_exam_id': job['payload']['oral_exam_id'],
+        'status': status,
+        'attempts': job['attempts'],
+        'evaluation': json.loads(exam.ai_evaluation) if exam is not None and exam.ai_evaluation else None
+    }
+
+@app.route('/api/oral-exam/result/<int:job_id>', methods=['GET'])
+@login_required
+def oral_exam_result(job_id):
+    """Poll the evaluation of a submitted answer (the AI one replaces the keyword score when done)"""
+    result = _oral_exam_result(job_id, g.current_user['user_id'])
+    if result is None:
+        return jsonify({'error': 'Evaluation job not found'}), 404
+    return jsonify(result)
+
+@app.route('/api/oral-exam/result/<int:job_id>/events', methods=['GET'])
+@login_required
+def oral_exam_result_events(job_id):
+    """Server-sent events: the result on every status change, until it is no longer pending"""
+    user_id = g.current_user['user_id']
+    if _oral_exam_result(job_id, user_id) is None:
+        return jsonify({'error': 'Evaluation job not found'}), 404
+    
+    def events():
+        deadline, last = time.monotonic() + ORAL_EXAM_EVENTS_TIMEOUT, None
+        while True:
+            result = _oral_exam_result(job_id, user_id)
+            if result != last:
+                yield f"event: evaluation\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+                last = result
+            if result['status'] != 'pending' or time.monotonic() > deadline:
+                return
+            time.sleep(0.25)  # workers do not notify: poll
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ===============================================
+# API ROUTES - BATTLES (MATCHMAKING, ROOMS, LEADERBOARD)
+# ===============================================
+
+matchmaker = Matchmaker(base_window=MATCH_BASE_WINDOW, widen_per_second=MATCH_WINDOW_GROWTH,
+                        max_window=MATCH_MAX_WINDOW)
+
+leaderboard = Leaderboard()
+
+def load_leaderboard():
+    """Rebuild the boards: every player's rating plus the battle results of the longest period"""
+    if STORAGE_BACKEND == 'github' and github_store:
+        # No battle history in the repository layout: the period boards fill from battles saved by this worker
+        users = (github_store.read_user_by_id(uid, shared=True)
+                 for uid in github_store.read_users_index().get('usernames', {}).values())
+        players = [_leaderboard_player(_user_context(u)) for u in users if u]
+        results = []
+    else:
+        players = [{'id': uid, 'username': username, 'avatar': avatar, 'rating': rating, 'wins': wins, 'losses': losses}
+                   for uid, username, avatar, rating, wins, losses in db.session.query(
+                       User.id, User.username, User.avatar, User.battle_rating, User.battle_wins, User.battle_losses)]
+        since = datetime.utcnow() - timedelta(seconds=max(leaderboard.periods.values()))
+        results = [(to_epoch(ts), uid, won, change) for ts, uid, won, change in db.session.query(
+            BattleResult.timestamp, BattleResult.user_id, BattleResult.is_winner, BattleResult.rating_change
+        ).filter(BattleResult.timestamp >= since)]
+    leaderboard.load(players, results)
+
+def _leaderboard_player(context):
+    return {'id': context['id'], 'username': context['username'], 'avatar': context['avatar'],
+            'rating': context['battle_rating'], 'wins': context['battle_wins'], 'losses': context['battle_losses']}
+
+leaderboard_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='leaderboard')
+_leaderboard_refresh = None  # Future of the running background rebuild
+
+def _refresh_leaderboard():
+    with app.app_context():
+        try:
+            load_leaderboard()
+        except Exception as e:
+            print(f"⚠️ Leaderboard refresh failed: {e}")  # the previous boards stay
+
+def current_leaderboard():
+    """
+    The boards: built in the request the first time; once older than
+    LEADERBOARD_REFRESH they are rebuilt in the background (with GitHub storage
+    that reads every user file) and the current ones are served meanwhile
+    """
+    global _leaderboard_refresh
+    if leaderboard.loaded_at is None:
+        load_leaderboard()
+    elif time.time() - leaderboard.loaded_at > LEADERBOARD_REFRESH and \
+            (_leaderboard_refresh is None or _leaderboard_refresh.done()):
+        # Two requests racing here only queue a second rebuild on the single worker
+        _leaderboard_refresh = leaderboard_pool.submit(_refresh_leaderboard)
+    return leaderboard
+
+def record_battle_results(rows, update_players=True):
+    """Apply saved battle rows to the boards (same win/loss rules as the users table update)"""
+    if leaderboard.loaded_at is None:
+        return  # built from the database on first use
+    for row in rows:
+        leaderboard.record(row['user_id'], row['is_winner'], not row['is_winner'] and row['rating_change'] < 0,
+                           row['rating_change'], update_player=update_players)
+
+def battle_questions(count):
+    """Random questions of one random table, correct answers included (they stay on the server)"""
+    if STORAGE_BACKEND == 'github' and github_store:
+        tables = [t['name'] for t in github_store.question_tables() if t.get('question_count')]
+        table = random.choice(tables) if tables else None
+        bank = github_store.table_question_bank(table) if table else None
+        payloads = bank.table_payloads(table) if bank else []
+        return [BattleQuestion(p['id'], p['text'], p['answers'], bank.correct_answer(bank.get(p['id'])))
+                for p in random.sample(payloads, min(count, len(payloads)))]
+    tables = [t['name'] for t in quiz_table_list()]
+    if not tables:
+        return []
+    return [BattleQuestion(q.id, q.question_text, [q.answer_a, q.answer_b, q.answer_c], q.correct_answer)
+            for q in sample_questions(random.choice(tables), count)]
+
+def persist_battle_result(result):
+    """Both players' BattleResult rows and rating/win/loss updates in one transaction (runs on the battle thread)"""
+    with app.app_context():
+        if STORAGE_BACKEND == 'github' and github_store:
+            # No battle_results in the repository layout: both user files change in one commit
+            for attempt in range(3):
+                files, shas = {}, {}
+                for row in result['players']:
+                    path = f"users/{row['user_id']}.json"
+                    user = github_store.read_json(path, max_age=0)
+                    if user is None:
+                        continue
+                    shas[path] = github_store.cached_sha(path)
+                    user['battle_rating'] = (user.get('battle_rating') or 1500) + row['rating_change']
+                    if row['is_winner']:
+                        user['battle_wins'] = (user.get('battle_wins') or 0) + 1
+                    elif row['rating_change'] < 0:
+                        user['battle_losses'] = (user.get('battle_losses') or 0) + 1
+                    files[path] = user
+                try:
+                    github_store.commit_batch(files, f"Battle {result['battle_id']} result", expected_shas=shas)
+                    break
+                except GitHubConflictError:
+                    if attempt == 2:
+                        raise
+            for row in result['players']:
+                invalidate_user_context(row['user_id'])
+            record_battle_results(result['players'])
+            return
+        try:
+            for row in result['players']:
+                db.session.add(BattleResult(
+                    battle_id=result['battle_id'],
+                    user_id=row['user_id'],
+                    opponent_id=row['opponent_id'],
+                    mode=result['mode'],
+                    score=row['score'],
+                    questions_correct=row['questions_correct'],
+                    total_questions=result['total_questions'],
+                    is_winner=row['is_winner'],
+                    rating_change=row['rating_change']
+                ))
+                user = db.session.get(User, row['user_id'])
+                if user is not None:
+                    # Relative updates, so a concurrent battle of the same player is not lost;
+                    # coalesce, or a NULL column swallows the change
+                    user.battle_rating = db.func.coalesce(User.battle_rating, 1500) + row['rating_change']
+                    if row['is_winner']:
+                        user.battle_wins = db.func.coalesce(User.battle_wins, 0) + 1
+                    elif row['rating_change'] < 0:
+                        user.battle_losses = db.func.coalesce(User.battle_losses, 0) + 1
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        record_battle_results(result['players'])
+
+battle_engine = BattleEngine(token_cache.payload, persist_battle_result, max_rooms=BATTLE_MAX_ROOMS,
+                             time_limit=BATTLE_TIME_LIMIT)
+
+def _create_battle_room(match):
+    """Matchmaker hook: open the WebSocket room for a new pair (no-op without a running battle server)"""
+    if not battle_engine.running:
+        return
+    questions = battle_questions(BATTLE_QUESTIONS)
+    players = {p['id']: p for p in match['players']}
+    if not battle_engine.create_room(match['battle_id'], players, questions):
+        print(f"⚠️ Battle room {match['battle_id']} not created ({len(questions)} questions, {battle_engine.stats()})")
+
+matchmaker.on_match = _create_battle_room
+
+def start_battle_server():
+    """Start the WebSocket battle server in a background thread (once per process)"""
+    if BATTLE_WS_PORT and not battle_engine.running:
+        battle_engine.start_in_thread(BATTLE_WS_HOST, int(BATTLE_WS_PORT))
+        print(f"⚔️ Battle server on {BATTLE_WS_HOST}:{battle_engine.port}" if battle_engine.running
+              else "⚠️ Battle server did not start")
+
+def _battle_status(status):
+    """HTTP status for a matchmaking state: 202 while waiting or while the room opens, 200 otherwise"""
+    if status['status'] == 'matched' and battle_engine.running:
+        status = {**status, 'websocket_url': BATTLE_WS_URL}
+    return jsonify(status), 202 if status['status'] in ('waiting', 'starting') else 200
+
+@app.route('/api/battle/leaderboard', methods=['GET'])
+@login_required
+def battle_leaderboard():
+    """Battle leaderboard page (period: all, week, month) with the caller's exact rank"""
+    period = request.args.get('period', 'all')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    page = current_leaderboard().page(period, limit, offset, user_id=g.current_user['user_id'])
+    rows = []
+    for row in page['rows']:
+        if row['username'] is None:
+            # First seen in a battle after the last rebuild: name and avatar from the user context
+            context = user_context_cache.get(row['user_id']) or {}
+            row.update(username=context.get('username'), avatar=context.get('avatar'))
+        rows.append({key: value for key, value in row.items() if key != 'user_id'})
+    return jsonify({
+        'leaderboard': rows,
+        'period': period if period in leaderboard.periods else 'all',
+        'current_user_rank': page['current_user_rank'],
+        'total_players': page['total_players']
+    })
+
+@app.route('/api/battle/matchmaking/join', methods=['POST'])
+@login_required
+def matchmaking_join():
+    """Queue for a ranked battle; returns the match at once if an opponent is waiting"""
+    user = g.user_context
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    rating = user['battle_rating'] if user['battle_rating'] is not None else 1500
+    return _battle_status(matchmaker.join(user['id'], rating, {
+        'username': user['username'],
+        'avatar': user['avatar']
+    }))
+
+@app.route('/api/battle/matchmaking/poll', methods=['GET'])
+@login_required
+def matchmaking_poll():
+    """Current matchmaking state: waiting (with the current rating window), starting, matched or idle"""
+    return _battle_status(matchmaker.poll(int(g.current_user['user_id'])))
+
+@app.route('/api/battle/matchmaking/cancel', methods=['POST'])
+@login_required
+def matchmaking_cancel():
+    """Leave the queue (a match that was already made is returned with 409)"""
+    uid = int(g.current_user['user_id'])
+    if matchmaker.cancel(uid):
+        return jsonify({'status': 'cancelled'})
+    status = matchmaker.poll(uid)
+    return jsonify(status), 409 if status['status'] in ('matched', 'starting') else 200
+
 # ===============================================
 # INITIALIZATION
 # ===============================================
@@ -933,8 +2228,7 @@ def init_database():
         # Create admin user if not exists
         admin = User.query.filter_by(username='admin').first()
         if not admin:
-            salt = secrets.token_hex(16)
-            password_hash = hashlib.pbkdf2_hmac('sha256', 'admin123'.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+            salt, password_hash = password_policy.hash('admin123')
             
             admin = User(
                 username='admin',
@@ -992,8 +2286,17 @@ def _bootstrap_once():
     if not _BOOTSTRAPPED:
         try:
             ensure_admin_github()
+            ensure_question_shards_github()
         except Exception as e:
             print(f"Bootstrap admin (before_request once) skipped: {e}")
+        try:
+            start_battle_server()
+        except Exception as e:
+            print(f"Battle server skipped: {e}")
+        try:
+            start_job_workers()
+        except Exception as e:
+            print(f"Job workers skipped: {e}")
         _BOOTSTRAPPED = True
 
     
@@ -1046,7 +2349,8 @@ def admin_import_list():
 @app.route('/api/admin/import', methods=['POST'])
 @admin_required
 def admin_import():
-    """Import one or more JSON question banks into GitHub questions.json.
+    """Import one or more JSON question banks into the GitHub question shards.
+    Only the shards of tables receiving questions are read and rewritten.
     Body: { files: ["file1.json", ...] } or { all: true }
     """
     if not (STORAGE_BACKEND == 'github' and github_store):
@@ -1067,12 +2371,13 @@ def admin_import():
             else:
                 files = [fn for fn in os.listdir(imp_dir) if fn.lower().endswith('.json') and fn != '_import_index.json']
 
-        # Load current questions.json (if missing, initialize)
-        data = github_store.read_json('questions.json') or {}
-        quiz_tables = data.get('quiz_tables') or []
-        questions = data.get('questions') or []
-        next_table_id = int(data.get('next_table_id', 1))
-        next_question_id = int(data.get('next_question_id', 1))
+        # Load the question manifest (migrating a legacy questions.json first; if missing, initialize)
+        github_store.migrate_questions_to_shards()
+        manifest = github_store.read_question_manifest(shared=False, max_age=0) or {}
+        manifest_sha = github_store.cached_sha(QUESTIONS_MANIFEST)
+        quiz_tables = manifest.setdefault('quiz_tables', [])
+        next_table_id = int(manifest.get('next_table_id', 1))
+        next_question_id = int(manifest.get('next_question_id', 1))
 
         # Helper: find table by name
         def find_table(name: str):
@@ -1081,13 +2386,24 @@ def admin_import():
                     return t
             return None
 
-        # Build quick dedupe set for existing questions in a table (by text)
+        # Shards touched by this import (table id -> full question list), with
+        # a dedupe set of existing question texts per table
+        changed_shards = {}
+        shard_shas = {}
         existing_by_table = {}
-        for q in questions:
-            tn = q.get('table_name')
-            txt = (q.get('question') or q.get('question_text') or '').strip()
-            if tn and txt:
-                existing_by_table.setdefault(tn, set()).add(txt)
+
+        def load_shard(tbl):
+            if tbl['id'] not in changed_shards:
+                # Fresh read: the commit checks this sha, so a shard another writer changed conflicts
+                shard_path = tbl.get('shard') or github_store.shard_path(tbl['id'])
+                shard = github_store.read_json(shard_path, max_age=0) or {}
+                shard_shas[tbl['id']] = github_store.cached_sha(shard_path)
+                changed_shards[tbl['id']] = shard.get('questions') or []
+                existing_by_table[tbl['name']] = {
+                    (q.get('question') or q.get('question_text') or '').strip()
+                    for q in changed_shards[tbl['id']]
+                }
+            return changed_shards[tbl['id']]
 
         imported = []
         total_new = 0
@@ -1116,8 +2432,7 @@ def admin_import():
 
                 new_count = 0
                 src_questions = src.get('questions') or []
-                # Ensure dedupe set exists
-                existing_by_table.setdefault(table_name, set())
+                questions = load_shard(tbl)
 
                 for q in src_questions:
                     q_text = (q.get('question') or '').strip()
@@ -1126,16 +2441,8 @@ def admin_import():
                     if q_text in existing_by_table[table_name]:
                         # skip duplicates by text
                         continue
-                    ca = q.get('correct_answer')
                     # Normalize correct answer to numeric index
-                    if isinstance(ca, str):
-                        ca_map = {'A': 0, 'a': 0, 'B': 1, 'b': 1, 'C': 2, 'c': 2}
-                        ca_norm = ca_map.get(ca.strip(), None)
-                    else:
-                        try:
-                            ca_norm = int(ca) if ca is not None else None
-                        except Exception:
-                            ca_norm = None
+                    ca_norm = normalize_correct_answer(q.get('correct_answer'))
                     new_q = {
                         'id': next_question_id,
                         'table_name': table_name,
@@ -1152,33 +2459,18 @@ def admin_import():
                     existing_by_table[table_name].add(q_text)
                     next_question_id += 1
                     new_count += 1
-                # Update table question_count (increment by new)
-                try:
-                    tbl['question_count'] = int(tbl.get('question_count', 0)) + new_count
-                except Exception:
-                    tbl['question_count'] = new_count
-
                 total_new += new_count
                 imported.append({'file': fn, 'table': table_name, 'added': new_count})
             except Exception as ie:
                 imported.append({'file': fn, 'status': 'error', 'error': str(ie)})
 
-        # Update metadata
-        metadata = data.get('metadata') or {}
-        metadata['total_questions'] = len(questions)
-        metadata['total_tables'] = len(quiz_tables)
-        metadata['last_updated'] = datetime.utcnow().isoformat()
-        metadata['version'] = metadata.get('version', '1.0.0')
-
-        # Persist back to GitHub
-        out = {
-            'quiz_tables': quiz_tables,
-            'questions': questions,
-            'next_table_id': next_table_id,
-            'next_question_id': next_question_id,
-            'metadata': metadata
-        }
-        github_store.write_json('questions.json', out, message=f'Import questions ({total_new} new)')
+        # Persist changed shards and the manifest (counts, id ranges, shard shas) in one commit
+        manifest['next_table_id'] = next_table_id
+        manifest['next_question_id'] = next_question_id
+        if changed_shards:
+            github_store.commit_question_shards(manifest, changed_shards,
+                                                message=f'Import questions ({total_new} new)',
+                                                manifest_sha=manifest_sha, shard_shas=shard_shas)
 
         return jsonify({'ok': True, 'imported': imported, 'total_added': total_new})
     except Exception as e:
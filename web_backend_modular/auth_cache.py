@@ -0,0 +1,151 @@
+"""
+Caches for authenticated requests.
+
+`login_required`/`admin_required` used to verify the JWT signature on every
+request and most handlers then reloaded the user from the database or the
+GitHub repository. Two small TTL caches remove both steps from the hot path:
+
+  - verified token payloads, keyed by a SHA-256 of the token (the raw token
+    is never kept) and never kept past the token's own `exp`;
+  - a per-user context (role, is_active, rating, settings and the other
+    profile fields), dropped with invalidate() whenever the user changes.
+
+Without a shared store each worker has its own caches, so a change made by
+another worker is only seen after `ttl` seconds; keep the user context TTL
+short. With a SharedStore (see shared_store.py) entries are kept there as
+JSON and an invalidation is seen by every worker at once.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = False  # cached marker for a user that does not exist (JSON-safe)
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU whose entries expire `ttl` seconds after they are stored.
+    Given a SharedStore, values are JSON-encoded under `namespace` in the store
+    instead (its size is then bounded by the store, not `max_entries`).
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000, store=None, namespace: str = ''):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        self.namespace = namespace
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.store is not None:
+            raw = self.store.get(f"{self.namespace}{key}")
+            with self._lock:
+                if raw is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+            return json.loads(raw)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        if self.store is not None:
+            self.store.set(f"{self.namespace}{key}", json.dumps(value).encode('utf-8'), ttl)
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        if self.store is not None:
+            self.store.delete(f"{self.namespace}{key}")
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear(self.namespace)
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TokenCache:
+    """Verified JWT payloads by token hash; `verify` is only called on a miss."""
+
+    def __init__(self, verify: Callable[[str], Optional[dict]], ttl: float = 300.0, max_entries: int = 10000,
+                 store=None):
+        self.verify = verify
+        self.cache = TTLCache(ttl, max_entries, store, namespace='token:')
+
+    def payload(self, token: str) -> Optional[dict]:
+        key = token_key(token)
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload
+        payload = self.verify(token)
+        if payload:
+            # Never serve a payload past its expiry
+            exp = payload.get('exp')
+            remaining = float(exp) - time.time() if isinstance(exp, (int, float)) else self.cache.ttl
+            self.cache.put(key, payload, remaining)
+        return payload
+
+
+class UserContextCache:
+    """Per-user context dicts from `load(user_id)`; callers must not mutate them."""
+
+    def __init__(self, load: Callable[[int], Optional[dict]], ttl: float = 30.0, max_entries: int = 10000,
+                 store=None):
+        self.load = load
+        self.cache = TTLCache(ttl, max_entries, store, namespace='user:')
+        self._generation = 0  # bumped by invalidate() so a load racing with it is not cached
+
+    def get(self, user_id: int) -> Optional[dict]:
+        user_id = int(user_id)
+        context = self.cache.get(user_id)
+        if context is None:
+            generation = self._generation
+            context = self.load(user_id)
+            if generation == self._generation:
+                # Unknown users are cached too, so a stale token cannot force a lookup per request
+                self.cache.put(user_id, _MISSING if context is None else context)
+        return None if context is _MISSING else context
+
+    def invalidate(self, user_id: Optional[int] = None):
+        self._generation += 1
+        if user_id is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(int(user_id))
@@ -0,0 +1,361 @@
+"""
+Real-time battle rooms on asyncio.
+
+A room is created when matchmaking pairs two players (create_room() is
+thread-safe, so Flask handlers can call it). Both players then connect over
+a WebSocket and say hello with their JWT and the battle id. The room pushes
+each question, takes each player's first answer until the question's
+deadline and scores it on the server (QUESTION_POINTS for a correct answer
+plus up to SPEED_BONUS for answering early). After the last question both
+players' results go to `persist` in one call (one transaction) before they
+are announced, so a result the players see is always stored.
+
+Memory per room is bounded: answers live in preallocated per-question
+slots, incoming messages are handled as they arrive (nothing is queued per
+room), a send that does not finish within `send_timeout` drops that
+connection and frames are capped at MAX_MESSAGE_BYTES. At most `max_rooms`
+rooms exist at once and finished rooms are dropped immediately.
+
+Protocol (JSON text frames):
+  client -> {"type": "hello", "token": "<jwt>", "battle_id": "..."}
+  server -> {"type": "joined", "battle_id", "players", "questions", "time_limit"}
+  server -> {"type": "question", "index", "id", "text", "answers", "time_limit_ms"}
+  client -> {"type": "answer", "index", "answer"}
+  server -> {"type": "answer_ack", "index"}            (to the answering player)
+  server -> {"type": "reveal", "index", "correct_answer", "scores"}
+  server -> {"type": "finished", "results"} | {"type": "aborted", "reason"}
+  server -> {"type": "error", "error"} and close       (bad hello)
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+try:
+    from websockets.asyncio.server import serve as _ws_serve
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # the engine itself runs without websockets (e.g. in tests)
+    _ws_serve = None
+    ConnectionClosed = EOFError
+
+QUESTION_POINTS = 100
+SPEED_BONUS = 50
+MAX_MESSAGE_BYTES = 4096
+
+
+class Disconnected(Exception):
+    """The peer went away (raised by connection adapters)."""
+
+
+class BattleQuestion(NamedTuple):
+    id: Any
+    text: str
+    answers: List[str]
+    correct_answer: Optional[int]
+
+
+def score_answer(is_correct: bool, elapsed: float, time_limit: float) -> int:
+    if not is_correct:
+        return 0
+    return QUESTION_POINTS + int(SPEED_BONUS * max(0.0, 1.0 - elapsed / time_limit))
+
+
+def rating_change(winner_rating: int, loser_rating: int, k_factor: int = 32) -> int:
+    """Elo points moving from the loser to the winner (same bounds as calculate_rating_change)"""
+    expected_score = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    return max(5, min(int(k_factor * (1 - expected_score)), 50))
+
+
+class WebSocketConnection:
+    """Adapter from a websockets connection to the engine's send/recv of dicts."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    async def recv(self) -> Any:
+        try:
+            return json.loads(await self.websocket.recv())
+        except ConnectionClosed:
+            raise Disconnected()
+
+    async def send(self, message: Dict[str, Any]):
+        try:
+            await self.websocket.send(json.dumps(message))
+        except ConnectionClosed:
+            raise Disconnected()
+
+    async def close(self):
+        await self.websocket.close()
+
+
+class BattleRoom:
+    """State of one battle; only touched from the engine's event loop."""
+
+    def __init__(self, battle_id: str, players: Dict[int, Dict[str, Any]], questions: List[BattleQuestion],
+                 mode: str = 'ranked', time_limit: float = 15.0):
+        self.battle_id = battle_id
+        self.players = players  # user_id -> profile (with 'rating')
+        self.questions = questions
+        self.mode = mode
+        self.time_limit = time_limit
+        self.answers: Dict[int, List[Optional[tuple]]] = {uid: [None] * len(questions) for uid in players}
+        self.scores = {uid: 0 for uid in players}
+        self.correct = {uid: 0 for uid in players}
+        self.connections: Dict[int, Any] = {}
+        self.index = -1  # question currently accepting answers
+        self.state = 'waiting'  # waiting | running | finished | aborted
+        self.started_at = 0.0
+        self.all_joined = asyncio.Event()
+        self.all_answered = asyncio.Event()
+
+    def attach(self, user_id: int, conn) -> bool:
+        if user_id not in self.players or self.state in ('finished', 'aborted'):
+            return False
+        self.connections[user_id] = conn  # a reconnect replaces the old connection
+        if len(self.connections) == len(self.players):
+            self.all_joined.set()
+        return True
+
+    def detach(self, user_id: int, conn):
+        if self.connections.get(user_id) is conn:
+            del self.connections[user_id]
+            self._check_answered()
+
+    def answer(self, user_id: int, index: Any, answer: Any, now: float) -> bool:
+        # index is -1 between questions (reveal pause); bools are ints too and are not answers
+        if (self.state != 'running' or self.index < 0 or type(index) is not int or index != self.index
+                or type(answer) is not int or user_id not in self.answers or self.answers[user_id][index] is not None):
+            return False
+        elapsed = now - self.started_at
+        if elapsed > self.time_limit:
+            return False
+        self.answers[user_id][index] = (answer, elapsed)
+        self._check_answered()
+        return True
+
+    def _check_answered(self):
+        # Only players still connected are waited for
+        if self.index >= 0 and all(self.answers[uid][self.index] is not None for uid in self.connections):
+            self.all_answered.set()
+
+    def score_question(self, index: int):
+        question = self.questions[index]
+        for uid, answers in self.answers.items():
+            entry = answers[index]
+            is_correct = entry is not None and entry[0] == question.correct_answer
+            self.scores[uid] += score_answer(is_correct, entry[1] if entry else self.time_limit, self.time_limit)
+            self.correct[uid] += int(is_correct)
+
+    def result(self) -> Dict[str, Any]:
+        """Both players' rows for BattleResult (ranked battles move Elo points from loser to winner)"""
+        a, b = self.players
+        winner = a if self.scores[a] > self.scores[b] else b if self.scores[b] > self.scores[a] else None
+        change = 0
+        if winner is not None and self.mode == 'ranked':
+            loser = b if winner == a else a
+            change = rating_change(self.players[winner].get('rating', 1500), self.players[loser].get('rating', 1500))
+        return {
+            'battle_id': self.battle_id,
+            'mode': self.mode,
+            'total_questions': len(self.questions),
+            'players': [{
+                'user_id': uid,
+                'opponent_id': b if uid == a else a,
+                'score': self.scores[uid],
+                'questions_correct': self.correct[uid],
+                'is_winner': uid == winner,
+                'rating_change': 0 if winner is None else (change if uid == winner else -change)
+            } for uid in (a, b)]
+        }
+
+
+class BattleEngine:
+    """Rooms plus the connection handler; serve()/start_in_thread() run it on a WebSocket port."""
+
+    def __init__(self, verify_token: Callable[[str], Optional[dict]], persist: Callable[[Dict[str, Any]], None],
+                 max_rooms: int = 5000, time_limit: float = 15.0, join_timeout: float = 30.0,
+                 hello_timeout: float = 10.0, send_timeout: float = 5.0, reveal_pause: float = 1.5):
+        self.verify_token = verify_token
+        self.persist = persist
+        self.max_rooms = max_rooms
+        self.time_limit = time_limit
+        self.join_timeout = join_timeout
+        self.hello_timeout = hello_timeout
+        self.send_timeout = send_timeout
+        self.reveal_pause = reveal_pause
+        self.rooms: Dict[str, BattleRoom] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.port: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stopped: Optional[asyncio.Event] = None
+        self.counters = {'created': 0, 'finished': 0, 'aborted': 0, 'persist_failures': 0, 'rejected': 0}
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Run rooms on `loop` (default: the running one) without the WebSocket server, e.g. for other transports."""
+        self.loop = loop or asyncio.get_running_loop()
+
+    def create_room(self, battle_id: str, players: Dict[int, Dict[str, Any]], questions: List[BattleQuestion],
+                    mode: str = 'ranked') -> bool:
+        """Register a room and start it on the engine's loop; False when at capacity or not running."""
+        if self.loop is None or len(players) != 2 or not questions:
+            return False
+        with self._lock:
+            if len(self.rooms) >= self.max_rooms or battle_id in self.rooms:
+                self.counters['rejected'] += 1
+                return False
+            room = BattleRoom(battle_id, players, questions, mode, self.time_limit)
+            self.rooms[battle_id] = room
+            self.counters['created'] += 1
+        self.loop.call_soon_threadsafe(lambda: self.loop.create_task(self._run_room(room)))
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'rooms': len(self.rooms), **self.counters}
+
+    # -- room lifecycle --------------------------------------------------------
+
+    async def _run_room(self, room: BattleRoom):
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                await asyncio.wait_for(room.all_joined.wait(), self.join_timeout)
+            except asyncio.TimeoutError:
+                room.state = 'aborted'
+                self.counters['aborted'] += 1
+                await self._broadcast(room, {'type': 'aborted', 'reason': 'opponent_missing'})
+                return
+            room.state = 'running'
+            for index, question in enumerate(room.questions):
+                if not room.connections:
+                    break  # everybody left: the remaining questions score zero
+                room.all_answered.clear()
+                room.index, room.started_at = index, loop.time()
+                await self._broadcast(room, {
+                    'type': 'question', 'index': index, 'id': question.id, 'text': question.text,
+                    'answers': question.answers, 'time_limit_ms': int(room.time_limit * 1000)
+                })
+                try:
+                    await asyncio.wait_for(room.all_answered.wait(), room.time_limit)
+                except asyncio.TimeoutError:
+                    pass
+                room.index = -1
+                room.score_question(index)
+                await self._broadcast(room, {'type': 'reveal', 'index': index, 'correct_answer': question.correct_answer,
+                                             'scores': {str(uid): score for uid, score in room.scores.items()}})
+                if self.reveal_pause and index + 1 < len(room.questions):
+                    await asyncio.sleep(self.reveal_pause)
+            room.state = 'finished'
+            result = room.result()
+            try:
+                await asyncio.to_thread(self.persist, result)
+            except Exception as e:
+                self.counters['persist_failures'] += 1
+                print(f"⚠️ Battle {room.battle_id} result not saved: {e}")
+                await self._broadcast(room, {'type': 'aborted', 'reason': 'result_not_saved'})
+                return
+            self.counters['finished'] += 1
+            await self._broadcast(room, {'type': 'finished', 'results': result['players']})
+        finally:
+            with self._lock:
+                self.rooms.pop(room.battle_id, None)
+            for conn in list(room.connections.values()):
+                await self._close(conn)
+            room.connections.clear()
+
+    async def _send(self, room: Optional[BattleRoom], user_id: Optional[int], conn, message: Dict[str, Any]):
+        try:
+            await asyncio.wait_for(conn.send(message), self.send_timeout)
+        except (Disconnected, asyncio.TimeoutError, OSError):
+            # Slow or gone: drop the connection rather than buffer for it
+            if room is not None:
+                room.detach(user_id, conn)
+            await self._close(conn)
+
+    async def _broadcast(self, room: BattleRoom, message: Dict[str, Any]):
+        await asyncio.gather(*(self._send(room, uid, conn, message) for uid, conn in list(room.connections.items())))
+
+    @staticmethod
+    async def _close(conn):
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    # -- connections -----------------------------------------------------------
+
+    async def handle(self, conn):
+        """Serve one player connection: hello, then answers until the room ends or the peer leaves."""
+        room, user_id = None, None
+        try:
+            hello = await asyncio.wait_for(conn.recv(), self.hello_timeout)
+            payload = None
+            if isinstance(hello, dict) and hello.get('type') == 'hello' and isinstance(hello.get('token'), str):
+                payload = self.verify_token(hello['token'])
+            if not payload:
+                await self._send(None, None, conn, {'type': 'error', 'error': 'Invalid token'})
+                return
+            user_id = int(payload['user_id'])
+            room = self.rooms.get(str(hello.get('battle_id')))
+            if room is None or not room.attach(user_id, conn):
+                room = None
+                await self._send(None, None, conn, {'type': 'error', 'error': 'Unknown battle'})
+                return
+            await self._send(room, user_id, conn, {
+                'type': 'joined', 'battle_id': room.battle_id, 'players': list(room.players.values()),
+                'questions': len(room.questions), 'time_limit': room.time_limit
+            })
+            loop = asyncio.get_running_loop()
+            while room.state in ('waiting', 'running'):
+                message = await conn.recv()
+                if isinstance(message, dict) and message.get('type') == 'answer':
+                    if room.answer(user_id, message.get('index'), message.get('answer'), loop.time()):
+                        await self._send(room, user_id, conn, {'type': 'answer_ack', 'index': message['index']})
+        except (Disconnected, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            if room is not None:
+                room.detach(user_id, conn)
+            await self._close(conn)
+
+    # -- server ----------------------------------------------------------------
+
+    async def serve(self, host: str, port: int, ready: Optional[threading.Event] = None):
+        """Run the WebSocket server until stop() is called."""
+        if _ws_serve is None:
+            raise RuntimeError("the battle server needs the 'websockets' package")
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        async def handler(websocket):
+            await self.handle(WebSocketConnection(websocket))
+
+        try:
+            async with _ws_serve(handler, host, port, max_size=MAX_MESSAGE_BYTES, max_queue=4) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                if ready is not None:
+                    ready.set()
+                await self._stopped.wait()
+        finally:
+            self.loop = None
+            if ready is not None:
+                ready.set()
+
+    def start_in_thread(self, host: str, port: int, timeout: float = 10.0) -> threading.Thread:
+        """Run serve() on its own event loop in a daemon thread (next to the Flask app)."""
+        ready = threading.Event()
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve(host, port, ready)),
+                                  name='battle-server', daemon=True)
+        thread.start()
+        ready.wait(timeout)
+        return thread
+
+    def stop(self):
+        loop, stopped = self.loop, self._stopped
+        if loop is not None and stopped is not None:
+            loop.call_soon_threadsafe(stopped.set)
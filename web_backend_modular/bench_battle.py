@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: concurrent WebSocket battles against a local battle server.
+
+Starts BattleEngine on a free localhost port (persist is a no-op, so only
+the engine and the WebSocket layer are measured) and runs `--rooms` battles,
+`--concurrency` of them at a time. Each battle is two client connections
+that say hello, answer every question as soon as it arrives and wait for
+the result. Reports finished rooms per second, the answer -> answer_ack
+round trip (p50/p95/max) and the peak number of open rooms; the memory of
+`--idle-rooms` rooms with no connections is measured with tracemalloc to
+show the per-room state cost.
+
+Usage: python bench_battle.py [--rooms 1000] [--concurrency 200] [--questions 5] [--idle-rooms 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+async def play(url, token, battle_id, latencies, rng):
+    from websockets.asyncio.client import connect
+
+    async with connect(url) as ws:
+        await ws.send(json.dumps({'type': 'hello', 'token': token, 'battle_id': battle_id}))
+        sent_at = None
+        async for raw in ws:
+            message = json.loads(raw)
+            if message['type'] == 'question':
+                sent_at = time.perf_counter()
+                await ws.send(json.dumps({'type': 'answer', 'index': message['index'], 'answer': rng.randrange(3)}))
+            elif message['type'] == 'answer_ack' and sent_at is not None:
+                latencies.append(time.perf_counter() - sent_at)
+            elif message['type'] in ('finished', 'aborted', 'error'):
+                return message['type']
+    return 'closed'
+
+
+async def run_swarm(engine, questions, rooms, concurrency):
+    url = f"ws://127.0.0.1:{engine.port}"
+    latencies, outcomes, peak = [], {}, 0
+    limit = asyncio.Semaphore(concurrency)
+    rng = random.Random(3)
+
+    async def battle(n):
+        nonlocal peak
+        async with limit:
+            battle_id = f"bench_{n}"
+            a, b = 2 * n + 1, 2 * n + 2
+            players = {a: {'id': a, 'rating': 1500}, b: {'id': b, 'rating': 1500}}
+            if not engine.create_room(battle_id, players, questions):
+                outcomes['rejected'] = outcomes.get('rejected', 0) + 1
+                return
+            peak = max(peak, engine.stats()['rooms'])
+            results = await asyncio.gather(play(url, str(a), battle_id, latencies, rng),
+                                           play(url, str(b), battle_id, latencies, rng))
+            for result in results:
+                outcomes[result] = outcomes.get(result, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(battle(n) for n in range(rooms)))
+    return time.perf_counter() - start, latencies, outcomes, peak
+
+
+def idle_room_memory(count, questions):
+    """Bytes allocated per room that has been created but not joined yet"""
+    from battle_engine import BattleEngine
+
+    async def create():
+        engine = BattleEngine(lambda token: None, lambda result: None, max_rooms=count, join_timeout=3600)
+        engine.bind()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for n in range(count):
+            engine.create_room(f"idle_{n}", {2 * n: {'rating': 1500}, 2 * n + 1: {'rating': 1500}}, questions)
+        await asyncio.sleep(0.1)  # let the room tasks start and park on all_joined
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        for task in asyncio.all_tasks() - {asyncio.current_task()}:
+            task.cancel()
+        return used / count
+
+    return asyncio.run(create())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200, help='battles running at the same time')
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--idle-rooms', type=int, default=5000)
+    args = parser.parse_args()
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        print("websockets is not installed: pip install websockets")
+        return 1
+    from battle_engine import BattleEngine, BattleQuestion
+
+    questions = [BattleQuestion(i, f"Otázka {i}", ['A', 'B', 'C'], i % 3) for i in range(args.questions)]
+    engine = BattleEngine(lambda token: {'user_id': int(token)}, lambda result: None,
+                          max_rooms=args.concurrency, time_limit=5, reveal_pause=0)
+    engine.start_in_thread('127.0.0.1', 0)
+    try:
+        elapsed, latencies, outcomes, peak = asyncio.run(
+            run_swarm(engine, questions, args.rooms, args.concurrency))
+    finally:
+        engine.stop()
+
+    print(f"rooms={args.rooms} concurrency={args.concurrency} questions={args.questions}")
+    print(f"{'rooms/s':>8}  {'peak rooms':>10}  {'ack p50 ms':>10}  {'ack p95 ms':>10}  {'ack max ms':>10}  outcomes")
+    print(f"{args.rooms / elapsed:>8.1f}  {peak:>10}  {_pct(latencies, 0.5) * 1e3:>10.2f}"
+          f"  {_pct(latencies, 0.95) * 1e3:>10.2f}  {max(latencies, default=0) * 1e3:>10.2f}  {outcomes}")
+    print(f"engine: {engine.stats()}")
+    print(f"idle room state: {idle_room_memory(args.idle_rooms, questions) / 1024:.1f} KiB/room "
+          f"({args.idle_rooms} rooms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
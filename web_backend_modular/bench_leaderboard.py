@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: leaderboard updates, rank lookups and pages per board size.
+
+For each size a board of players (ratings ~ N(1500, 250)) is loaded and
+three operations are timed over random players:
+  - update: a battle result moves the player to a new rating (RankedBoard.set)
+  - rank:   the exact rank of any player
+  - page:   50 rows at a random offset
+
+RankedBoard (sorted blocks + Fenwick tree) is compared with a single sorted
+list kept with bisect.insort (O(n) element moves per update), and with
+sorting all players on every request, which is what the endpoint used to do.
+
+Usage: python bench_leaderboard.py [--sizes 10000,100000,1000000] [--ops 20000]
+"""
+
+import argparse
+import bisect
+import random
+import sys
+import time
+
+
+class FlatBoard:
+    """One sorted list of (key, user_id): bisect lookups, O(n) moves on update."""
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}
+
+    def load(self, keys):
+        self._keys = dict(keys)
+        self._entries = sorted((key, uid) for uid, key in self._keys.items())
+
+    def set(self, user_id, key):
+        old = self._keys.pop(user_id, None)
+        if old is not None:
+            del self._entries[bisect.bisect_left(self._entries, (old, user_id))]
+        if key is not None:
+            self._keys[user_id] = key
+            bisect.insort(self._entries, (key, user_id))
+
+    def rank(self, user_id):
+        key = self._keys.get(user_id)
+        return None if key is None else bisect.bisect_left(self._entries, (key, user_id)) + 1
+
+    def top(self, limit, offset=0):
+        return [uid for _, uid in self._entries[offset:offset + limit]]
+
+
+def _us_per_op(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(*arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--ops', type=int, default=20000)
+    args = parser.parse_args()
+
+    from leaderboard import RankedBoard
+
+    print(f"{'players':>8}  {'board':>6}  {'update us':>9}  {'rank us':>7}  {'page us':>7}  {'sort/request ms':>15}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        rng = random.Random(size)
+        ratings = {uid: int(rng.gauss(1500, 250)) for uid in range(size)}
+        updates = [(rng.randrange(size), (-int(rng.gauss(1500, 250)),)) for _ in range(args.ops)]
+        lookups = [(rng.randrange(size),) for _ in range(args.ops)]
+        pages = [(50, rng.randrange(size)) for _ in range(args.ops)]
+
+        start = time.perf_counter()
+        sorted(ratings.items(), key=lambda item: -item[1])[:50]
+        sort_ms = (time.perf_counter() - start) * 1000
+
+        for name, board in (('blocks', RankedBoard()), ('flat', FlatBoard())):
+            board.load({uid: (-rating,) for uid, rating in ratings.items()})
+            update_us = _us_per_op(board.set, updates)
+            rank_us = _us_per_op(board.rank, lookups)
+            page_us = _us_per_op(board.top, pages)
+            print(f"{size:>8}  {name:>6}  {update_us:>9.2f}  {rank_us:>7.2f}  {page_us:>7.2f}  {sort_ms:>15.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
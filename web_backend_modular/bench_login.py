@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: login throughput under concurrency with the password hashing pool.
+
+Starts the app on a threaded local server (SQLite, rate limiting off), creates
+one user per client and fires concurrent logins while a probe thread measures
+/api/health latency, i.e. how much a login burst slows everything else.
+Each pool configuration is run in turn; "unbounded" gives every client its
+own hashing thread (the behaviour without back-pressure).
+
+Usage: python bench_login.py [--clients 32] [--logins 256] [--pools 1:16,2:16,4:16,unbounded]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def run(base_url, clients, logins):
+    latencies, statuses = [], []
+    health = []
+    stop = threading.Event()
+
+    def probe():
+        session = requests.Session()
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(f"{base_url}/api/health")
+            health.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    def login(i):
+        start = time.perf_counter()
+        r = requests.post(f"{base_url}/api/auth/login", json={'username': f'bench{i % clients}', 'password': 'bench-pass'})
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses.append(r.status_code)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    ok = statuses.count(200)
+    return {
+        'ok_per_s': ok / elapsed,
+        'ok': ok,
+        'busy_503': statuses.count(503),
+        'p50_ms': statistics.median(latencies),
+        'p95_ms': _pct(latencies, 0.95),
+        'health_p95_ms': _pct(health, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=256)
+    parser.add_argument('--pools', default='1:16,2:16,4:16,unbounded', help='workers:queue entries, comma separated')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}"
+    os.environ['STORAGE_BACKEND'] = 'sql'
+    import app as app_module
+    from password_hashing import HashingPool
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app_module.limiter.enabled = False
+    with app_module.app.app_context():
+        app_module.db.create_all()
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    for i in range(args.clients):
+        requests.post(f"{base_url}/api/auth/register", json={'username': f'bench{i}', 'password': 'bench-pass'})
+
+    print(f"clients={args.clients} logins={args.logins} cpus={os.cpu_count()}")
+    print(f"{'pool':>10}  {'logins/s':>9}  {'ok':>5}  {'503':>5}  {'p50 ms':>8}  {'p95 ms':>8}  {'health p95 ms':>14}")
+    for spec in args.pools.split(','):
+        if spec == 'unbounded':
+            workers, queue = args.clients, args.logins
+        else:
+            workers, queue = (int(x) for x in spec.split(':'))
+        app_module.password_pool = HashingPool(workers=workers, max_queue=queue)
+        r = run(base_url, args.clients, args.logins)
+        print(f"{spec:>10}  {r['ok_per_s']:>9.1f}  {r['ok']:>5}  {r['busy_503']:>5}  {r['p50_ms']:>8.1f}"
+              f"  {r['p95_ms']:>8.1f}  {r['health_p95_ms']:>14.1f}")
+        app_module.password_pool.shutdown()
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: matchmaking with 10k concurrently queued players.
+
+Simulated time: `--players` players (ratings ~ N(1500, 250)) all join
+within the first second and every waiting player polls once per simulated
+second until matched. The rating window starts at `--base-window` (0 by
+default, so the whole crowd is queued at once) and widens by `--growth`
+points per second. Reports the real CPU cost per join/poll, the peak number
+of queued players, the simulated wait until a match and the rating gap of
+the pairs.
+
+The same arrivals are also run through a naive queue that scans every
+waiting player for the closest rating (what a flat list needs), for
+comparison of the per-operation cost at that queue size.
+
+Usage: python bench_matchmaking.py [--players 10000] [--base-window 0] [--growth 5] [--skip-naive]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def simulate(mm, clock, ratings):
+    """Run the arrivals through `mm`; returns (ops, cpu seconds, waits, rating gaps, peak queue)."""
+    rng = random.Random(1)
+    arrivals = sorted((rng.random(), i) for i in range(len(ratings)))
+    waiting = set()
+    waits, gaps = [], []
+    ops, cpu, peak = 0, 0.0, 0
+    next_arrival = 0
+    tick = 0
+    while next_arrival < len(arrivals) or waiting:
+        tick += 1
+        clock.now = float(tick)
+        start = time.perf_counter()
+        # Everyone already waiting polls once this second
+        for uid in list(waiting):
+            if uid not in waiting:
+                continue  # matched earlier in this tick by another player's poll
+            status = mm.poll(uid)
+            ops += 1
+            if status['status'] == 'matched':
+                waiting.discard(uid)
+                waiting.discard(status['opponent']['id'])
+                waits.append(status['opponent']['waited'])
+                gaps.append(abs(status['rating'] - status['opponent']['rating']))
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= tick:
+            uid = arrivals[next_arrival][1]
+            next_arrival += 1
+            status = mm.join(uid, ratings[uid], {})
+            ops += 1
+            if status['status'] == 'matched':
+                waiting.discard(status['opponent']['id'])
+                waits.append(status['opponent']['waited'])
+                gaps.append(abs(status['rating'] - status['opponent']['rating']))
+            else:
+                waiting.add(uid)
+        cpu += time.perf_counter() - start
+        peak = max(peak, len(waiting))
+        if tick > 600:
+            break
+    return ops, cpu, waits, gaps, peak
+
+
+class NaiveQueue:
+    """Flat list of waiting players; every search scans the whole list."""
+
+    def __init__(self, matchmaker):
+        self.mm = matchmaker  # only for its window() and match bookkeeping semantics
+        self.waiting = {}
+        self.matches = {}
+
+    def join(self, uid, rating, profile):
+        self.waiting.setdefault(uid, (rating, self.mm.clock()))
+        return self.poll(uid)
+
+    def poll(self, uid):
+        if uid in self.matches:
+            return self.matches[uid]
+        rating, joined = self.waiting[uid]
+        window = self.mm.window(self.mm.clock() - joined)
+        best = min(((abs(r - rating), other) for other, (r, _) in self.waiting.items() if other != uid),
+                   default=None)
+        if best is None or best[0] > window:
+            return {'status': 'waiting'}
+        other = best[1]
+        other_rating, other_joined = self.waiting.pop(other)
+        del self.waiting[uid]
+        now = self.mm.clock()
+        self.matches[other] = {'status': 'matched', 'rating': other_rating,
+                               'opponent': {'id': uid, 'rating': rating, 'waited': now - joined}}
+        return {'status': 'matched', 'rating': rating,
+                'opponent': {'id': other, 'rating': other_rating, 'waited': now - other_joined}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--base-window', type=float, default=0.0)
+    parser.add_argument('--growth', type=float, default=5.0, help='window growth in rating points per second')
+    parser.add_argument('--skip-naive', action='store_true', help='only run the bucketed matchmaker')
+    args = parser.parse_args()
+
+    from matchmaking import Matchmaker
+
+    rng = random.Random(7)
+    ratings = [rng.gauss(1500, 250) for _ in range(args.players)]
+    print(f"players={args.players} base_window={args.base_window} growth={args.growth}/s")
+    print(f"{'queue':>8}  {'ops':>7}  {'us/op':>8}  {'peak queue':>10}  {'matched':>7}"
+          f"  {'wait p50 s':>10}  {'wait p95 s':>10}  {'gap p50':>7}  {'gap p95':>7}")
+    runs = [('buckets', lambda mm: mm)] + ([] if args.skip_naive else [('naive', NaiveQueue)])
+    for name, wrap in runs:
+        clock = SimClock()
+        # Nobody goes stale in simulated time: every waiting player polls each tick
+        mm = Matchmaker(base_window=args.base_window, widen_per_second=args.growth, clock=clock,
+                        stale_after=10 ** 9, match_ttl=10 ** 9)
+        ops, cpu, waits, gaps, peak = simulate(wrap(mm), clock, ratings)
+        print(f"{name:>8}  {ops:>7}  {cpu / ops * 1e6:>8.1f}  {peak:>10}  {len(waits) * 2:>7}"
+              f"  {statistics.median(waits):>10.1f}  {_pct(waits, 0.95):>10.1f}"
+              f"  {statistics.median(gaps):>7.1f}  {_pct(gaps, 0.95):>7.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
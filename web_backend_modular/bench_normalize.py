@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: word overlap of the local evaluators, old normalizer versus text_normalize.
+
+Every question of the admin_import_ready exports is scored against each of
+its answer options (the correct one and the distractors stand in for user
+answers), the way evaluate_answer_locally compares them:
+  - legacy:    the former inline normalize_text (dict rebuilt per call,
+               15 str.replace passes, two re.sub) on both texts
+  - normalize: common_words(): the correct answer's words cached by
+               answer_tokens(), one translate pass and split() per answer
+
+Pairs the two score differently (letters the old table did not fold) are counted.
+
+Usage: python bench_normalize.py [--repeat 20]
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from text_normalize import answer_tokens, common_words
+
+IMPORT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'admin_import_ready'))
+
+
+def legacy_normalize_text(text):
+    """normalize_text as it was inlined in evaluate_answer_locally"""
+    import re
+
+    if not text:
+        return ''
+    text = text.lower()
+    replacements = {
+        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u', 'ý': 'y',
+        'ě': 'e', 'š': 's', 'č': 'c', 'ř': 'r', 'ž': 'z', 'ů': 'u',
+        'ň': 'n', 'ť': 't', 'ď': 'd'
+    }
+    for czech, ascii_char in replacements.items():
+        text = text.replace(czech, ascii_char)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_overlap(correct_answer, user_answer):
+    correct_words = set(legacy_normalize_text(correct_answer).split())
+    user_words = set(legacy_normalize_text(user_answer).split())
+    return len(correct_words & user_words), len(correct_words)
+
+
+def overlap(correct_answer, user_answer):
+    return len(common_words(correct_answer, user_answer)), len(answer_tokens(correct_answer))
+
+
+def load_pairs():
+    """(correct answer, candidate answer) for every option of every exported question"""
+    pairs = []
+    for path in sorted(glob.glob(os.path.join(IMPORT_DIR, '*.json'))):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for question in (data.get('questions') or []) if isinstance(data, dict) else []:
+            options = [question.get(f'answer_{letter}') or '' for letter in 'abc']
+            correct = str(question.get('correct_answer', '')).strip().lower()
+            if correct in ('a', 'b', 'c'):
+                correct_text = options['abc'.index(correct)]
+                pairs.extend((correct_text, option) for option in options)
+    return pairs
+
+
+def _timeit(fn, pairs, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for correct_answer, user_answer in pairs:
+            fn(correct_answer, user_answer)
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)  # the least disturbed run, as timeit recommends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pairs = load_pairs()
+    if not pairs:
+        print(f"No questions found in {IMPORT_DIR}")
+        return 1
+    mismatches = sum(1 for pair in pairs if overlap(*pair) != legacy_overlap(*pair))
+
+    legacy = _timeit(legacy_overlap, pairs, args.repeat)
+    answer_tokens.cache_clear()
+    start = time.perf_counter()
+    for correct_answer, user_answer in pairs:
+        overlap(correct_answer, user_answer)
+    cold = (time.perf_counter() - start) * 1000
+    warm = _timeit(overlap, pairs, args.repeat)
+
+    print(f"{len(pairs)} answer pairs, {mismatches} scored differently")
+    print(f"{'':>10}  {'ms/pass':>9}  {'us/pair':>8}  {'speedup':>8}")
+    for name, ms in (('legacy', legacy), ('cold', cold), ('normalize', warm)):
+        print(f"{name:>10}  {ms:>9.2f}  {ms * 1000 / len(pairs):>8.2f}  {legacy / ms:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
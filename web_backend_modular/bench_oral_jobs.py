@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: oral exam evaluation jobs on a local SQLite queue.
+
+`--producers` threads enqueue `--jobs` jobs as fast as they can (what
+submit_oral_audio does after storing the keyword score), while `--workers`
+JobWorkers threads run a handler that sleeps `--ai-latency` seconds in place
+of the Monica call. Reports submissions per second, the enqueue latency
+(p50/p95/max) and how long the workers took to drain the queue. The
+synchronous baseline is one request per AI call: at most
+producers / ai_latency requests per second.
+
+Usage: python bench_oral_jobs.py [--jobs 2000] [--producers 8] [--workers 8] [--ai-latency 0.05]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--ai-latency', type=float, default=0.05, help='seconds the fake AI call takes')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from job_queue import DONE, JobQueue, JobWorkers
+
+    path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    queue = JobQueue(create_engine(f"sqlite:///{path}"))
+    queue.engine()
+    workers = JobWorkers(queue, {'oral_exam': lambda payload, job: time.sleep(args.ai_latency) or {'status': 'upgraded'}},
+                         workers=args.workers, poll_interval=0.05)
+    latencies, lock = [], threading.Lock()
+
+    def produce(count):
+        mine = []
+        for n in range(count):
+            start = time.perf_counter()
+            queue.enqueue('oral_exam', {'oral_exam_id': n, 'user_id': 1})
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    workers.start()
+    started = time.perf_counter()
+    producers = [threading.Thread(target=produce, args=(args.jobs // args.producers,)) for _ in range(args.producers)]
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+    submitted = time.perf_counter() - started
+    total = len(latencies)
+    while queue.counts()[DONE] < total:
+        time.sleep(0.02)
+    drained = time.perf_counter() - started
+    workers.stop()
+
+    print(f"jobs={total} producers={args.producers} workers={args.workers} ai_latency={args.ai_latency}s")
+    print(f"submissions/s    {total / submitted:>8.0f}   (synchronous AI: <= {args.producers / args.ai_latency:.0f}/s)")
+    print(f"enqueue ms       p50 {_pct(latencies, 0.5) * 1e3:.2f}  p95 {_pct(latencies, 0.95) * 1e3:.2f}"
+          f"  max {max(latencies) * 1e3:.2f}")
+    print(f"drained in       {drained:>8.2f} s  ({total / drained:.0f} evaluations/s, "
+          f"bound {args.workers / args.ai_latency:.0f}/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
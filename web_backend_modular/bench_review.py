@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: due-queue selection for mode=review with 100k progress rows per user.
+
+Measures both backends' selection step on one user:
+  - SQL: due_review_question_ids() against review_states on a SQLite file
+    (the ix_review_states_due index), 100k progress rows over 100k questions
+  - GitHub: ReviewQueue.due() of a ProgressIndex built from a summary of the
+    same 100k entries
+
+Usage: python bench_review.py [--rows 100000] [--limit 20] [--budget-ms 1.0]
+Exits non-zero if a median selection time exceeds the budget.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def _progress_rows(rows, start):
+    rng = random.Random(42)
+    for i in range(rows):
+        yield {
+            'question_id': i + 1,
+            'is_correct': rng.random() < 0.7,
+            'response_time': rng.uniform(2, 20),
+            'timestamp': (start + timedelta(seconds=rng.uniform(0, 30 * 86400))).isoformat()
+        }
+
+
+def bench_sql(rows, limit, repeat):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_review.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['STORAGE_BACKEND'] = 'sql'
+    import app as app_module
+    from review_scheduler import next_schedule, to_epoch, from_epoch
+
+    start = datetime.utcnow() - timedelta(days=30)
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        states = []
+        for entry in _progress_rows(rows, start):
+            s = next_schedule(None, entry['is_correct'], to_epoch(datetime.fromisoformat(entry['timestamp'])),
+                              entry['response_time'])
+            states.append({
+                'user_id': 1, 'question_id': entry['question_id'], 'table_name': 'bench',
+                'ease': s.ease, 'interval_days': s.interval, 'repetitions': s.repetitions,
+                'last_reviewed': from_epoch(s.reviewed_at), 'due_at': from_epoch(s.due)
+            })
+        app_module.db.session.execute(app_module.ReviewState.__table__.insert(), states)
+        app_module.db.session.commit()
+
+        now = time.time()
+        due = app_module.due_review_question_ids(1, 'bench', now, limit)
+        assert len(due) == limit
+        return _timeit(lambda: app_module.due_review_question_ids(1, 'bench', now, limit), repeat)
+
+
+def bench_github(rows, limit, repeat):
+    from progress_log import ProgressIndex, summary_from_entries
+
+    summary, _ = summary_from_entries(list(_progress_rows(rows, datetime.utcnow() - timedelta(days=30))))
+    index = ProgressIndex(summary)
+    eligible = {i + 1: None for i in range(rows)}
+    now = time.time()
+    assert len(index.schedule.due(now, eligible, limit)) == limit
+    return _timeit(lambda: index.schedule.due(now, eligible, limit), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--budget-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    ok = True
+    for name, bench in (('sql', bench_sql), ('github', bench_github)):
+        median, p99 = bench(args.rows, args.limit, args.repeat)
+        within = median < args.budget_ms
+        ok = ok and within
+        print(f"{name:7s} rows={args.rows} limit={args.limit}  median={median:.3f} ms  p99={p99:.3f} ms"
+              f"  {'OK' if within else 'OVER BUDGET'}")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ORDER BY random() versus sampling from the cached id array.
+
+For each table size a fresh SQLite table is filled and both ways of picking
+`limit` random questions are timed:
+  - order_by: Question.query.filter_by(table_name=...).order_by(random()).limit(n)
+  - sampler:  sample_questions() (cached id array + one IN query); the
+              one-off cost of loading the id array is reported separately
+
+Usage: python bench_sampling.py [--sizes 10000,100000,1000000] [--limit 20]
+Point DATABASE_URL at PostgreSQL to benchmark there instead of SQLite.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def _timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_sampling.db')}"
+    os.environ.setdefault('STORAGE_BACKEND', 'sql')
+    import app as app_module
+    from app import db, Question
+
+    print(f"{'rows':>9}  {'order_by ms':>12}  {'sampler ms':>11}  {'speedup':>8}  {'id load ms':>11}")
+    with app_module.app.app_context():
+        db.create_all()
+        for size in (int(s) for s in args.sizes.split(',')):
+            table = f'bench_{size}'
+            Question.query.filter_by(table_name=table).delete()
+            db.session.execute(Question.__table__.insert(), [{
+                'table_name': table, 'question_text': f'Question {i}', 'answer_a': 'a', 'answer_b': 'b',
+                'answer_c': 'c', 'correct_answer': i % 3, 'difficulty': 'medium'
+            } for i in range(size)])
+            db.session.commit()
+
+            order_by = _timeit(lambda: Question.query.filter_by(table_name=table)
+                               .order_by(db.func.random()).limit(args.limit).all(), args.repeat)
+            app_module.question_sampler.invalidate(table)
+            start = time.perf_counter()
+            app_module.question_sampler.ids(table)
+            id_load = (time.perf_counter() - start) * 1000
+            sampled = _timeit(lambda: app_module.sample_questions(table, args.limit), args.repeat)
+            print(f"{size:>9}  {order_by:>12.3f}  {sampled:>11.3f}  {order_by / sampled:>7.1f}x  {id_load:>11.1f}")
+
+            Question.query.filter_by(table_name=table).delete()
+            db.session.commit()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Circuit breaker for calls to an external service (the Monica AI API).
+
+While the provider is down or very slow every call still waited for its
+full deadline before the handler fell back to the local evaluator. The
+breaker watches the outcome and latency of the recent calls (the last
+`window` seconds, at most `max_samples` of them) and opens when, over at
+least `min_calls` calls, the error rate reaches `error_rate` or the 95th
+percentile latency reaches `slow_call_seconds`. While open, allow() says
+no and callers take their fallback at once.
+
+After `open_seconds` the breaker goes half-open and lets `probes` calls
+through; if they all succeed in time it closes again, any failure re-opens
+it. State is per process.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class CircuitBreaker:
+    """allow() before a call, then record(ok, latency) after it, or cancel() if it was never made."""
+
+    def __init__(self, error_rate: float = 0.5, slow_call_seconds: float = 8.0, min_calls: int = 10,
+                 window: float = 60.0, max_samples: int = 200, open_seconds: float = 30.0, probes: int = 2,
+                 clock: Callable[[], float] = time.monotonic):
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.probes = max(1, probes)
+        self.clock = clock
+        self.state = CLOSED
+        self._samples: Deque[Tuple[float, bool, float]] = deque(maxlen=max_samples)  # (time, ok, latency)
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    self.short_circuited += 1
+                    return False
+                self.state, self._probes_started, self._probes_passed = HALF_OPEN, 0, 0
+            if self.state == HALF_OPEN:
+                if self._probes_started >= self.probes:
+                    self.short_circuited += 1
+                    return False
+                self._probes_started += 1
+            return True
+
+    def record(self, ok: bool, latency: float):
+        now = self.clock()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not ok or latency >= self.slow_call_seconds:  # a slow probe does not prove recovery
+                    self._open(now)
+                else:
+                    self._probes_passed += 1
+                    if self._probes_passed >= self.probes:
+                        self.state = CLOSED
+                        self._samples.clear()
+                return
+            if self.state == OPEN:
+                return  # a call that started before the breaker opened
+            self._samples.append((now, ok, latency))
+            while self._samples and self._samples[0][0] <= now - self.window:
+                self._samples.popleft()
+            if len(self._samples) >= self.min_calls:
+                failures = sum(1 for _, passed, _ in self._samples if not passed)
+                slow = percentile([lat for _, _, lat in self._samples], 0.95) >= self.slow_call_seconds
+                if failures / len(self._samples) >= self.error_rate or slow:
+                    self._open(now)
+
+    def cancel(self):
+        """A call allow() let through never reached the service: free its probe slot."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_started > self._probes_passed:
+                self._probes_started -= 1
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+        self._samples.clear()
+        self.times_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = [lat for _, _, lat in self._samples]
+            calls = len(self._samples)
+            return {
+                'state': self.state,
+                'calls': calls,
+                'error_rate': round(sum(1 for _, ok, _ in self._samples if not ok) / calls, 3) if calls else 0.0,
+                'latency_p50': percentile(latencies, 0.5),
+                'latency_p95': percentile(latencies, 0.95),
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited
+            }
@@ -0,0 +1,394 @@
+"""
+Shared pytest fixtures: a local HTTP stand-in for the GitHub REST API and the
+Flask app on a throwaway SQLite database.
+
+Only the GitHub endpoints GitHubStorage uses are implemented: Contents API
+GET/PUT (with ETag / If-None-Match) and the Git Data API ref/commit/tree calls.
+FakeRedis likewise implements just the commands RedisStore sends, and
+FakeCompletions the chat completions endpoint the AI client calls, with
+injectable latency and failures.
+"""
+
+import base64
+import fnmatch
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pytest
+from sqlalchemy import event
+
+from github_storage import GitHubStorage, git_blob_sha
+
+
+class FakeGitHub:
+    """In-memory repository with a single branch."""
+
+    def __init__(self, owner="owner", repo="repo", branch="main"):
+        self.prefix = f"/repos/{owner}/{repo}"
+        self.branch = branch
+        self.lock = threading.Lock()
+        self.files = {}  # path -> bytes at branch head
+        self.trees = {"tree0": {}}
+        self.commits = {"c0": {"tree": "tree0", "parents": [], "message": "init"}}
+        self.head = "c0"
+        self.requests = []  # (method, path) log
+        self.before_ref_update = None  # hook(fake) called before a ref PATCH is applied
+        self._seq = 0
+
+    def _next_id(self, kind):
+        self._seq += 1
+        return f"{kind}{self._seq}"
+
+    def _commit(self, files, message):
+        tree_id = self._next_id("tree")
+        self.trees[tree_id] = dict(files)
+        commit_id = self._next_id("c")
+        self.commits[commit_id] = {"tree": tree_id, "parents": [self.head], "message": message}
+        self.head = commit_id
+        self.files = dict(files)
+
+    def commit_count(self):
+        return len(self.commits) - 1
+
+    def put_file(self, path, payload):
+        """Seed a file directly (counts as a commit)."""
+        with self.lock:
+            files = dict(self.files)
+            files[path] = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self._commit(files, f"seed {path}")
+
+    def read_file(self, path):
+        raw = self.files.get(path)
+        return None if raw is None else json.loads(raw.decode("utf-8"))
+
+    def count(self, method, fragment=""):
+        return sum(1 for m, p in self.requests if m == method and fragment in p)
+
+    # -- request handling ----------------------------------------------------
+
+    def handle(self, method, path, headers, body):
+        with self.lock:
+            self.requests.append((method, path))
+            if not path.startswith(self.prefix):
+                return 404, {"message": "Not Found"}, {}
+            rest = path[len(self.prefix):]
+            if rest.startswith("/contents/"):
+                return self._contents(method, rest[len("/contents/"):], headers, body)
+            if rest.startswith("/git/"):
+                return self._git(method, rest[len("/git/"):], body)
+            return 404, {"message": "Not Found"}, {}
+
+    def _contents(self, method, file_path, headers, body):
+        raw = self.files.get(file_path)
+        sha = git_blob_sha(raw) if raw is not None else None
+        if method == "GET":
+            if raw is None:
+                return 404, {"message": "Not Found"}, {}
+            etag = f'"{sha}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, None, {"ETag": etag}
+            return 200, {"path": file_path, "sha": sha, "content": base64.b64encode(raw).decode("ascii")}, {"ETag": etag}
+        if method == "PUT":
+            if raw is not None and body.get("sha") != sha:
+                return 409, {"message": f"{file_path} does not match {body.get('sha')}"}, {}
+            new_raw = base64.b64decode(body["content"])
+            files = dict(self.files)
+            files[file_path] = new_raw
+            self._commit(files, body.get("message", ""))
+            return 200, {"content": {"path": file_path, "sha": git_blob_sha(new_raw)}, "commit": {"sha": self.head}}, {}
+        return 405, {"message": "Method not allowed"}, {}
+
+    def _git(self, method, endpoint, body):
+        ref = f"refs/heads/{self.branch}"
+        if method == "GET" and endpoint == f"ref/heads/{self.branch}":
+            return 200, {"ref": ref, "object": {"sha": self.head, "type": "commit"}}, {}
+        if method == "GET" and endpoint.startswith("commits/"):
+            commit = self.commits.get(endpoint[len("commits/"):])
+            if commit is None:
+                return 404, {"message": "Not Found"}, {}
+            return 200, {"sha": endpoint[len("commits/"):], "tree": {"sha": commit["tree"]}}, {}
+        if method == "POST" and endpoint == "trees":
+            files = dict(self.trees[body["base_tree"]])
+            for item in body["tree"]:
+                if item.get("sha", "") is None:
+                    files.pop(item["path"], None)
+                else:
+                    files[item["path"]] = item["content"].encode("utf-8")
+            tree_id = self._next_id("tree")
+            self.trees[tree_id] = files
+            return 201, {"sha": tree_id}, {}
+        if method == "POST" and endpoint == "commits":
+            commit_id = self._next_id("c")
+            self.commits[commit_id] = {"tree": body["tree"], "parents": body["parents"], "message": body["message"]}
+            return 201, {"sha": commit_id}, {}
+        if method == "PATCH" and endpoint == ref:
+            if self.before_ref_update is not None:
+                hook, self.before_ref_update = self.before_ref_update, None
+                hook(self)
+            commit = self.commits[body["sha"]]
+            if not body.get("force") and self.head not in commit["parents"]:
+                return 422, {"message": "Update is not a fast forward"}, {}
+            self.head = body["sha"]
+            self.files = dict(self.trees[commit["tree"]])
+            return 200, {"ref": ref, "object": {"sha": self.head}}, {}
+        return 404, {"message": "Not Found"}, {}
+
+    def inject_commit(self, path, payload):
+        """Land a foreign commit (call from inside a hook, lock already held)."""
+        files = dict(self.files)
+        files[path] = json.dumps(payload).encode("utf-8")
+        self._commit(files, f"concurrent {path}")
+
+
+def _make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def _dispatch(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            path = unquote(urlparse(self.path).path)
+            status, payload, headers = fake.handle(self.command, path, self.headers, body)
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_PUT = do_POST = do_PATCH = _dispatch
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class FakeRedis:
+    """Thread-safe in-memory stand-in for a redis.Redis client (bytes values, ms expiry)."""
+
+    def __init__(self):
+        self.lock = threading.RLock()  # reentrant: a pipeline runs its queued commands under it
+        self.data = {}  # key -> (bytes, expires_at or None)
+        self.commands = []
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            self.commands.append("GET")
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            self.commands.append("SET")
+            if nx and self._live(key):
+                return None
+            value = value if isinstance(value, bytes) else str(value).encode()
+            self.data[key] = (value, time.time() + px / 1000 if px else None)
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            self.commands.append("DEL")
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def incrby(self, key, amount):
+        with self.lock:
+            self.commands.append("INCRBY")
+            entry = self._live(key) or (b"0", None)
+            value = int(entry[0]) + amount
+            self.data[key] = (str(value).encode(), entry[1])
+            return value
+
+    def pttl(self, key):
+        with self.lock:
+            entry = self._live(key)
+            if entry is None:
+                return -2
+            return -1 if entry[1] is None else int((entry[1] - time.time()) * 1000)
+
+    def scan_iter(self, match="*"):
+        with self.lock:
+            return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match) and self._live(key)]
+
+    def ping(self):
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """MULTI/EXEC on FakeRedis: queued commands run together under the client's lock."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.queued.append((name, args, kwargs))
+
+    def execute(self):
+        with self.redis.lock:
+            self.redis.commands.append("MULTI")
+            results = [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.queued]
+            self.redis.commands.append("EXEC")
+        self.queued = []
+        return results
+
+
+class FakeCompletions:
+    """Chat completions endpoint; `delay` seconds per request, `failures` queues statuses to answer next."""
+
+    DEFAULT_REPLY = json.dumps({"score": 80, "correctness": "correct", "feedback": "Dobře",
+                                "suggestions": ["Více příkladů"], "pronunciation_score": 90,
+                                "grammar_score": 85, "content_score": 80}, ensure_ascii=False)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.delay = 0.0
+        self.failures = deque()  # e.g. 500, 429 or "garbage" (a non-JSON 200)
+        self.reply = lambda body: self.DEFAULT_REPLY  # assistant message content for a request body
+        self.requests = []
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def handle(self, body):
+        with self.lock:
+            self.requests.append(body)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            failure = self.failures.popleft() if self.failures else None
+            delay = self.delay
+        try:
+            if delay:
+                time.sleep(delay)
+            if failure == "garbage":
+                return 200, b"<html>busy</html>"
+            if failure:
+                return failure, json.dumps({"error": {"message": "injected failure"}}).encode("utf-8")
+            content = self.reply(body)
+            prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+            completion_tokens = len(content) // 4
+            return 200, json.dumps({
+                "id": f"chatcmpl-{len(self.requests)}",
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            }, ensure_ascii=False).encode("utf-8")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def _completions_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+        def setup(self):
+            super().setup()
+            with fake.lock:
+                fake.connections += 1
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            status, data = fake.handle(body)
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            except OSError:
+                pass  # the client gave up (deadline) and closed the connection
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def fake_completions():
+    fake = FakeCompletions()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _completions_handler(fake))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_github():
+    fake = FakeGitHub()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(fake))
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    fake.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def github_store(fake_github):
+    return GitHubStorage("test-token", "owner", "repo", base_dir="data", api_url=fake_github.url)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The app module bound to a temporary SQLite file, SQL backend by default."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'quiz_test.db'}"
+    os.environ["STORAGE_BACKEND"] = "sql"
+    import app as app_module
+    app_module.limiter.enabled = False
+    return app_module
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "STORAGE_BACKEND", "sql")
+    monkeypatch.setattr(app_module, "github_store", None)
+    with app_module.app.app_context():
+        app_module.db.drop_all()
+        app_module.db.create_all()
+    app_module.response_cache.clear()
+    app_module.token_cache.cache.clear()
+    app_module.user_context_cache.invalidate()
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def count_queries(app_module):
+    """SQL statements executed while the test runs."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    event.listen(engine, "before_cursor_execute", before_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_execute)
+
+
+def auth_headers(app_module, user_id, role="student"):
+    return {"Authorization": f"Bearer {app_module.generate_token(user_id, role)}"}
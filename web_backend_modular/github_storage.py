@@ -1,24 +1,95 @@
 import base64
+import hashlib
 import json
+import random
+import threading
 import time
-from typing import Optional, Tuple, Any, Dict
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple, Any, Callable, Dict, List, NamedTuple
 
 import requests
 
+import progress_log
+from progress_buffer import ProgressWriteBuffer, entry_key
+from question_bank import QuestionBank, table_list
+
+QUESTIONS_MANIFEST = "questions/_manifest.json"
+LEGACY_QUESTIONS = "questions.json"
+
+
+class GitHubStorageError(RuntimeError):
+    """GitHub API call failed; `status_code` is the HTTP status when there was a response."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GitHubConflictError(GitHubStorageError):
+    """The remote file or branch changed under an optimistic write."""
+
+
+def git_blob_sha(content: bytes) -> str:
+    """Git object id of a blob, i.e. the `sha` GitHub reports for a file."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def _dump_json(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+class Versioned(NamedTuple):
+    """Decoded file content together with the blob sha it was read at (None if missing)."""
+    data: Any
+    sha: Optional[str]
+
+
+class _CacheEntry:
+    """Decoded JSON file kept by the read-through cache."""
+
+    __slots__ = ("raw", "value", "sha", "etag", "fetched_at")
+
+    def __init__(self, raw: str, value: Any, sha: Optional[str], etag: Optional[str], fetched_at: float):
+        self.raw = raw
+        self.value = value
+        self.sha = sha
+        self.etag = etag
+        self.fetched_at = fetched_at
+
 
 class GitHubStorage:
     """
     Lightweight wrapper around GitHub Contents API for JSON reads/writes.
-    Uses optimistic concurrency via `sha` and small retry on 409.
+    Uses optimistic concurrency via the blob `sha` known from the last read.
+
+    Reads go through an in-process LRU cache keyed by path. Entries younger
+    than `cache_ttl` seconds are served without any request; older entries are
+    revalidated with `If-None-Match` and reused as-is on 304.
     """
 
-    def __init__(self, token: str, owner: str, repo: str, branch: str = "main", base_dir: str = "data"):
+    def __init__(self, token: str, owner: str, repo: str, branch: str = "main", base_dir: str = "data",
+                 cache_ttl: float = 10.0, cache_max_entries: int = 256, api_url: str = "https://api.github.com",
+                 progress_segment_size: int = progress_log.DEFAULT_SEGMENT_SIZE):
         self.token = token
         self.owner = owner
         self.repo = repo
         self.branch = branch
         self.base_dir = base_dir.strip("/")
-        self.api_base = f"https://api.github.com/repos/{owner}/{repo}/contents"
+        self.repo_api = f"{api_url.rstrip('/')}/repos/{owner}/{repo}"
+        self.api_base = f"{self.repo_api}/contents"
+        self.cache_ttl = cache_ttl
+        self.cache_max_entries = cache_max_entries
+        self._cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._question_bank: Optional[QuestionBank] = None
+        self._question_bank_lock = threading.Lock()
+        self._shard_banks: "OrderedDict[str, QuestionBank]" = OrderedDict()
+        self._tables_payload: Tuple[Optional[str], List[Dict[str, Any]]] = (None, [])
+        self.progress_buffer: Optional[ProgressWriteBuffer] = None
+        self.progress_segment_size = progress_segment_size
+        self._progress_indexes: "OrderedDict[int, progress_log.ProgressIndex]" = OrderedDict()
+        self._progress_indexes_lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({
             "Authorization": f"Bearer {token}",
@@ -33,17 +104,40 @@ class GitHubStorage:
             return f"{self.base_dir}/{path}"
         return path
 
-    def _get_contents(self, path: str) -> Tuple[Optional[dict], Optional[str]]:
+    def _get_contents_conditional(self, path: str, etag: Optional[str]) -> Tuple[int, Optional[dict], Optional[str]]:
+        """GET contents with `If-None-Match`. Returns (status, data, etag); data is None on 304/404."""
         url = f"{self.api_base}/{path}"
         params = {"ref": self.branch}
-        r = self.session.get(url, params=params, timeout=20)
+        headers = {"If-None-Match": etag} if etag else None
+        r = self.session.get(url, params=params, headers=headers, timeout=20)
         if r.status_code == 200:
-            data = r.json()
-            return data, data.get("sha")
-        elif r.status_code == 404:
-            return None, None
+            return 200, r.json(), r.headers.get("ETag")
+        elif r.status_code in (304, 404):
+            return r.status_code, None, etag
         else:
-            raise RuntimeError(f"GitHub GET {path} failed: {r.status_code} {r.text}")
+            raise GitHubStorageError(f"GitHub GET {path} failed: {r.status_code} {r.text}", r.status_code)
+
+    def _cache_lookup(self, path: str) -> Optional[_CacheEntry]:
+        with self._cache_lock:
+            entry = self._cache.get(path)
+            if entry is not None:
+                self._cache.move_to_end(path)
+            return entry
+
+    def _cache_store(self, path: str, entry: _CacheEntry):
+        with self._cache_lock:
+            self._cache[path] = entry
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, rel_path: Optional[str] = None):
+        """Drop one cached path (or the whole cache when rel_path is None)."""
+        with self._cache_lock:
+            if rel_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self._full_path(rel_path), None)
 
     def _put_contents(self, path: str, content_b64: str, message: str, sha: Optional[str] = None) -> dict:
         url = f"{self.api_base}/{path}"
@@ -57,40 +151,155 @@ class GitHubStorage:
         r = self.session.put(url, json=payload, timeout=25)
         if r.status_code in (200, 201):
             return r.json()
+        elif r.status_code in (409, 422):
+            # 409: sha does not match the current file; 422: file exists but no sha was sent
+            raise GitHubConflictError(f"GitHub PUT {path} rejected: {r.status_code} {r.text}", r.status_code)
         else:
-            raise RuntimeError(f"GitHub PUT {path} failed: {r.status_code} {r.text}")
+            raise GitHubStorageError(f"GitHub PUT {path} failed: {r.status_code} {r.text}", r.status_code)
 
-    def read_json(self, rel_path: str) -> Optional[Any]:
+    def read_json(self, rel_path: str, shared: bool = False, max_age: Optional[float] = None) -> Optional[Any]:
+        """
+        Read and decode a JSON file through the cache.
+
+        By default a private copy is returned so callers may mutate it freely.
+        Read-only hot paths can pass `shared=True` to get the cached object
+        itself (it must not be mutated). `max_age` overrides `cache_ttl` for
+        this call; `max_age=0` always revalidates with GitHub.
+        """
         path = self._full_path(rel_path)
-        data, _ = self._get_contents(path)
-        if not data:
+        ttl = self.cache_ttl if max_age is None else max_age
+        now = time.monotonic()
+        entry = self._cache_lookup(path)
+        if entry is not None and now - entry.fetched_at < ttl:
+            return self._cached_value(entry, shared)
+
+        status, data, etag = self._get_contents_conditional(path, entry.etag if entry else None)
+        if status == 304 and entry is not None:
+            entry.fetched_at = now
+            return self._cached_value(entry, shared)
+        if status == 404:
+            # Remember the miss too, so absent files (no progress yet) cost nothing within the TTL
+            self._cache_store(path, _CacheEntry("null", None, None, None, now))
             return None
-        if isinstance(data, dict) and data.get("content"):
-            raw = base64.b64decode(data["content"]).decode("utf-8")
-            return json.loads(raw)
-        return None
+        if status == 304 or not (isinstance(data, dict) and data.get("content")):
+            # 304 without a local entry should not happen; treat it as unreadable
+            return None
+        raw = base64.b64decode(data["content"]).decode("utf-8")
+        entry = _CacheEntry(raw, json.loads(raw), data.get("sha"), etag, now)
+        self._cache_store(path, entry)
+        return self._cached_value(entry, shared)
 
-    def write_json(self, rel_path: str, payload: Any, message: str, max_retries: int = 2) -> dict:
+    @staticmethod
+    def _cached_value(entry: _CacheEntry, shared: bool) -> Any:
+        if shared:
+            return entry.value
+        # Re-decoding the cached text is cheaper than deepcopy for JSON trees
+        return json.loads(entry.raw)
+
+    def read_json_versioned(self, rel_path: str, shared: bool = False, max_age: Optional[float] = None) -> Versioned:
+        """read_json plus the blob sha to hand back to write_json(sha=...)."""
+        data = self.read_json(rel_path, shared=shared, max_age=max_age)
+        return Versioned(data, self.cached_sha(rel_path) if data is not None else None)
+
+    def cached_sha(self, rel_path: str) -> Optional[str]:
+        """Blob sha of the cached copy of rel_path, if any."""
+        entry = self._cache_lookup(self._full_path(rel_path))
+        return entry.sha if entry else None
+
+    def write_json(self, rel_path: str, payload: Any, message: str, sha: Optional[str] = None,
+                   merge: Optional[Callable[[Any, Any], Any]] = None, max_retries: int = 3) -> dict:
         """
-        Writes JSON file with small retry on 409 conflict.
+        Write a JSON file with optimistic concurrency and no read round-trip.
+
+        The PUT uses `sha` (from read_json_versioned) or else the sha of the
+        cached copy. On a conflict the current remote version is fetched and,
+        if given, `merge(remote, payload)` produces the payload to retry with;
+        without a hook the write is retried as last-writer-wins. Retries use
+        jittered exponential backoff; GitHubConflictError is raised when they
+        run out.
         """
         path = self._full_path(rel_path)
+        if sha is None:
+            sha = self.cached_sha(rel_path)
         attempt = 0
         while True:
             attempt += 1
-            # get current sha if exists
-            current, sha = self._get_contents(path)
-            content_str = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            content_str = _dump_json(payload)
             b64 = base64.b64encode(content_str.encode("utf-8")).decode("ascii")
             try:
-                return self._put_contents(path, b64, message, sha=sha)
-            except RuntimeError as e:
-                msg = str(e)
-                if "409" in msg and attempt <= max_retries:
-                    # small backoff and retry (re-fetch sha)
-                    time.sleep(0.5 * attempt)
-                    continue
-                raise
+                result = self._put_contents(path, b64, message, sha=sha)
+                break
+            except GitHubConflictError:
+                if attempt > max_retries:
+                    raise
+                time.sleep(random.uniform(0, 0.2 * 2 ** attempt))
+                remote = self.read_json_versioned(rel_path, max_age=0)
+                sha = remote.sha
+                if merge is not None and remote.data is not None:
+                    payload = merge(remote.data, payload)
+        # The written payload is now the latest version; no ETag yet, so the
+        # first revalidation after the TTL will do a full GET.
+        new_sha = (result.get("content") or {}).get("sha")
+        self._cache_store(path, _CacheEntry(content_str, json.loads(content_str), new_sha, None, time.monotonic()))
+        return result
+
+    def _git_api(self, method: str, endpoint: str, expected=(200,), **kwargs) -> dict:
+        r = self.session.request(method, f"{self.repo_api}/git/{endpoint}", timeout=25, **kwargs)
+        if r.status_code in expected:
+            return r.json()
+        if r.status_code in (409, 422):
+            raise GitHubConflictError(f"GitHub {method} git/{endpoint} rejected: {r.status_code} {r.text}", r.status_code)
+        raise GitHubStorageError(f"GitHub {method} git/{endpoint} failed: {r.status_code} {r.text}", r.status_code)
+
+    def commit_batch(self, files: Dict[str, Any], message: str, expected_shas: Optional[Dict[str, Optional[str]]] = None,
+                     max_retries: int = 3) -> str:
+        """
+        Write several JSON files in a single commit through the Git Data API.
+
+        `files` maps relative paths to payloads (None deletes the path). When
+        `expected_shas` is given, each listed path must still have that blob sha
+        (None = must not exist) on the branch head the commit is built on,
+        otherwise GitHubConflictError is raised. If the branch moves while the
+        commit is being built, it is rebuilt on the new head with jittered
+        backoff. Returns the new commit sha.
+        """
+        contents = {self._full_path(p): (None if v is None else _dump_json(v)) for p, v in files.items()}
+        attempt = 0
+        while True:
+            attempt += 1
+            head = self._git_api("GET", f"ref/heads/{self.branch}")["object"]["sha"]
+            # Checked after reading head: if anything lands in between, the ref update below fails
+            for rel_path, sha in (expected_shas or {}).items():
+                self.read_json(rel_path, shared=True, max_age=0)
+                if self.cached_sha(rel_path) != sha:
+                    raise GitHubConflictError(f"{rel_path} changed since it was read", 409)
+            base_tree = self._git_api("GET", f"commits/{head}")["tree"]["sha"]
+            tree = [
+                {"path": path, "mode": "100644", "type": "blob", "sha": None} if text is None
+                else {"path": path, "mode": "100644", "type": "blob", "content": text}
+                for path, text in contents.items()
+            ]
+            tree_sha = self._git_api("POST", "trees", expected=(201,), json={"base_tree": base_tree, "tree": tree})["sha"]
+            commit_sha = self._git_api("POST", "commits", expected=(201,), json={
+                "message": message, "tree": tree_sha, "parents": [head]
+            })["sha"]
+            try:
+                self._git_api("PATCH", f"refs/heads/{self.branch}", json={"sha": commit_sha, "force": False})
+                break
+            except GitHubConflictError:
+                if attempt > max_retries:
+                    raise
+                # Branch moved (not a fast-forward); rebuild on the new head
+                time.sleep(random.uniform(0, 0.25 * 2 ** attempt))
+
+        now = time.monotonic()
+        for path, text in contents.items():
+            if text is None:
+                with self._cache_lock:
+                    self._cache.pop(path, None)
+            else:
+                self._cache_store(path, _CacheEntry(text, json.loads(text), git_blob_sha(text.encode("utf-8")), None, now))
+        return commit_sha
 
     def ensure_index(self, index_path: str, initial: Dict[str, Any]) -> Dict[str, Any]:
         idx = self.read_json(index_path)
@@ -99,9 +308,193 @@ class GitHubStorage:
             return initial
         return idx
 
+    def question_bank(self) -> QuestionBank:
+        """
+        Indexed view of the legacy questions.json, rebuilt only when the cached blob sha changes.
+        Served from memory while the read cache is fresh.
+        """
+        data = self.read_json(LEGACY_QUESTIONS, shared=True)
+        sha = self.cached_sha(LEGACY_QUESTIONS)
+        bank = self._question_bank
+        if bank is not None and sha is not None and bank.version == sha:
+            return bank
+        with self._question_bank_lock:
+            bank = self._question_bank
+            if bank is None or sha is None or bank.version != sha:
+                bank = QuestionBank(data, version=sha)
+                self._question_bank = bank
+            return bank
+
+    # Sharded question storage: questions/_manifest.json lists the tables
+    # (counts, shard path, shard sha, id range); questions/table_{id}.json
+    # holds one table's questions. Readers fetch only the shard they need.
+
+    @staticmethod
+    def shard_path(table_id: int) -> str:
+        return f"questions/table_{table_id}.json"
+
+    def read_question_manifest(self, shared: bool = True, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return self.read_json(QUESTIONS_MANIFEST, shared=shared, max_age=max_age)
+
+    def question_tables(self) -> List[Dict[str, Any]]:
+        """Table listing for /api/quiz/tables, served from the manifest alone."""
+        manifest = self.read_question_manifest()
+        if manifest is None:
+            return self.question_bank().tables
+        sha = self.cached_sha(QUESTIONS_MANIFEST)
+        cached_sha, payload = self._tables_payload
+        if sha is None or cached_sha != sha:
+            payload = table_list(manifest.get("quiz_tables") or [])
+            self._tables_payload = (sha, payload)
+        return payload
+
+    def question_catalog_version(self) -> Optional[str]:
+        """Sha of the manifest (or the legacy bank before migration): changes with any question edit."""
+        if self.read_question_manifest() is None:
+            self.read_json(LEGACY_QUESTIONS, shared=True)
+            return self.cached_sha(LEGACY_QUESTIONS)
+        return self.cached_sha(QUESTIONS_MANIFEST)
+
+    def question_table_version(self, table_name: str) -> Optional[str]:
+        """Version of one table's questions (its shard sha) taken from the manifest, without loading the shard."""
+        manifest = self.read_question_manifest()
+        if manifest is None:
+            return self.question_catalog_version()
+        for table in manifest.get("quiz_tables") or []:
+            if table.get("name") == table_name:
+                return table.get("shard_sha") or self.cached_sha(QUESTIONS_MANIFEST)
+        return self.cached_sha(QUESTIONS_MANIFEST)
+
+    def _shard_bank(self, table: Dict[str, Any]) -> QuestionBank:
+        path = table.get("shard") or self.shard_path(table["id"])
+        expected = table.get("shard_sha")
+        with self._question_bank_lock:
+            bank = self._shard_banks.get(path)
+            if bank is not None:
+                self._shard_banks.move_to_end(path)
+        if bank is not None and expected is not None and bank.version == expected:
+            return bank  # manifest vouches for the in-memory copy: no request at all
+        stale = expected is not None and self.cached_sha(path) != expected
+        data = self.read_json(path, shared=True, max_age=0 if stale else None)
+        sha = self.cached_sha(path)
+        if bank is not None and sha is not None and bank.version == sha:
+            return bank
+        bank = QuestionBank(data, version=sha)
+        with self._question_bank_lock:
+            self._shard_banks[path] = bank
+            while len(self._shard_banks) > self.cache_max_entries:
+                self._shard_banks.popitem(last=False)
+        return bank
+
+    def table_question_bank(self, table_name: str) -> Optional[QuestionBank]:
+        """Index over one table's questions (the whole legacy bank before migration)."""
+        manifest = self.read_question_manifest()
+        if manifest is None:
+            return self.question_bank()
+        for table in manifest.get("quiz_tables") or []:
+            if table.get("name") == table_name:
+                return self._shard_bank(table)
+        return None
+
+    def find_question(self, question_id: Any) -> Tuple[Optional[Dict[str, Any]], Optional[QuestionBank]]:
+        """Locate a question by id using the manifest id ranges; returns (question, its bank)."""
+        manifest = self.read_question_manifest()
+        if manifest is None:
+            bank = self.question_bank()
+            return bank.get(question_id), bank
+        try:
+            qid = int(question_id)
+        except (TypeError, ValueError):
+            return None, None
+        candidates = [t for t in manifest.get("quiz_tables") or []
+                      if t.get("id_min") is not None and t["id_min"] <= qid <= t["id_max"]]
+        # Ranges can overlap when tables grow over several imports; try the tightest first
+        candidates.sort(key=lambda t: t["id_max"] - t["id_min"])
+        for table in candidates:
+            bank = self._shard_bank(table)
+            q = bank.get(qid)
+            if q is not None:
+                return q, bank
+        return None, None
+
+    def commit_question_shards(self, manifest: Dict[str, Any], shards: Dict[int, List[Dict[str, Any]]],
+                               message: str, manifest_sha: Optional[str],
+                               shard_shas: Optional[Dict[int, Optional[str]]] = None) -> str:
+        """
+        Write changed table shards plus the manifest in one commit. `shards`
+        maps table id -> full question list; the matching manifest entries get
+        their count, id range and shard sha refreshed. `manifest_sha` is the
+        version the caller read (None if it did not exist), `shard_shas` the
+        blob sha of each shard the question lists were built from: if another
+        writer changed one since, GitHubConflictError is raised instead of
+        overwriting its questions.
+        """
+        tables_by_id = {t["id"]: t for t in manifest.get("quiz_tables") or []}
+        files: Dict[str, Any] = {}
+        expected_shas: Dict[str, Optional[str]] = {QUESTIONS_MANIFEST: manifest_sha}
+        for table_id, questions in shards.items():
+            table = tables_by_id[table_id]
+            if shard_shas is not None and table_id in shard_shas:
+                expected_shas[table.get("shard") or self.shard_path(table_id)] = shard_shas[table_id]
+            shard = {"table_name": table["name"], "questions": questions}
+            ids = [q["id"] for q in questions if isinstance(q.get("id"), int)]
+            table["shard"] = self.shard_path(table_id)
+            table["shard_sha"] = git_blob_sha(_dump_json(shard).encode("utf-8"))
+            table["question_count"] = len(questions)
+            table["id_min"] = min(ids) if ids else None
+            table["id_max"] = max(ids) if ids else None
+            files[table["shard"]] = shard
+        metadata = manifest.setdefault("metadata", {})
+        metadata["total_questions"] = sum(int(t.get("question_count") or 0) for t in tables_by_id.values())
+        metadata["total_tables"] = len(tables_by_id)
+        metadata["last_updated"] = datetime.utcnow().isoformat()
+        metadata["version"] = metadata.get("version", "1.0.0")
+        files[QUESTIONS_MANIFEST] = manifest
+        return self.commit_batch(files, message, expected_shas=expected_shas)
+
+    def migrate_questions_to_shards(self) -> bool:
+        """
+        One-time split of the legacy questions.json into per-table shards.
+        The legacy file is left in place. Returns True if a migration was committed.
+        """
+        if self.read_question_manifest(max_age=0) is not None:
+            return False
+        legacy = self.read_json(LEGACY_QUESTIONS, max_age=0)
+        if legacy is None:
+            return False
+        quiz_tables = legacy.get("quiz_tables") or []
+        next_table_id = int(legacy.get("next_table_id") or (max([t.get("id", 0) for t in quiz_tables] or [0]) + 1))
+        by_name = {t.get("name"): t for t in quiz_tables}
+        shards: Dict[int, List[Dict[str, Any]]] = {t["id"]: [] for t in quiz_tables}
+        for q in legacy.get("questions") or []:
+            table = by_name.get(q.get("table_name"))
+            if table is None:
+                table = {
+                    "id": next_table_id,
+                    "name": q.get("table_name"),
+                    "display_name": q.get("table_name"),
+                    "question_count": 0,
+                    "category": "imported",
+                    "created_at": datetime.utcnow().isoformat()
+                }
+                quiz_tables.append(table)
+                by_name[table["name"]] = table
+                shards[table["id"]] = []
+                next_table_id += 1
+            shards[table["id"]].append(q)
+        manifest = {
+            "quiz_tables": quiz_tables,
+            "next_table_id": next_table_id,
+            "next_question_id": int(legacy.get("next_question_id") or
+                                    (max([q.get("id", 0) for q in legacy.get("questions") or []] or [0]) + 1)),
+            "metadata": legacy.get("metadata") or {}
+        }
+        self.commit_question_shards(manifest, shards, "Split questions.json into per-table shards", manifest_sha=None)
+        return True
+
     # Convenience helpers for users/progress
-    def read_user_by_id(self, user_id: int) -> Optional[dict]:
-        return self.read_json(f"users/{user_id}.json")
+    def read_user_by_id(self, user_id: int, shared: bool = False) -> Optional[dict]:
+        return self.read_json(f"users/{user_id}.json", shared=shared)
 
     def read_users_index(self) -> Dict[str, Any]:
         return self.ensure_index("users/_index.json", {"next_id": 1, "usernames": {}})
@@ -109,12 +502,157 @@ class GitHubStorage:
     def write_users_index(self, idx: Dict[str, Any]):
         self.write_json("users/_index.json", idx, message="Update users index")
 
-    def save_user(self, user_obj: Dict[str, Any]):
+    def create_user(self, username: str, build_user: Callable[[int], Dict[str, Any]], message: str,
+                    max_retries: int = 2) -> Optional[Dict[str, Any]]:
+        """
+        Allocate the next user id and write users/{id}.json together with
+        users/_index.json in one commit. Returns None if the username is taken.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            idx = self.read_json("users/_index.json", max_age=0) or {"next_id": 1, "usernames": {}}
+            index_sha = self.cached_sha("users/_index.json")
+            if username in idx.setdefault("usernames", {}):
+                return None
+            new_id = int(idx.get("next_id", 1))
+            user_obj = build_user(new_id)
+            idx["usernames"][username] = new_id
+            idx["next_id"] = new_id + 1
+            try:
+                self.commit_batch({f"users/{new_id}.json": user_obj, "users/_index.json": idx}, message,
+                                  expected_shas={"users/_index.json": index_sha})
+                return user_obj
+            except GitHubConflictError:
+                # Someone else registered in between; take the next free id
+                if attempt > max_retries:
+                    raise
+
+    def save_user(self, user_obj: Dict[str, Any], merge: Optional[Callable[[Any, Any], Any]] = None):
         user_id = user_obj["id"]
-        self.write_json(f"users/{user_id}.json", user_obj, message=f"Save user {user_id}")
+        self.write_json(f"users/{user_id}.json", user_obj, message=f"Save user {user_id}", merge=merge)
 
     def read_progress(self, user_id: int) -> Dict[str, Any]:
-        return self.read_json(f"quiz_progress/{user_id}.json") or {"entries": []}
+        """
+        Full answer history (all segments, or the legacy single file) plus
+        entries still waiting in the write-behind buffer. Prefer
+        read_progress_summary for anything that does not need every entry.
+        """
+        summary = self.read_json(progress_log.summary_path(user_id), shared=True)
+        if summary is None:
+            prog = self.read_json(progress_log.legacy_path(user_id)) or {"entries": []}
+        else:
+            entries: List[dict] = []
+            for segment_no in range(1, summary["segments"] + 1):
+                segment = self.read_json(progress_log.segment_path(user_id, segment_no), shared=True) or {}
+                entries.extend(segment.get("entries") or [])
+            prog = {"entries": entries}
+        if self.progress_buffer is not None:
+            prog.setdefault("entries", []).extend(self.progress_buffer.pending_for(user_id))
+        return prog
+
+    def read_progress_summary(self, user_id: int) -> Dict[str, Any]:
+        """Answered/wrong id sets and counters, including buffered entries."""
+        summary = self.read_json(progress_log.summary_path(user_id))
+        if summary is None:
+            legacy = self.read_json(progress_log.legacy_path(user_id), shared=True) or {}
+            summary = progress_log.apply_entries(progress_log.new_summary(self.progress_segment_size),
+                                                 legacy.get("entries") or [])
+        if self.progress_buffer is not None:
+            progress_log.apply_entries(summary, self.progress_buffer.pending_for(user_id))
+        return summary
+
+    def progress_index(self, user_id: int) -> progress_log.ProgressIndex:
+        """
+        Answered/wrong id sets of one user for quiz mode filters. Rebuilt from
+        the summary only when its sha changes; appends update it in place.
+        """
+        summary_rel = progress_log.summary_path(user_id)
+        summary = self.read_json(summary_rel, shared=True)
+        version = self.cached_sha(summary_rel) if summary is not None else None
+        with self._progress_indexes_lock:
+            index = self._progress_indexes.get(user_id)
+            if index is not None and index.version == version:
+                self._progress_indexes.move_to_end(user_id)
+                return index
+        pending = self.progress_buffer.pending_for(user_id) if self.progress_buffer else []
+        if summary is None:
+            legacy = self.read_json(progress_log.legacy_path(user_id), shared=True) or {}
+            summary = progress_log.new_summary(self.progress_segment_size)
+            pending = (legacy.get("entries") or []) + list(pending)  # legacy file or nothing stored yet
+        else:
+            summary = json.loads(_dump_json(summary))
+        index = progress_log.ProgressIndex(progress_log.apply_entries(summary, pending), version, applied=pending)
+        with self._progress_indexes_lock:
+            self._progress_indexes[user_id] = index
+            while len(self._progress_indexes) > self.cache_max_entries:
+                self._progress_indexes.popitem(last=False)
+        return index
+
+    def append_progress(self, user_id: int, entry: Dict[str, Any]):
+        """Record one answer; buffered locally when write-behind is enabled."""
+        self.append_progress_batch(user_id, [entry])
+
+    def append_progress_batch(self, user_id: int, entries: List[Dict[str, Any]]):
+        """Record several answers of one user with a single spool write or a single commit."""
+        if not entries:
+            return
+        if self.progress_buffer is not None:
+            self.progress_buffer.extend(user_id, entries)
+        else:
+            self._write_progress_batch({user_id: list(entries)})
+        with self._progress_indexes_lock:
+            index = self._progress_indexes.get(user_id)
+            if index is not None:
+                for entry in entries:
+                    index.add(entry)
+
+    def enable_write_behind(self, spool_dir: str, max_pending: int = 20, max_age: float = 30.0) -> ProgressWriteBuffer:
+        """Buffer progress appends in memory (spooled to spool_dir) and flush them in batches."""
+        self.progress_buffer = ProgressWriteBuffer(self._write_progress_batch, spool_dir,
+                                                   max_pending=max_pending, max_age=max_age).start()
+        return self.progress_buffer
+
+    def _progress_append_files(self, user_id: int, entries: List[dict]) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Files to commit for appending entries to one user's segmented log:
+        the tail segment(s) and the summary. A legacy quiz_progress/{uid}.json
+        is converted (and removed) on the first append. Also returns the summary
+        sha the files were computed from.
+        """
+        summary_rel = progress_log.summary_path(user_id)
+        summary_ver = self.read_json_versioned(summary_rel, max_age=0)
+        files: Dict[str, Any] = {}
+        if summary_ver.data is None:
+            legacy_rel = progress_log.legacy_path(user_id)
+            legacy = self.read_json(legacy_rel, max_age=0)
+            summary, changed = progress_log.summary_from_entries((legacy or {}).get("entries") or [],
+                                                                 self.progress_segment_size)
+            if legacy is not None:
+                files[legacy_rel] = None
+            tail: List[dict] = changed.get(summary["segments"], [])
+        else:
+            summary, changed = summary_ver.data, {}
+            tail_rel = progress_log.segment_path(user_id, summary["segments"])
+            tail = ((self.read_json(tail_rel, max_age=0) if summary["segments"] else None) or {}).get("entries") or []
+        # Entries already in the tail were stored by an earlier flush (replayed spool)
+        seen = {entry_key(e) for e in tail}
+        fresh = [e for e in entries if entry_key(e) not in seen]
+        changed.update(progress_log.append_to_segments(summary, tail, fresh))
+        if not changed and not files:
+            return {}, summary_ver.sha
+        for segment_no, segment_entries in changed.items():
+            files[progress_log.segment_path(user_id, segment_no)] = {"entries": segment_entries}
+        files[summary_rel] = summary
+        return files, summary_ver.sha
 
-    def write_progress(self, user_id: int, progress: Dict[str, Any]):
-        self.write_json(f"quiz_progress/{user_id}.json", progress, message=f"Update progress for user {user_id}")
+    def _write_progress_batch(self, batch: Dict[int, List[dict]]):
+        # One commit for all users; each user's summary must be unchanged since it was read
+        files, expected = {}, {}
+        for user_id, entries in batch.items():
+            user_files, summary_sha = self._progress_append_files(user_id, entries)
+            if user_files:
+                files.update(user_files)
+                expected[progress_log.summary_path(user_id)] = summary_sha
+        if files:
+            self.commit_batch(files, message=f"Append progress for {len(expected)} user(s)", expected_shas=expected)
@@ -0,0 +1,220 @@
+"""
+Durable background job queue in an SQL table, with a worker pool.
+
+submit_oral_audio held the HTTP request open while Monica evaluated the
+transcript. Now the handler stores the local score, enqueues a job and
+returns; workers evaluate with AI later and upgrade the stored result.
+
+Jobs live in one `jobs` table: in the app database, or in any engine given
+(a local SQLite file when the app runs on GitHub storage), so no broker is
+needed and queued jobs survive a restart. Workers claim jobs with one
+UPDATE that stamps them with a claim token; a job is only stamped while it
+is due, so no two workers get the same job (SQLite and PostgreSQL alike).
+A claim is a lease: a job whose worker died goes back to the queue `lease`
+seconds later. A handler that raises is
+retried after `retry_delay` seconds, up to `max_attempts` attempts.
+
+Workers in the enqueuing process are woken immediately; other processes
+find new jobs within `poll_interval` seconds.
+"""
+
+import json
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, Text, and_, case, delete, func, insert, \
+    select, update
+from sqlalchemy.engine import Engine
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+metadata = MetaData()
+
+jobs_table = Table(
+    'jobs', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('kind', String(50), nullable=False),
+    Column('payload', Text, nullable=False),  # JSON
+    Column('status', String(10), nullable=False, default=QUEUED),
+    Column('result', Text),  # JSON returned by the handler, or the last error
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('claim', String(32)),  # token of the claim() that holds the job
+    Column('run_after', Float, nullable=False),  # not claimed before (enqueue time, retry time, lease expiry)
+    Column('created_at', Float, nullable=False),
+    Column('finished_at', Float),
+    Index('ix_jobs_claim', 'status', 'run_after')
+)
+
+
+def _row_dict(row) -> Dict[str, Any]:
+    return {
+        'id': row.id,
+        'kind': row.kind,
+        'payload': json.loads(row.payload),
+        'status': row.status,
+        'result': json.loads(row.result) if row.result else None,
+        'attempts': row.attempts,
+        'created_at': row.created_at,
+        'finished_at': row.finished_at
+    }
+
+
+class JobQueue:
+    """Jobs in an SQL table; `engine` is an SQLAlchemy engine or a callable returning one."""
+
+    def __init__(self, engine: Union[Engine, Callable[[], Engine]], lease: float = 60.0, max_attempts: int = 3,
+                 retry_delay: float = 5.0, clock: Callable[[], float] = time.time):
+        self._engine = engine
+        self.lease = lease
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self._created = set()  # engines the table is known to exist in
+        self.wakeup = threading.Event()  # set on enqueue, so local workers do not wait for their next poll
+
+    def engine(self) -> Engine:
+        engine = self._engine() if callable(self._engine) else self._engine
+        if id(engine) not in self._created:
+            jobs_table.create(engine, checkfirst=True)
+            self._created.add(id(engine))
+        return engine
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], delay: float = 0.0) -> int:
+        now = self.clock()
+        with self.engine().begin() as conn:
+            job_id = conn.execute(insert(jobs_table).values(
+                kind=kind, payload=json.dumps(payload), status=QUEUED, attempts=0,
+                run_after=now + delay, created_at=now)).inserted_primary_key[0]
+        self.wakeup.set()
+        return job_id
+
+    def claim(self, limit: int = 1) -> List[Dict[str, Any]]:
+        """Up to `limit` due jobs, now leased to the caller (status running)."""
+        now, token = self.clock(), secrets.token_hex(16)
+        # queued, or running past run_after: its worker lost the lease
+        due = and_(jobs_table.c.status.in_((QUEUED, RUNNING)), jobs_table.c.run_after <= now)
+        oldest = select(jobs_table.c.id).where(due).order_by(jobs_table.c.run_after, jobs_table.c.id).limit(limit)
+        with self.engine().begin() as conn:
+            # `due` is checked again per row: a job another worker stamped first is skipped, not taken twice
+            claimed = conn.execute(update(jobs_table).where(jobs_table.c.id.in_(oldest.scalar_subquery()), due)
+                                   .values(status=RUNNING, claim=token, attempts=jobs_table.c.attempts + 1,
+                                           run_after=now + self.lease)).rowcount
+            rows = conn.execute(select(jobs_table).where(jobs_table.c.claim == token)
+                                .order_by(jobs_table.c.id)).all() if claimed else []
+        return [_row_dict(row) for row in rows]
+
+    def complete(self, job_id: int, result: Any = None):
+        with self.engine().begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id)
+                         .values(status=DONE, result=json.dumps(result), finished_at=self.clock()))
+
+    def fail(self, job_id: int, error: str):
+        """Queue the job again after `retry_delay`, or mark it failed once it used up its attempts."""
+        now = self.clock()
+        retry = jobs_table.c.attempts < self.max_attempts
+        with self.engine().begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(
+                status=case((retry, QUEUED), else_=FAILED), result=json.dumps({'error': error}),
+                run_after=case((retry, now + self.retry_delay), else_=now),
+                finished_at=case((retry, None), else_=now)))
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self.engine().connect() as conn:
+            row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).first()
+        return _row_dict(row) if row is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        with self.engine().connect() as conn:
+            rows = conn.execute(select(jobs_table.c.status, func.count()).group_by(jobs_table.c.status)).all()
+        return {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, **{status: count for status, count in rows}}
+
+    def prune(self, older_than: float) -> int:
+        """Delete finished jobs that finished more than `older_than` seconds ago."""
+        with self.engine().begin() as conn:
+            return conn.execute(delete(jobs_table).where(and_(
+                jobs_table.c.status.in_((DONE, FAILED)),
+                jobs_table.c.finished_at < self.clock() - older_than))).rowcount
+
+    def clear(self):
+        with self.engine().begin() as conn:
+            conn.execute(delete(jobs_table))
+
+
+class JobWorkers:
+    """`workers` threads running `handlers[job['kind']](payload, job)` for claimed jobs."""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Any]],
+                 workers: int = 2, poll_interval: float = 1.0, batch: int = 4):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.batch = max(1, batch)
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped.clear()
+        self._threads = [threading.Thread(target=self._run, name=f'job-worker-{n}', daemon=True)
+                         for n in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                jobs = self.queue.claim(self.batch)
+            except Exception as e:
+                print(f"⚠️ Job queue claim failed: {e}")
+                jobs = []
+            if not jobs:
+                self.queue.wakeup.wait(self.poll_interval)
+                self.queue.wakeup.clear()
+                continue
+            for job in jobs:
+                self.run_job(job)
+
+    def run_job(self, job: Dict[str, Any]):
+        handler = self.handlers.get(job['kind'])
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind {job['kind']!r}")
+            result = handler(job['payload'], job)
+        except Exception as e:
+            print(f"⚠️ Job {job['id']} ({job['kind']}) failed: {e}")
+            with self._lock:
+                self.errors += 1
+            try:
+                self.queue.fail(job['id'], str(e))
+            except Exception as e:
+                print(f"⚠️ Job {job['id']} could not be requeued: {e}")  # its lease expires and it runs again
+            return
+        try:
+            self.queue.complete(job['id'], result)
+        except Exception as e:
+            print(f"⚠️ Job {job['id']} result not saved: {e}")
+            return
+        with self._lock:
+            self.processed += 1
+
+    def stop(self, timeout: float = 5.0):
+        self._stopped.set()
+        self.queue.wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'workers': self.workers if self.running else 0, 'processed': self.processed, 'errors': self.errors}
@@ -0,0 +1,293 @@
+"""
+Materialized battle leaderboards.
+
+/api/battle/leaderboard used to sort the users table on every request and
+could only report the caller's rank when they were in the top 50; the week
+and month boards were the lifetime board in another order. Leaderboard
+keeps the boards in memory instead:
+
+  - `all`: players above `min_rating` by rating, from the users table;
+  - one rolling-window board per period (`week`, `month`) ranked by wins,
+    then rating gained, aggregated from the battle results of the last
+    7 / 30 days and expired result by result as the window moves.
+
+Every board keeps its (key, user_id) entries sorted in fixed-size blocks
+indexed by a Fenwick tree (RankedBoard), plus a user_id -> key map: a rank,
+the start of a page and moving a player are all O(log n). load() builds the
+boards once; record() applies each new battle result incrementally.
+Results recorded by other workers are only seen after the next load(), so
+the app reloads the boards every LEADERBOARD_REFRESH seconds.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+PERIODS = {'week': 7 * 86400, 'month': 30 * 86400}
+
+
+class RankedBoard:
+    """
+    user_id -> sort key (smaller ranks higher); ties are broken by user_id.
+
+    The (key, user_id) entries are kept in sorted blocks of at most
+    2 * `block_size`, with the last entry of each block in `_maxes` and a
+    Fenwick tree over the block lengths. A lookup is a bisect over `_maxes`
+    plus one inside the block; the tree turns a block index into a position
+    (rank) and a position into a block (page) in O(log n). An update only
+    shifts entries within one block, so moves are O(log n) too; the tree is
+    rebuilt only when a block splits or empties.
+    """
+
+    def __init__(self, block_size: int = 256):
+        self.block_size = max(1, block_size)
+        self._blocks: List[List[Tuple[tuple, int]]] = []
+        self._maxes: List[Tuple[tuple, int]] = []
+        self._tree: List[int] = []
+        self._keys: Dict[int, tuple] = {}
+
+    def load(self, keys: Dict[int, tuple]):
+        self._keys = dict(keys)
+        entries = sorted((key, uid) for uid, key in self._keys.items())
+        self._blocks = [entries[i:i + self.block_size] for i in range(0, len(entries), self.block_size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._rebuild_tree()
+
+    def set(self, user_id: int, key: Optional[tuple]):
+        """Move a user to `key` (None removes them)."""
+        old = self._keys.pop(user_id, None)
+        if old is not None:
+            self._remove((old, user_id))
+        if key is not None:
+            self._keys[user_id] = key
+            self._insert((key, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        entry = (key, user_id)
+        b = bisect.bisect_left(self._maxes, entry)
+        return self._prefix(b) + bisect.bisect_left(self._blocks[b], entry) + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[int]:
+        if limit <= 0 or offset >= len(self._keys):
+            return []
+        b, i = self._find(max(offset, 0))
+        uids: List[int] = []
+        while b < len(self._blocks) and len(uids) < limit:
+            uids.extend(uid for _, uid in self._blocks[b][i:i + limit - len(uids)])
+            b, i = b + 1, 0
+        return uids
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # -- blocks ----------------------------------------------------------------
+
+    def _insert(self, entry: Tuple[tuple, int]):
+        if not self._blocks:
+            self._blocks, self._maxes = [[entry]], [entry]
+            self._rebuild_tree()
+            return
+        b = min(bisect.bisect_left(self._maxes, entry), len(self._blocks) - 1)
+        block = self._blocks[b]
+        bisect.insort(block, entry)
+        self._maxes[b] = block[-1]
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self._blocks[b:b + 1] = [block[:half], block[half:]]
+            self._maxes[b:b + 1] = [block[half - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(b, 1)
+
+    def _remove(self, entry: Tuple[tuple, int]):
+        b = bisect.bisect_left(self._maxes, entry)
+        block = self._blocks[b]
+        del block[bisect.bisect_left(block, entry)]
+        if block:
+            self._maxes[b] = block[-1]
+            self._tree_add(b, -1)
+        else:
+            del self._blocks[b], self._maxes[b]
+            self._rebuild_tree()
+
+    # -- Fenwick tree over block lengths -----------------------------------------
+
+    def _rebuild_tree(self):
+        tree = [len(block) for block in self._blocks]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, b: int, delta: int):
+        while b < len(self._tree):
+            self._tree[b] += delta
+            b |= b + 1
+
+    def _prefix(self, b: int) -> int:
+        """Number of entries in the blocks before block `b`."""
+        total = 0
+        while b > 0:
+            total += self._tree[b - 1]
+            b &= b - 1
+        return total
+
+    def _find(self, position: int) -> Tuple[int, int]:
+        """(block, index in block) of the entry at 0-based `position`."""
+        b, step = 0, (1 << (len(self._tree).bit_length() - 1) if self._tree else 0)
+        while step:
+            if b + step <= len(self._tree) and self._tree[b + step - 1] <= position:
+                b += step
+                position -= self._tree[b - 1]
+            step >>= 1
+        return b, position
+
+
+class _Window:
+    """Per-user [wins, losses, battles, rating gained] over the last `seconds`, ranked by wins then gain."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        # (timestamp, user_id, won, lost, rating_change)
+        self.events: Deque[Tuple[float, int, bool, bool, int]] = deque()
+        self.totals: Dict[int, List[int]] = {}
+        self.board = RankedBoard()
+
+    @staticmethod
+    def _key(totals: List[int]) -> tuple:
+        return (-totals[0], -totals[3])
+
+    def add(self, timestamp: float, user_id: int, won: bool, lost: bool, change: int, rank: bool = True):
+        self.events.append((timestamp, user_id, won, lost, change))
+        totals = self.totals.setdefault(user_id, [0, 0, 0, 0])
+        totals[0] += int(won)
+        totals[1] += int(lost)
+        totals[2] += 1
+        totals[3] += change
+        if rank:
+            self.board.set(user_id, self._key(totals))
+
+    def expire(self, now: float):
+        cutoff = now - self.seconds
+        while self.events and self.events[0][0] <= cutoff:
+            _, user_id, won, lost, change = self.events.popleft()
+            totals = self.totals[user_id]
+            totals[0] -= int(won)
+            totals[1] -= int(lost)
+            totals[2] -= 1
+            totals[3] -= change
+            if totals[2] <= 0:
+                del self.totals[user_id]
+                self.board.set(user_id, None)
+            else:
+                self.board.set(user_id, self._key(totals))
+
+
+class Leaderboard:
+    """All-time and rolling-window boards; safe to use from several threads."""
+
+    def __init__(self, periods: Optional[Dict[str, float]] = None, min_rating: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.periods = dict(PERIODS if periods is None else periods)
+        self.min_rating = min_rating
+        self.clock = clock
+        self.players: Dict[int, Dict[str, Any]] = {}  # user_id -> {username, avatar, rating, wins, losses}
+        self.board = RankedBoard()
+        self.windows = {name: _Window(seconds) for name, seconds in self.periods.items()}
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def load(self, players: Iterable[Dict[str, Any]], results: Iterable[Tuple[float, int, bool, int]]):
+        """
+        Rebuild from player dicts (id, username, avatar, rating, wins, losses)
+        and the battle results (timestamp, user_id, is_winner, rating_change)
+        of the longest period. A result counts as a loss when it is not a win
+        and lost rating, as in the users table (draws are neither).
+        """
+        now = self.clock()
+        players = {p['id']: {'username': p.get('username'), 'avatar': p.get('avatar'),
+                             # NULL columns (rows older than their defaults) count as a new player's values
+                             'rating': p.get('rating') if p.get('rating') is not None else 1500,
+                             'wins': p.get('wins') or 0, 'losses': p.get('losses') or 0}
+                   for p in players}
+        windows = {name: _Window(seconds) for name, seconds in self.periods.items()}
+        for timestamp, user_id, won, change in sorted(results, key=lambda row: row[0]):
+            for window in windows.values():
+                if timestamp > now - window.seconds:
+                    window.add(timestamp, user_id, bool(won), not won and change < 0, change, rank=False)
+        for window in windows.values():
+            window.board.load({uid: window._key(totals) for uid, totals in window.totals.items()})
+        with self._lock:
+            self.players = players
+            self.board.load({uid: (-p['rating'],) for uid, p in players.items() if p['rating'] > self.min_rating})
+            self.windows = windows
+            self.loaded_at = now
+
+    def record(self, user_id: int, won: bool, lost: bool, rating_change: int, timestamp: Optional[float] = None,
+               update_player: bool = True):
+        """
+        Apply one player's battle result: to the period boards always, to the
+        player's rating, wins and losses only when the users table got the same
+        change (`update_player`).
+        """
+        timestamp = self.clock() if timestamp is None else timestamp
+        with self._lock:
+            for window in self.windows.values():
+                window.expire(timestamp)
+                window.add(timestamp, user_id, won, lost, rating_change)
+            if not update_player:
+                return
+            player = self.players.setdefault(user_id, {'username': None, 'avatar': None, 'rating': 1500,
+                                                       'wins': 0, 'losses': 0})
+            player['rating'] += rating_change
+            player['wins'] += int(won)
+            player['losses'] += int(lost)
+            self.board.set(user_id, (-player['rating'],) if player['rating'] > self.min_rating else None)
+
+    def rank(self, user_id: int, period: str = 'all') -> Optional[int]:
+        with self._lock:
+            return self._board(period).rank(user_id)
+
+    def page(self, period: str = 'all', limit: int = 50, offset: int = 0,
+             user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Rows [{rank, user_id, username, avatar, rating, wins, losses, win_rate,
+        (rating_change)}] for one board page, plus the exact rank of `user_id`
+        and the board size. A player first seen in record() has no username yet.
+        """
+        with self._lock:
+            board = self._board(period)
+            window = self.windows.get(period)
+            rows = []
+            for rank, uid in enumerate(board.top(limit, offset), start=offset + 1):
+                player = self.players.get(uid) or {'rating': 1500, 'wins': 0, 'losses': 0}
+                wins, losses = player['wins'], player['losses']
+                row = {'rank': rank, 'user_id': uid, 'username': player.get('username'),
+                       'avatar': player.get('avatar'), 'rating': player['rating']}
+                if window is not None:
+                    wins, losses, _, gained = window.totals[uid]
+                    row['rating_change'] = gained
+                row.update(wins=wins, losses=losses, win_rate=round(wins / max(wins + losses, 1) * 100, 1))
+                rows.append(row)
+            return {
+                'rows': rows,
+                'current_user_rank': board.rank(user_id) if user_id is not None else None,
+                'total_players': len(board)
+            }
+
+    def _board(self, period: str) -> RankedBoard:
+        window = self.windows.get(period)
+        if window is None:
+            return self.board
+        window.expire(self.clock())
+        return window.board
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'players': len(self.board), **{name: len(w.board) for name, w in self.windows.items()}}
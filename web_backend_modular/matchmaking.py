@@ -0,0 +1,224 @@
+"""
+In-memory matchmaking for ranked battles.
+
+Waiting players sit in rating buckets (`bucket_width` points each), each
+bucket a list sorted by rating. A player's acceptable rating gap starts at
+`base_window` and widens by `widen_per_second` while they wait, up to
+`max_window`. Each join or poll bisects the buckets the window reaches for
+the closest rating, so finding an opponent costs O(window / bucket_width)
+binary searches, O(log n) in the number of queued players; waiting players
+keep polling, so their widened window is what finds newcomers.
+
+Players that stop polling for `stale_after` seconds are dropped (swept
+from the least-recently-seen end, so only evicted players are touched), and
+a match stays readable by join()/poll() for `match_ttl` seconds. The
+`on_match` hook (which opens the battle room, possibly loading questions)
+runs after the lock is released, in the join/poll that made the pair; until
+it returns, the opponent's poll reports the pair as 'starting'. The queue
+lives in one process: run battles on a single worker (or route
+/api/battle/matchmaking/* to one) so all players share a queue.
+"""
+
+import bisect
+import itertools
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+
+class _Ticket:
+    __slots__ = ('user_id', 'rating', 'profile', 'joined_at', 'last_seen', 'bucket', 'key')
+
+    def __init__(self, user_id: int, rating: float, profile: Dict[str, Any], now: float, bucket: int, seq: int):
+        self.user_id = user_id
+        self.rating = rating
+        self.profile = profile
+        self.joined_at = now
+        self.last_seen = now
+        self.bucket = bucket
+        self.key = (rating, seq)  # sort key within the bucket; seq keeps equal ratings in join order
+
+
+def _offsets(reach: int) -> Iterator[int]:
+    """0, -1, 1, -2, 2, ... out to +-reach: nearest buckets first"""
+    yield 0
+    for distance in range(1, reach + 1):
+        yield -distance
+        yield distance
+
+
+class Matchmaker:
+    """Rating-bucketed queue; join/poll/cancel return a status dict for the API."""
+
+    def __init__(self, bucket_width: int = 50, base_window: int = 50, widen_per_second: float = 10.0,
+                 max_window: int = 400, stale_after: float = 30.0, match_ttl: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_match: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.bucket_width = bucket_width
+        self.base_window = base_window
+        self.widen_per_second = widen_per_second
+        self.max_window = max_window
+        self.stale_after = stale_after
+        self.match_ttl = match_ttl
+        self.clock = clock
+        self.on_match = on_match
+        self._buckets: Dict[int, List[Tuple[Tuple[float, int], _Ticket]]] = {}
+        self._seq = itertools.count()
+        self._waiting: "OrderedDict[int, _Ticket]" = OrderedDict()  # least recently seen first
+        self._matches: Dict[int, Tuple[Dict[str, Any], float]] = {}
+        self._match_expiry: Deque[Tuple[float, int]] = deque()
+        self._starting: Set[str] = set()  # battle ids whose on_match hook is still running
+        self._lock = threading.Lock()
+        self.matches_made = 0
+        self.evicted = 0
+
+    def window(self, waited: float) -> int:
+        return int(min(self.max_window, self.base_window + self.widen_per_second * max(0.0, waited)))
+
+    # -- public operations -----------------------------------------------------
+
+    def join(self, user_id: int, rating: float, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            if user_id in self._matches:
+                return self._matched(user_id)
+            ticket = self._waiting.get(user_id)
+            if ticket is None:
+                ticket = _Ticket(user_id, rating, profile or {}, now, int(rating // self.bucket_width), next(self._seq))
+                self._waiting[user_id] = ticket
+                bisect.insort(self._buckets.setdefault(ticket.bucket, []), (ticket.key, ticket))
+            status, match = self._search(ticket, now)
+        return self._announce(user_id, status, match)
+
+    def poll(self, user_id: int) -> Dict[str, Any]:
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            if user_id in self._matches:
+                return self._matched(user_id)
+            ticket = self._waiting.get(user_id)
+            if ticket is None:
+                return {'status': 'idle'}
+            status, match = self._search(ticket, now)
+        return self._announce(user_id, status, match)
+
+    def cancel(self, user_id: int) -> bool:
+        """Leave the queue; False if the player was not waiting (e.g. already matched)."""
+        with self._lock:
+            ticket = self._waiting.get(user_id)
+            if ticket is None:
+                return False
+            self._remove(ticket)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'waiting': len(self._waiting),
+                'buckets': len(self._buckets),
+                'pending_matches': len(self._matches),
+                'matches_made': self.matches_made,
+                'evicted': self.evicted
+            }
+
+    def _announce(self, user_id: int, status: Dict[str, Any], match: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run on_match for a pair this call made (outside the lock), then report the match as ready"""
+        if match is None:
+            return status
+        try:
+            self.on_match(match)
+        finally:
+            with self._lock:
+                self._starting.discard(match['battle_id'])
+                if user_id in self._matches:
+                    status = self._matched(user_id)
+        return status
+
+    # -- internals (lock held) -------------------------------------------------
+
+    def _search(self, ticket: _Ticket, now: float) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """(status, the match if this search made one and on_match must be called)"""
+        ticket.last_seen = now
+        self._waiting.move_to_end(ticket.user_id)
+        window = self.window(now - ticket.joined_at)
+        opponent = self._find_opponent(ticket, window)
+        if opponent is None:
+            return {'status': 'waiting', 'waited': round(now - ticket.joined_at, 3), 'window': window,
+                    'queue_size': len(self._waiting)}, None
+        match = self._pair(ticket, opponent, now)
+        return self._matched(ticket.user_id), match if self.on_match else None
+
+    def _find_opponent(self, ticket: _Ticket, window: int) -> Optional[_Ticket]:
+        """Closest-rated other player within `window` (the earlier joiner on a tie)"""
+        best, best_gap = None, window
+        for offset in _offsets(int(window // self.bucket_width) + 1):
+            if best is not None and (abs(offset) - 1) * self.bucket_width > best_gap:
+                break  # this bucket and the ones beyond it are all farther away
+            bucket = self._buckets.get(ticket.bucket + offset)
+            if not bucket:
+                continue
+            i = bisect.bisect_left(bucket, (ticket.key,))
+            # Neighbours in rating order around the player's position (skipping the player itself)
+            for j in (i - 1, i, i + 1):
+                if 0 <= j < len(bucket) and bucket[j][1] is not ticket:
+                    other = bucket[j][1]
+                    gap = abs(other.rating - ticket.rating)
+                    if gap < best_gap or (gap == best_gap and (best is None or other.key[1] < best.key[1])):
+                        best, best_gap = other, gap
+        return best
+
+    def _pair(self, a: _Ticket, b: _Ticket, now: float) -> Dict[str, Any]:
+        self._remove(a)
+        self._remove(b)
+        match = {
+            'battle_id': f"ranked_{secrets.token_hex(8)}",
+            'players': [self._player(a, now), self._player(b, now)],
+            'matched_at': now
+        }
+        expires = now + self.match_ttl
+        for ticket in (a, b):
+            self._matches[ticket.user_id] = (match, expires)
+            self._match_expiry.append((expires, ticket.user_id))
+        self.matches_made += 1
+        if self.on_match:
+            self._starting.add(match['battle_id'])
+        return match
+
+    @staticmethod
+    def _player(ticket: _Ticket, now: float) -> Dict[str, Any]:
+        return {**ticket.profile, 'id': ticket.user_id, 'rating': ticket.rating,
+                'waited': round(now - ticket.joined_at, 3)}
+
+    def _matched(self, user_id: int) -> Dict[str, Any]:
+        match, _ = self._matches[user_id]
+        if match['battle_id'] in self._starting:
+            return {'status': 'starting', 'battle_id': match['battle_id']}
+        me, other = match['players'] if match['players'][0]['id'] == user_id else reversed(match['players'])
+        return {'status': 'matched', 'battle_id': match['battle_id'], 'rating': me['rating'], 'opponent': other}
+
+    def _remove(self, ticket: _Ticket):
+        self._waiting.pop(ticket.user_id, None)
+        bucket = self._buckets.get(ticket.bucket)
+        if bucket is not None:
+            i = bisect.bisect_left(bucket, (ticket.key,))
+            if i < len(bucket) and bucket[i][1] is ticket:
+                del bucket[i]
+            if not bucket:
+                del self._buckets[ticket.bucket]
+
+    def _expire(self, now: float):
+        while self._match_expiry and self._match_expiry[0][0] <= now:
+            expires, user_id = self._match_expiry.popleft()
+            entry = self._matches.get(user_id)
+            if entry is not None and entry[1] == expires:
+                del self._matches[user_id]
+        # _waiting is ordered by last_seen, so stale players are at the front
+        while self._waiting:
+            ticket = next(iter(self._waiting.values()))
+            if now - ticket.last_seen <= self.stale_after:
+                break
+            self._remove(ticket)
+            self.evicted += 1
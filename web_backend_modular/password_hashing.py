@@ -0,0 +1,231 @@
+"""
+Password hashing: versioned hash strings, a registry of algorithms and a
+bounded pool that keeps the work off the request thread.
+
+Stored hashes look like `algorithm$params$salt$hexdigest`, e.g.
+`pbkdf2_sha256$i=100000$9f2c...$4be1...` or `scrypt$n=16384,r=8,p=1$...`.
+A bare hex digest (plus the separate users.salt value) is the legacy
+PBKDF2-SHA256/100k format and still verifies. A PasswordPolicy names the
+algorithm and cost for new hashes; needs_rehash() tells the login handler to
+store a fresh hash whenever a password was verified against anything else,
+so changing the policy never needs a data migration.
+
+Hashes are computed on a small, bounded thread pool (hashlib releases the GIL
+while it runs, so the pool uses real cores); when the pool and its queue are
+full new work is refused with HashingPoolSaturated instead of piling up behind
+a burst of logins, and the handler answers 503 with Retry-After.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from argon2.low_level import Type as _Argon2Type, hash_secret_raw as _argon2_hash_raw
+except ImportError:  # argon2-cffi is optional
+    _argon2_hash_raw = None
+
+PBKDF2_ITERATIONS = 100000
+LEGACY_ALGORITHM = 'pbkdf2_sha256'
+
+
+def hash_password(password: str, salt: str, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """Hex PBKDF2-HMAC-SHA256 digest (the legacy users.password_hash format)."""
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+def verify_password(password: str, salt: str, expected_hash: str, iterations: int = PBKDF2_ITERATIONS) -> bool:
+    """Constant-time comparison against a stored hex digest."""
+    if not expected_hash or salt is None:
+        return False
+    return hmac.compare_digest(hash_password(password, salt, iterations), expected_hash)
+
+
+# -- hasher registry -----------------------------------------------------------
+
+class Hasher:
+    """One algorithm: `digest()` returns the hex hash for a password, salt and params."""
+
+    name = ''
+    default_params: Dict[str, int] = {}
+
+    def available(self) -> bool:
+        return True
+
+    def digest(self, password: str, salt: str, params: Dict[str, int]) -> str:
+        raise NotImplementedError
+
+
+class PBKDF2Hasher(Hasher):
+    name = 'pbkdf2_sha256'
+    default_params = {'i': PBKDF2_ITERATIONS}
+
+    def digest(self, password, salt, params):
+        return hash_password(password, salt, params['i'])
+
+
+class ScryptHasher(Hasher):
+    name = 'scrypt'
+    default_params = {'n': 2 ** 14, 'r': 8, 'p': 1}
+
+    def available(self):
+        return hasattr(hashlib, 'scrypt')
+
+    def digest(self, password, salt, params):
+        n, r, p = params['n'], params['r'], params['p']
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p,
+                              maxmem=256 * n * r * p + (1 << 20), dklen=32).hex()
+
+
+class Argon2Hasher(Hasher):
+    name = 'argon2id'
+    default_params = {'t': 3, 'm': 65536, 'p': 2}  # m in KiB
+
+    def available(self):
+        return _argon2_hash_raw is not None
+
+    def digest(self, password, salt, params):
+        return _argon2_hash_raw(password.encode('utf-8'), salt.encode('utf-8'), time_cost=params['t'],
+                                memory_cost=params['m'], parallelism=params['p'], hash_len=32,
+                                type=_Argon2Type.ID).hex()
+
+
+HASHERS: Dict[str, Hasher] = {}
+
+
+def register_hasher(hasher: Hasher):
+    HASHERS[hasher.name] = hasher
+
+
+for _hasher in (PBKDF2Hasher(), ScryptHasher(), Argon2Hasher()):
+    register_hasher(_hasher)
+
+
+def parse_params(text: str) -> Dict[str, int]:
+    """'n=16384,r=8,p=1' -> {'n': 16384, 'r': 8, 'p': 1}"""
+    params = {}
+    for part in (text or '').split(','):
+        if part.strip():
+            key, _, value = part.partition('=')
+            params[key.strip()] = int(value)
+    return params
+
+
+def format_params(params: Dict[str, int]) -> str:
+    return ','.join(f"{key}={value}" for key, value in sorted(params.items()))
+
+
+def parse_hash(stored: str, legacy_salt: Optional[str] = None) -> Tuple[str, Dict[str, int], Optional[str], str]:
+    """(algorithm, params, salt, hexdigest) of a stored hash, legacy hex digests included."""
+    if stored and stored.count('$') == 3:
+        algorithm, params, salt, digest = stored.split('$')
+        return algorithm, parse_params(params), salt, digest
+    return LEGACY_ALGORITHM, {'i': PBKDF2_ITERATIONS}, legacy_salt, stored or ''
+
+
+class PasswordPolicy:
+    """Algorithm and cost used for new hashes; verifies any registered format."""
+
+    def __init__(self, algorithm: str = LEGACY_ALGORITHM, params: Optional[Dict[str, int]] = None):
+        hasher = HASHERS.get(algorithm)
+        if hasher is None or not hasher.available():
+            raise ValueError(f"Password hash algorithm '{algorithm}' is not available")
+        self.algorithm = algorithm
+        self.params = {**hasher.default_params, **(params or {})}
+
+    def hash(self, password: str, salt: Optional[str] = None) -> Tuple[str, str]:
+        """(salt, encoded hash) for a new password."""
+        salt = salt or secrets.token_hex(16)
+        digest = HASHERS[self.algorithm].digest(password, salt, self.params)
+        return salt, f"{self.algorithm}${format_params(self.params)}${salt}${digest}"
+
+    def verify(self, password: str, stored: str, legacy_salt: Optional[str] = None) -> bool:
+        try:
+            algorithm, params, salt, digest = parse_hash(stored, legacy_salt)
+        except ValueError:
+            return False
+        hasher = HASHERS.get(algorithm)
+        if hasher is None or not hasher.available() or not digest or salt is None:
+            return False
+        try:
+            computed = hasher.digest(password, salt, params)
+        except (KeyError, ValueError):
+            return False  # params missing or rejected by the algorithm
+        return hmac.compare_digest(computed, digest)
+
+    def needs_rehash(self, stored: str) -> bool:
+        if not stored or stored.count('$') != 3:
+            return True  # legacy hex digest
+        try:
+            algorithm, params, _, _ = parse_hash(stored)
+        except ValueError:
+            return True
+        return algorithm != self.algorithm or params != self.params
+
+    def verify_and_update(self, password: str, stored: str,
+                          legacy_salt: Optional[str] = None) -> Tuple[bool, Optional[Tuple[str, str]]]:
+        """
+        Verify, and when the stored hash does not match the policy also return
+        a replacement (salt, encoded hash) to save.
+        """
+        if not self.verify(password, stored, legacy_salt):
+            return False, None
+        return True, (self.hash(password) if self.needs_rehash(stored) else None)
+
+
+class HashingPoolSaturated(RuntimeError):
+    """Raised when the pool cannot take more work; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    """
+    Thread pool with `workers` threads and room for `max_queue` waiting jobs.
+    `depth` (running + queued) is exported as a metric.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, retry_after: int = 1):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.peak_depth = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn on the pool and wait for its result; raises HashingPoolSaturated when full."""
+        with self._lock:
+            if self.depth >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HashingPoolSaturated(self.retry_after)
+            self.depth += 1
+            self.peak_depth = max(self.peak_depth, self.depth)
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self.depth -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queue_depth': self.depth,
+                'peak_queue_depth': self.peak_depth,
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,215 @@
+"""
+Write-behind buffer for quiz progress entries on the GitHub storage backend.
+
+Answers are appended to a local spool file (fsync'ed) and kept in memory per
+user; a background thread pushes them to GitHub in batches once enough entries
+are pending, the oldest pending entry is too old, or the process shuts down.
+A request never waits for GitHub: reaching a threshold only wakes the thread.
+After a failed flush the next attempt is delayed with exponential backoff, so
+an outage does not retry the growing batch on every answer. A spool file left
+behind by a crashed worker is replayed by the next worker that starts.
+"""
+
+import atexit
+import glob
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process spool locking
+    fcntl = None
+
+SPOOL_SUFFIX = ".jsonl"
+FLUSHING_SUFFIX = ".flushing"
+
+
+def entry_key(entry: Dict[str, Any]):
+    """Identity of a progress entry, used to drop duplicates after a replay."""
+    return (entry.get('question_id'), entry.get('timestamp'), entry.get('quiz_session_id'))
+
+
+class ProgressWriteBuffer:
+    """
+    Collects progress entries per user and flushes them through `write_batch`.
+
+    `write_batch(pending)` receives {user_id: [entry, ...]} and must persist all
+    of it or raise; on failure the entries stay buffered (and spooled) for the
+    next flush, which is delayed by `retry_delay` seconds doubling after each
+    consecutive failure up to `max_retry_delay`.
+    """
+
+    def __init__(self, write_batch: Callable[[Dict[int, List[dict]]], None], spool_dir: str,
+                 max_pending: int = 20, max_age: float = 30.0,
+                 retry_delay: float = 2.0, max_retry_delay: float = 300.0):
+        self.write_batch = write_batch
+        self.spool_dir = spool_dir
+        self.max_pending = max(1, max_pending)
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._pending: Dict[int, List[dict]] = {}
+        self._pending_count = 0
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._failures = 0
+        self._retry_at = 0.0  # monotonic time before which threshold flushes wait (backoff)
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self._spool = self._open_spool()
+        self._recover_orphans()
+
+    # -- spool files -------------------------------------------------------
+
+    def _open_spool(self):
+        path = os.path.join(self.spool_dir, f"progress-{os.getpid()}-{secrets.token_hex(4)}{SPOOL_SUFFIX}")
+        f = open(path, "a+", encoding="utf-8")
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return f
+
+    def _spool_write(self, lines: List[str]):
+        if not lines:
+            return
+        self._spool.write("".join(lines))
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    @staticmethod
+    def _spool_line(user_id: int, entry: Dict[str, Any]) -> str:
+        return json.dumps({"user_id": user_id, "entry": entry}, ensure_ascii=False) + "\n"
+
+    def _recover_orphans(self):
+        """Take over spool files whose owning process is gone (their lock is free)."""
+        pattern_paths = glob.glob(os.path.join(self.spool_dir, f"*{SPOOL_SUFFIX}")) + \
+            glob.glob(os.path.join(self.spool_dir, f"*{FLUSHING_SUFFIX}"))
+        for path in pattern_paths:
+            if path == self._spool.name:
+                continue
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except OSError:
+                continue
+            try:
+                if fcntl:
+                    try:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue  # still owned by a live worker
+                recovered = []
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        recovered.append((int(rec["user_id"]), rec["entry"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn last line from a crash
+                with self._lock:
+                    self._spool_write([self._spool_line(uid, e) for uid, e in recovered])
+                    for uid, e in recovered:
+                        self._add_pending(uid, e)
+                os.unlink(path)
+            finally:
+                f.close()
+
+    # -- buffering -----------------------------------------------------------
+
+    def _add_pending(self, user_id: int, entry: Dict[str, Any]):
+        self._pending.setdefault(user_id, []).append(entry)
+        self._pending_count += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def append(self, user_id: int, entry: Dict[str, Any]):
+        """Durably record one entry locally; wake the flush thread if a threshold is reached."""
+        self.extend(user_id, [entry])
+
+    def extend(self, user_id: int, entries: List[Dict[str, Any]]):
+        """Durably record several entries with one spool write (one fsync)."""
+        with self._lock:
+            self._spool_write([self._spool_line(user_id, entry) for entry in entries])
+            for entry in entries:
+                self._add_pending(user_id, entry)
+        if self._should_flush():
+            self._wake.set()
+
+    def pending_for(self, user_id: int) -> List[dict]:
+        with self._lock:
+            return list(self._pending.get(user_id, []))
+
+    def _should_flush(self) -> bool:
+        with self._lock:
+            if not self._pending_count or time.monotonic() < self._retry_at:
+                return False
+            return (self._pending_count >= self.max_pending
+                    or time.monotonic() - self._oldest >= self.max_age)
+
+    def flush(self) -> int:
+        """Push all pending entries. Returns the number of entries written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending_count:
+                    return 0
+                batch, count = self._pending, self._pending_count
+                self._pending, self._pending_count, self._oldest = {}, 0, None
+                # Rotate the spool: the old file (still locked) covers exactly `batch`
+                old_spool = self._spool
+                flushing_path = old_spool.name[:-len(SPOOL_SUFFIX)] + FLUSHING_SUFFIX
+                os.rename(old_spool.name, flushing_path)
+                self._spool = self._open_spool()
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                print(f"Progress flush failed, keeping {count} entries buffered: {e}")
+                with self._lock:
+                    # Re-spool the failed batch before its flushing file is dropped
+                    self._spool_write([self._spool_line(uid, entry) for uid, entries in batch.items() for entry in entries])
+                    for uid, entries in batch.items():
+                        self._pending[uid] = entries + self._pending.get(uid, [])
+                    self._pending_count += count
+                    self._oldest = self._oldest or time.monotonic()
+                    self._failures += 1
+                    self._retry_at = time.monotonic() + min(self.max_retry_delay,
+                                                            self.retry_delay * 2 ** (self._failures - 1))
+                count = 0
+            else:
+                with self._lock:
+                    self._failures, self._retry_at = 0, 0.0
+            os.unlink(flushing_path)
+            old_spool.close()
+            return count
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        """Start the background timer that enforces `max_age` and flush at exit."""
+        t = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        t.start()
+        atexit.register(self.close)
+        return self
+
+    def _run(self):
+        interval = max(1.0, self.max_age / 2)
+        while True:
+            with self._lock:
+                backoff = self._retry_at - time.monotonic()
+            self._wake.wait(min(interval, backoff) if backoff > 0 else interval)
+            if self._stopped.is_set():
+                return
+            self._wake.clear()
+            try:
+                if self._should_flush():
+                    self.flush()
+            except Exception as e:
+                print(f"Progress flush timer error: {e}")
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
@@ -0,0 +1,181 @@
+"""
+Segmented, append-only quiz progress log for the GitHub storage backend.
+
+Each user's answers live in size-capped segment files
+(quiz_progress/{uid}/000001.json, 000002.json, ...) next to a compact summary
+(quiz_progress/{uid}/_summary.json) holding the answered and wrong question id
+sets, counters and the spaced-repetition schedule of every answered question.
+Appending touches only the tail segment and the summary; the "unanswered",
+"wrong" and "review" views are served from the summary alone.
+"""
+
+import hashlib
+import json
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional
+
+from review_scheduler import ReviewQueue, Schedule, entry_time, next_schedule
+
+DEFAULT_SEGMENT_SIZE = 500
+
+
+def legacy_path(user_id: int) -> str:
+    return f"quiz_progress/{user_id}.json"
+
+
+def summary_path(user_id: int) -> str:
+    return f"quiz_progress/{user_id}/_summary.json"
+
+
+def segment_path(user_id: int, segment_no: int) -> str:
+    return f"quiz_progress/{user_id}/{segment_no:06d}.json"
+
+
+def new_summary(segment_size: int = DEFAULT_SEGMENT_SIZE) -> Dict[str, Any]:
+    return {
+        'segment_size': segment_size,
+        'segments': 0,       # number of the tail segment (0 = none yet)
+        'tail_count': 0,     # entries in the tail segment
+        'total': 0,
+        'correct': 0,
+        'answered': [],      # sorted question ids with any answer
+        'wrong': [],         # sorted question ids answered wrong at least once
+        'review': {}         # question id -> SM-2 schedule (Schedule.to_json)
+    }
+
+
+def _qid(entry: Dict[str, Any]) -> Any:
+    qid = entry.get('question_id')
+    try:
+        return int(qid)
+    except (TypeError, ValueError):
+        return qid
+
+
+def _add_sorted(ids: List[Any], qid: Any):
+    i = bisect_left(ids, qid)
+    if i == len(ids) or ids[i] != qid:
+        ids.insert(i, qid)
+
+
+def _apply_review(review: Dict[str, List[Any]], qid: Any, entry: Dict[str, Any]):
+    reviewed_at = entry_time(entry)
+    if reviewed_at is None:
+        return
+    key = str(qid)
+    prev = Schedule.from_json(review[key]) if key in review else None
+    if prev is not None and reviewed_at <= prev.reviewed_at:
+        return  # same rule as ReviewQueue.record: replays do not advance the schedule
+    review[key] = next_schedule(prev, bool(entry.get('is_correct')), reviewed_at,
+                                entry.get('response_time')).to_json()
+
+
+def apply_entries(summary: Dict[str, Any], entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold entries into the summary counters, id sets and schedules (in place)."""
+    review = summary.setdefault('review', {})  # summaries written before review mode lack it
+    for entry in entries:
+        qid = _qid(entry)
+        summary['total'] += 1
+        if entry.get('is_correct'):
+            summary['correct'] += 1
+        _apply_review(review, qid, entry)
+        try:
+            _add_sorted(summary['answered'], qid)
+            if not entry.get('is_correct'):
+                _add_sorted(summary['wrong'], qid)
+        except TypeError:
+            continue  # non-numeric ids cannot be ordered with the rest; counted only
+    return summary
+
+
+def append_to_segments(summary: Dict[str, Any], tail: List[Dict[str, Any]],
+                       entries: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Place new entries after the current tail, rolling over to new segments at
+    `segment_size`. Updates the summary in place and returns the changed
+    segments as {segment_no: full entry list}.
+    """
+    if not entries:
+        return {}
+    size = int(summary.get('segment_size') or DEFAULT_SEGMENT_SIZE)
+    changed: Dict[int, List[Dict[str, Any]]] = {}
+    segment_no = summary['segments']
+    current = list(tail)
+    if segment_no == 0 or len(current) >= size:
+        segment_no, current = segment_no + 1, []
+    for entry in entries:
+        if len(current) >= size:
+            changed[segment_no] = current
+            segment_no, current = segment_no + 1, []
+        current.append(entry)
+    changed[segment_no] = current
+    summary['segments'] = segment_no
+    summary['tail_count'] = len(current)
+    apply_entries(summary, entries)
+    return changed
+
+
+def summary_from_entries(entries: List[Dict[str, Any]], segment_size: int = DEFAULT_SEGMENT_SIZE):
+    """Build a summary and segments for a full history (legacy migration)."""
+    summary = new_summary(segment_size)
+    return summary, append_to_segments(summary, [], entries)
+
+
+def _chain(revision: str, entry: Dict[str, Any]) -> str:
+    material = json.dumps(entry, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{revision}\n{material}".encode('utf-8')).hexdigest()[:32]
+
+
+class ProgressIndex:
+    """
+    In-memory answered/wrong id sets and review queue for one user, built from
+    a summary and kept current by add() as answers come in. `version` is the
+    summary sha it was built from. `revision` (a cache key for per-user views)
+    is derived from stored state only: the summary sha chained with a digest
+    of every entry applied on top of it (`applied`, already in `summary`, then
+    add()). It changes whenever the index does, and workers holding the same
+    state agree on it while different unflushed entries never share one.
+    """
+
+    __slots__ = ('answered', 'wrong', 'schedule', 'version', 'revision')
+
+    def __init__(self, summary: Dict[str, Any], version: Any = None, applied: Iterable[Dict[str, Any]] = ()):
+        self.answered = set(summary.get('answered') or [])
+        self.wrong = set(summary.get('wrong') or [])
+        self.schedule = ReviewQueue.from_summary(summary.get('review'))
+        self.version = version
+        self.revision = f"sha:{version}"
+        for entry in applied:
+            self.revision = _chain(self.revision, entry)
+
+    def add(self, entry: Dict[str, Any]):
+        qid = _qid(entry)
+        self.answered.add(qid)
+        if not entry.get('is_correct'):
+            self.wrong.add(qid)
+        reviewed_at = entry_time(entry)
+        if reviewed_at is not None:
+            self.schedule.record(qid, bool(entry.get('is_correct')), reviewed_at, entry.get('response_time'))
+        self.revision = _chain(self.revision, entry)
+
+    def review(self, payloads: List[Dict[str, Any]], payload_by_id: Dict[Any, Dict[str, Any]], now: float,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The 'review' quiz mode: questions due at `now` (most overdue first),
+        then questions without a schedule yet in their natural order.
+        """
+        selected = [payload_by_id[qid] for qid in self.schedule.due(now, payload_by_id, limit)]
+        for p in payloads:
+            if limit and len(selected) >= limit:
+                break
+            if p['id'] not in self.schedule:
+                selected.append(p)
+        return selected
+
+    def filter(self, payloads: List[Dict[str, Any]], mode: str) -> List[Dict[str, Any]]:
+        """Apply the 'unanswered' / 'wrong' quiz modes to mapped questions; other modes pass through."""
+        if mode == 'unanswered':
+            return [p for p in payloads if p['id'] not in self.answered]
+        if mode == 'wrong':
+            return [p for p in payloads if p['id'] in self.wrong]
+        return payloads
@@ -0,0 +1,107 @@
+"""
+In-memory index over the GitHub-stored question bank.
+
+A QuestionBank is built once per file version (a per-table shard, or the
+legacy monolithic questions.json) and then answers the hot quiz lookups
+(question by id, questions of a table, table listing) without scanning the
+whole question list.
+"""
+
+from typing import Any, Dict, List, Optional
+
+_LETTER_TO_INDEX = {'A': 0, 'a': 0, 'B': 1, 'b': 1, 'C': 2, 'c': 2}
+
+
+def normalize_correct_answer(raw: Any) -> Optional[int]:
+    """Map a stored correct answer (0/1/2 or 'A'/'B'/'C') to a numeric index."""
+    if isinstance(raw, str):
+        return _LETTER_TO_INDEX.get(raw.strip(), None)
+    try:
+        return int(raw) if raw is not None else None
+    except Exception:
+        return None
+
+
+def map_question(q: Dict[str, Any]) -> Dict[str, Any]:
+    """Unified question shape returned by /api/quiz/questions."""
+    return {
+        'id': q.get('id'),
+        'text': q.get('question') or q.get('question_text'),
+        'answers': [q.get('answer_a'), q.get('answer_b'), q.get('answer_c')],
+        'difficulty': q.get('difficulty') or 'medium',
+        'category': q.get('category'),
+        'explanation': q.get('explanation')
+    }
+
+
+def table_list(quiz_tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Table entries shaped for /api/quiz/tables."""
+    return [{
+        'name': t.get('name'),
+        'display_name': t.get('display_name') or t.get('name', '').replace('_', ' ').title(),
+        'question_count': t.get('question_count', 0)
+    } for t in quiz_tables]
+
+
+class QuestionBank:
+    """
+    Read-only index of one version of a question file.
+
+    Holds questions by id and by table, normalized correct answers, per-table
+    counts and pre-mapped response payloads. Instances are shared between
+    requests and must not be mutated.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]], version: Optional[str] = None):
+        data = data or {}
+        self.version = version
+        self.by_id: Dict[Any, Dict[str, Any]] = {}
+        self.by_table: Dict[str, List[Dict[str, Any]]] = {}
+        self.correct_by_id: Dict[Any, Optional[int]] = {}
+        self.payloads_by_table: Dict[str, List[Dict[str, Any]]] = {}
+
+        for q in data.get('questions') or []:
+            qid = q.get('id')
+            self.by_id[qid] = q
+            self.correct_by_id[qid] = normalize_correct_answer(q.get('correct_answer'))
+            self.by_table.setdefault(q.get('table_name'), []).append(q)
+
+        for table_name, questions in self.by_table.items():
+            self.payloads_by_table[table_name] = [map_question(q) for q in questions]
+        self.payload_index_by_table: Dict[str, Dict[Any, Dict[str, Any]]] = {
+            tn: {p['id']: p for p in payloads} for tn, payloads in self.payloads_by_table.items()
+        }
+
+        self.counts: Dict[str, int] = {tn: len(qs) for tn, qs in self.by_table.items()}
+        self.tables = self._build_table_list(data.get('quiz_tables'))
+
+    def _build_table_list(self, quiz_tables: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        if quiz_tables:
+            # Already have display_name & counts
+            return table_list(quiz_tables)
+        # Fallback: infer from questions
+        return [{
+            'name': tn,
+            'display_name': tn.replace('_', ' ').title() if tn else 'Unknown',
+            'question_count': cnt
+        } for tn, cnt in self.counts.items()]
+
+    def get(self, question_id: Any) -> Optional[Dict[str, Any]]:
+        q = self.by_id.get(question_id)
+        if q is None and not isinstance(question_id, int):
+            try:
+                q = self.by_id.get(int(question_id))
+            except (TypeError, ValueError):
+                return None
+        return q
+
+    def correct_answer(self, question: Dict[str, Any]) -> Optional[int]:
+        return self.correct_by_id.get(question.get('id'))
+
+    def table_payloads(self, table_name: str) -> List[Dict[str, Any]]:
+        """Mapped questions of one table (shared list, copy before reordering)."""
+        return self.payloads_by_table.get(table_name, [])
+
+    def table_payload_index(self, table_name: str) -> Dict[Any, Dict[str, Any]]:
+        """Mapped questions of one table by id (shared dict, do not modify)."""
+        return self.payload_index_by_table.get(table_name, {})
@@ -0,0 +1,54 @@
+"""
+Random question sampling without ORDER BY random().
+
+`ORDER BY random()` sorts every row of a table per request. Instead, each
+worker keeps the question ids of a table in a compact array and draws `k`
+of them with random.sample (a partial shuffle, O(k) for small k); the caller
+then fetches just those rows with `id IN (...)`.
+
+Id arrays are dropped by invalidate() when this worker adds questions and
+expire after `ttl` seconds so changes made by other workers (or scripts such
+as init_db.py) are picked up.
+"""
+
+import random
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class QuestionIdSampler:
+    """Per-table cache of question id arrays used for random selection."""
+
+    def __init__(self, load_ids: Callable[[str], Iterable[int]], ttl: float = 60.0,
+                 rng: Optional[random.Random] = None):
+        self.load_ids = load_ids
+        self.ttl = ttl
+        self.rng = rng or random.Random()
+        self._ids: Dict[str, Tuple[array, float]] = {}
+        self._lock = threading.Lock()
+
+    def ids(self, table_name: str) -> array:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._ids.get(table_name)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        ids = array('q', self.load_ids(table_name))
+        with self._lock:
+            self._ids[table_name] = (ids, now)
+        return ids
+
+    def sample(self, table_name: str, k: Optional[int] = None) -> List[int]:
+        """Up to `k` distinct random ids of a table (all ids, shuffled, if k is None)."""
+        ids = self.ids(table_name)
+        k = len(ids) if k is None else max(0, min(k, len(ids)))
+        return self.rng.sample(ids, k)
+
+    def invalidate(self, table_name: Optional[str] = None):
+        with self._lock:
+            if table_name is None:
+                self._ids.clear()
+            else:
+                self._ids.pop(table_name, None)
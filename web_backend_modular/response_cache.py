@@ -0,0 +1,83 @@
+"""
+Serialized-response cache for read-heavy JSON endpoints.
+
+Handlers describe a response by a key made of everything it depends on
+(endpoint, query args, question bank version, and for per-user views the
+user and their progress version). The key hashes to a strong ETag, so a
+request carrying a matching If-None-Match is answered with 304 before any
+storage is read, and the serialized body is kept in a bounded LRU so a
+repeat request skips building and encoding the payload. Given a SharedStore
+(see shared_store.py) the bodies are kept there, for `ttl` seconds, so all
+workers share one cache.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class ResponseCache:
+    """LRU of response bodies by ETag, bounded by entry count and total bytes."""
+
+    NAMESPACE = 'response:'
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024, store=None, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag(key: Any) -> str:
+        """Strong ETag (unquoted) for a response key; the key must have a stable repr()."""
+        return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        if self.store is not None:
+            body = self.store.get(self.NAMESPACE + etag)
+            with self._lock:
+                if body is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return body
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return body
+
+    def put(self, etag: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        if self.store is not None:
+            self.store.set(self.NAMESPACE + etag, body, self.ttl)
+            return
+        with self._lock:
+            old = self._entries.pop(etag, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[etag] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        if self.store is not None:
+            self.store.clear(self.NAMESPACE)
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,153 @@
+"""
+SM-2 spaced-repetition scheduling for the quiz "review" mode.
+
+Every (user, question) pair carries an ease factor, an interval and a
+repetition count, advanced by each submitted answer. A question is due again
+`interval` days after its last review. The SQL backend keeps these in the
+review_states table (indexed by user, table and due time); the GitHub backend
+keeps them in the progress summary and serves due questions from a ReviewQueue.
+
+Times are UTC epoch seconds throughout; naive datetimes are taken as UTC.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+from typing import Any, Container, Dict, List, NamedTuple, Optional
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+LAPSE_INTERVAL_DAYS = 10 / (24 * 60)  # a wrong answer comes back after 10 minutes
+FAST_ANSWER_SECONDS = 8.0  # correct and at most this fast counts as an easy recall
+DAY_SECONDS = 86400
+
+
+class Schedule(NamedTuple):
+    ease: float
+    interval: float  # days
+    repetitions: int
+    reviewed_at: float
+
+    @property
+    def due(self) -> float:
+        return self.reviewed_at + self.interval * DAY_SECONDS
+
+    def to_json(self) -> List[Any]:
+        return [self.ease, self.interval, self.repetitions, self.reviewed_at]
+
+    @classmethod
+    def from_json(cls, raw: List[Any]) -> "Schedule":
+        ease, interval, repetitions, reviewed_at = raw
+        return cls(float(ease), float(interval), int(repetitions), float(reviewed_at))
+
+
+def to_epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def from_epoch(ts: float) -> datetime:
+    """Naive UTC datetime, matching the datetime.utcnow() columns of the SQL models."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def entry_time(entry: Dict[str, Any]) -> Optional[float]:
+    """Epoch time of a stored progress entry, or None if its timestamp is unusable."""
+    try:
+        return to_epoch(datetime.fromisoformat(entry.get('timestamp')))
+    except (TypeError, ValueError):
+        return None
+
+
+def answer_quality(is_correct: bool, response_time: Optional[float] = None) -> int:
+    """SM-2 recall quality (0-5) from what a multiple-choice answer tells us."""
+    if not is_correct:
+        return 1
+    try:
+        if response_time is not None and float(response_time) <= FAST_ANSWER_SECONDS:
+            return 5
+    except (TypeError, ValueError):
+        pass
+    return 4
+
+
+def next_schedule(prev: Optional[Schedule], is_correct: bool, reviewed_at: float,
+                  response_time: Optional[float] = None) -> Schedule:
+    """Advance a question's schedule by one answer (SM-2)."""
+    quality = answer_quality(is_correct, response_time)
+    ease, interval, repetitions = (prev.ease, prev.interval, prev.repetitions) if prev else (DEFAULT_EASE, 0.0, 0)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        repetitions, interval = 0, LAPSE_INTERVAL_DAYS
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1.0
+        elif repetitions == 2:
+            interval = 6.0
+        else:
+            interval = interval * ease
+    return Schedule(ease, interval, repetitions, reviewed_at)
+
+
+class ReviewQueue:
+    """
+    One user's schedules with a due-time ordered index.
+
+    `due()` walks the index from the most overdue question and stops at the
+    first one not yet due (or once `limit` matches are found), so selection
+    cost does not depend on how many questions are scheduled.
+    """
+
+    __slots__ = ('schedules', '_order')
+
+    def __init__(self, schedules: Optional[Dict[Any, Schedule]] = None):
+        self.schedules: Dict[Any, Schedule] = dict(schedules or {})
+        self._order = sorted((s.due, qid) for qid, s in self.schedules.items())
+
+    @classmethod
+    def from_summary(cls, review: Optional[Dict[str, List[Any]]]) -> "ReviewQueue":
+        schedules = {}
+        for qid, raw in (review or {}).items():
+            try:
+                schedules[int(qid)] = Schedule.from_json(raw)
+            except (TypeError, ValueError):
+                continue
+        return cls(schedules)
+
+    def __contains__(self, question_id: Any) -> bool:
+        return question_id in self.schedules
+
+    def __len__(self) -> int:
+        return len(self.schedules)
+
+    def record(self, question_id: Any, is_correct: bool, reviewed_at: float,
+               response_time: Optional[float] = None) -> Optional[Schedule]:
+        """
+        Apply one answer. Answers not newer than the last recorded review are
+        ignored, so replaying an entry (e.g. a flushed buffer) is harmless.
+        """
+        prev = self.schedules.get(question_id)
+        if prev is not None:
+            if reviewed_at <= prev.reviewed_at:
+                return None
+            i = bisect_left(self._order, (prev.due, question_id))
+            if i < len(self._order) and self._order[i] == (prev.due, question_id):
+                del self._order[i]
+        schedule = next_schedule(prev, is_correct, reviewed_at, response_time)
+        self.schedules[question_id] = schedule
+        insort(self._order, (schedule.due, question_id))
+        return schedule
+
+    def due(self, now: float, eligible: Optional[Container[Any]] = None, limit: Optional[int] = None) -> List[Any]:
+        """Ids due at `now`, most overdue first, optionally restricted to `eligible` ids."""
+        order = self._order
+        end = bisect_right(order, (now, float('inf')))
+        out: List[Any] = []
+        for i in range(end):
+            qid = order[i][1]
+            if eligible is None or qid in eligible:
+                out.append(qid)
+                if limit and len(out) >= limit:
+                    break
+        return out
@@ -0,0 +1,309 @@
+"""
+Key/value store shared by all worker processes.
+
+Flask-Limiter with `memory://` and the in-process caches keep their state per
+gunicorn worker: with N workers a client gets N times the configured rate
+limit, and every worker warms (and invalidates) its own caches. A
+SharedStore gives the limiter and the app caches one place to keep that
+state. Backends, picked by SHARED_STORE_URI:
+
+  - memory://                 this process only (the previous behaviour)
+  - sqlite:///path/store.db   all workers on one host; a file under
+                              /dev/shm keeps it in shared memory
+  - redis://host:6379/0       any Redis-compatible server (needs `redis`)
+
+Values are bytes with an optional TTL; counters (incr) set their TTL only
+when they are created, which is the fixed-window rate limit pattern.
+SharedLimiterStorage registers the `shared://` scheme with `limits` so the
+limiter can run on the same store.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+
+try:
+    import redis as _redis
+except ImportError:  # only needed for redis:// URIs
+    _redis = None
+
+
+class SharedStore:
+    """Byte values and integer counters by key, all keys under `prefix`."""
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add to a counter; a new (or expired) counter starts at 0 and expires after `ttl`."""
+        raise NotImplementedError
+
+    def ttl(self, key: str) -> Optional[float]:
+        """Seconds until the key expires (None if it does not exist or never expires)."""
+        raise NotImplementedError
+
+    def clear(self, prefix: str = '') -> int:
+        """Delete every key starting with `prefix`; returns the number deleted."""
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        return True
+
+
+class MemoryStore(SharedStore):
+    """Dict-backed store; not shared between processes."""
+
+    def __init__(self, prefix: str = ''):
+        super().__init__(prefix)
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(self.prefix + key, time.time())
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[self.prefix + key] = (value, time.time() + ttl if ttl is not None else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(self.prefix + key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        key, now = self.prefix + key, time.time()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                entry = (b'0', now + ttl if ttl is not None else None)
+            value = int(entry[0]) + amount
+            self._data[key] = (str(value).encode(), entry[1])
+        return value
+
+    def ttl(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._live(self.prefix + key, now)
+        return entry[1] - now if entry and entry[1] is not None else None
+
+    def clear(self, prefix=''):
+        prefix = self.prefix + prefix
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+
+class SQLiteStore(SharedStore):
+    """
+    One SQLite table (WAL mode) shared by every process that opens the same
+    file. Each thread gets its own connection and reconnects after a fork;
+    expired rows are skipped on read and pruned every `prune_every` writes.
+    """
+
+    def __init__(self, path: str, prefix: str = '', prune_every: int = 1000):
+        super().__init__(prefix)
+        self.path = path
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        # Short-lived connection: SQLite locks break if a connection is carried across
+        # fork(), and the store is usually created in the gunicorn master before it forks
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS shared_store '
+                         '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL) WITHOUT ROWID')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _wrote(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self.prune_every and self._writes % self.prune_every == 0:
+            conn.execute('DELETE FROM shared_store WHERE expires_at <= ?', (time.time(),))
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM shared_store WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (self.prefix + key, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO shared_store (key, value, expires_at) VALUES (?, ?, ?)',
+                     (self.prefix + key, value, time.time() + ttl if ttl is not None else None))
+        self._wrote(conn)
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM shared_store WHERE key = ?', (self.prefix + key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        key, now = self.prefix + key, time.time()
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so concurrent increments serialize
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value, expires_at FROM shared_store WHERE key = ?', (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                value, expires_at = amount, now + ttl if ttl is not None else None
+            else:
+                value, expires_at = int(row[0]) + amount, row[1]
+            conn.execute('INSERT OR REPLACE INTO shared_store (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, str(value).encode(), expires_at))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._wrote(conn)
+        return value
+
+    def ttl(self, key):
+        now = time.time()
+        row = self._conn().execute('SELECT expires_at FROM shared_store WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                                   (self.prefix + key, now)).fetchone()
+        return row[0] - now if row and row[0] is not None else None
+
+    def clear(self, prefix=''):
+        prefix = self.prefix + prefix
+        return self._conn().execute('DELETE FROM shared_store WHERE substr(key, 1, ?) = ?',
+                                    (len(prefix), prefix)).rowcount
+
+    def ping(self):
+        return self._conn().execute('SELECT 1').fetchone() == (1,)
+
+
+class RedisStore(SharedStore):
+    """Store on a Redis-compatible client (redis.Redis or anything with the same commands)."""
+
+    def __init__(self, client, prefix: str = ''):
+        super().__init__(prefix)
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = '') -> 'RedisStore':
+        if _redis is None:
+            raise ValueError("redis:// shared store requires the 'redis' package")
+        return cls(_redis.Redis.from_url(url), prefix)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)) if ttl is not None else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key, amount=1, ttl=None):
+        key = self.prefix + key
+        if ttl is None:
+            return self.client.incrby(key, amount)
+        # One MULTI/EXEC: the counter is created with its expiry (SET NX PX) and incremented atomically, so
+        # no crash or racing first increment can leave it without a TTL (a rate limit locked out for good)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(key, 0, nx=True, px=max(1, int(ttl * 1000)))
+        pipe.incrby(key, amount)
+        return pipe.execute()[1]
+
+    def ttl(self, key):
+        ms = self.client.pttl(self.prefix + key)
+        return ms / 1000 if ms is not None and ms >= 0 else None
+
+    def clear(self, prefix=''):
+        keys = list(self.client.scan_iter(match=self.prefix + prefix + '*'))
+        return self.client.delete(*keys) if keys else 0
+
+    def ping(self):
+        return bool(self.client.ping())
+
+
+def open_store(uri: str, prefix: str = '') -> SharedStore:
+    """SharedStore for a memory://, sqlite:///path or redis:// URI."""
+    scheme = urlparse(uri).scheme
+    if scheme == 'memory':
+        return MemoryStore(prefix)
+    if scheme == 'sqlite':
+        path = uri[len('sqlite:///'):]
+        if not path:
+            raise ValueError("sqlite shared store needs a path, e.g. sqlite:////dev/shm/quiz_store.db")
+        return SQLiteStore(path, prefix)
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisStore.from_url(uri, prefix)
+    raise ValueError(f"Unsupported shared store URI: {uri}")
+
+
+class SharedLimiterStorage(Storage):
+    """
+    `limits` storage on a SharedStore, for Flask-Limiter:
+    Limiter(storage_uri='shared://', storage_options={'store': store}).
+    Supports the fixed-window strategy (Flask-Limiter's default).
+    """
+
+    STORAGE_SCHEME = ['shared']
+    KEY_PREFIX = 'limiter:'
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, store: Optional[SharedStore] = None,
+                 **options):
+        if store is None:
+            raise ValueError("shared:// limiter storage needs storage_options={'store': ...}")
+        self.store = store
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return (sqlite3.Error, OSError) + ((_redis.RedisError,) if _redis is not None else ())
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self.store.incr(self.KEY_PREFIX + key, amount, ttl=expiry)
+
+    def get(self, key: str) -> int:
+        value = self.store.get(self.KEY_PREFIX + key)
+        return int(value) if value is not None else 0
+
+    def get_expiry(self, key: str) -> float:
+        return time.time() + (self.store.ttl(self.KEY_PREFIX + key) or 0)
+
+    def check(self) -> bool:
+        try:
+            return self.store.ping()
+        except Exception:
+            return False
+
+    def reset(self) -> Optional[int]:
+        return self.store.clear(self.KEY_PREFIX)
+
+    def clear(self, key: str) -> None:
+        self.store.delete(self.KEY_PREFIX + key)
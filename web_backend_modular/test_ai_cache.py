@@ -0,0 +1,107 @@
+"""
+Tests for the content-addressed AI cache, its use by MonicaAIService and
+the hint/explanation endpoints that write AI text back to the questions.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+from ai_cache import AICache, cache_key, normalize_input
+from conftest import auth_headers
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    clock = Clock()
+    cache = AICache(create_engine(f"sqlite:///{tmp_path / 'ai_cache.db'}"), ttl=60, max_entries=3, prune_every=1,
+                    clock=clock)
+    cache.clock_ = clock
+    return cache
+
+
+def test_keys_ignore_case_punctuation_and_spacing():
+    assert normalize_input("  Ohmův   ZÁKON! ") == "ohmův zákon"
+    key = cache_key("oral_exam", "m", ["Co je proud?", "I = U/R", "Proud je  napětí lomeno odporem."])
+    assert key == cache_key("oral_exam", "m", ["co je proud", "i u r", "proud je napětí lomeno odporem"])
+    assert key != cache_key("hint", "m", ["co je proud", "i u r", "proud je napětí lomeno odporem"])
+    assert key != cache_key("oral_exam", "other-model", ["co je proud", "i u r", "proud je napětí lomeno odporem"])
+
+
+def test_ttl_and_least_recently_used_eviction(sqlite_cache):
+    cache, clock = sqlite_cache, sqlite_cache.clock_
+    for n in range(3):
+        cache.put("hint", "m", [f"q{n}"], f"hint {n}", tokens=100)
+        clock.now += 1
+    assert cache.get("hint", "m", ["Q0"]) == ("hint 0", 100)  # q0 is now the most recently used
+    cache.put("hint", "m", ["q3"], "hint 3", tokens=100)
+    assert cache.get("hint", "m", ["q1"]) is None  # evicted: least recently used
+    assert cache.get("hint", "m", ["q0"]) is not None and cache.get("hint", "m", ["q3"]) is not None
+    clock.now += 61
+    assert cache.get("hint", "m", ["q0"]) is None
+    assert cache.stats() == {"hits": 3, "misses": 2, "tokens_saved": 300, "hit_rate": 0.6}
+
+
+def test_service_answers_repeated_prompts_from_the_cache(app_module, fake_completions, sqlite_cache):
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url, cache=sqlite_cache)
+    try:
+        first = service.evaluate_oral_answer("Co je proud?", "I = U/R", "Proud je napětí lomeno odporem.")
+        again = service.evaluate_oral_answer("Co je proud?", "I = U/R", "proud je napětí, lomeno odporem")
+        assert len(fake_completions.requests) == 1 and not first.get("cached")
+        assert again["cached"] and again["tokens_saved"] == first["usage"]["total_tokens"]
+        assert app_module.completion_text(again) == app_module.completion_text(first)
+
+        fake_completions.reply = lambda body: "Hodnocení nelze vrátit jako JSON"
+        for _ in range(2):
+            service.evaluate_oral_answer("Co je napětí?", "U = R*I", "nevím")
+        assert len(fake_completions.requests) == 3  # a reply that is not JSON is never cached
+    finally:
+        service.client.close()
+
+
+def test_hints_are_written_back_and_usage_shows_cache_savings(app_module, client, fake_completions, monkeypatch):
+    fake_completions.reply = lambda body: "Vzpomeňte si na Ohmův zákon."
+    cache = AICache(app_module._app_engine)
+    cache.clear()
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url, cache=cache)
+    monkeypatch.setattr(app_module, "monica_ai", service)
+    r = client.post("/api/auth/register", json={"username": "ann", "password": "pw123456"})
+    uid = r.get_json()["user"]["id"]
+    with app_module.app.app_context():
+        db, Question = app_module.db, app_module.Question
+        db.session.get(app_module.User, uid).role = "admin"
+        rows = [Question(table_name=table, question_text="Jak spolu souvisí U, R a I?", answer_a="U = R*I",
+                         answer_b="U = R/I", answer_c="U = I/R", correct_answer=0) for table in ("t1", "t2")]
+        db.session.add_all(rows)
+        db.session.commit()
+        first_id, second_id = rows[0].id, rows[1].id
+    headers = auth_headers(app_module, uid, "admin")
+
+    try:
+        assert client.get(f"/api/monica/hint/{first_id}", headers=headers).get_json() == {
+            "hint": "Vzpomeňte si na Ohmův zákon.", "source": "ai"}
+        assert client.get(f"/api/monica/hint/{first_id}", headers=headers).get_json()["source"] == "stored"
+        assert client.get(f"/api/monica/hint/{second_id}", headers=headers).get_json()["source"] == "cache"
+        assert len(fake_completions.requests) == 1
+        with app_module.app.app_context():
+            assert app_module.db.session.get(Question, second_id).ai_hint == "Vzpomeňte si na Ohmův zákon."
+
+        fake_completions.failures.append(500)
+        assert client.get(f"/api/monica/explanation/{first_id}", headers=headers).status_code == 503
+        assert client.get(f"/api/monica/explanation/{first_id}", headers=headers).get_json()["source"] == "ai"
+        assert client.get("/api/monica/hint/999999", headers=headers).status_code == 404
+
+        usage = client.get("/api/admin/monica/usage", headers=headers).get_json()
+        hint = usage["features"]["hint"]
+        assert (hint["requests"], hint["cache_hits"], hint["hit_rate"]) == (2, 1, 0.5)
+        assert hint["tokens_saved"] == hint["tokens_used"] > 0
+        assert usage["features"]["explanation"]["requests"] == 1
+    finally:
+        service.client.close()
@@ -0,0 +1,98 @@
+"""
+Tests for the pooled AI client against a local fake completions server
+(latency and failures injected per test).
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ai_client import AIClient, AIClientSaturated, AIError
+
+
+@pytest.fixture
+def make_client(fake_completions):
+    clients = []
+
+    def make(**kwargs):
+        client = AIClient(fake_completions.url, "test-key", **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def _content(response):
+    return json.loads(response["choices"][0]["message"]["content"])
+
+
+def test_requests_reuse_pooled_connections(fake_completions, make_client):
+    client = make_client(timeout=5)
+    for _ in range(20):
+        assert _content(client.chat("Ahoj"))["score"] == 80
+    assert fake_completions.connections == 1
+    assert fake_completions.requests[0]["messages"] == [{"role": "user", "content": "Ahoj"}]
+    assert client.stats()["ok"] == 20
+
+
+def test_concurrency_is_capped(fake_completions, make_client):
+    fake_completions.delay = 0.1
+    client = make_client(timeout=5, max_concurrency=3, queue_timeout=5)
+    with ThreadPoolExecutor(12) as pool:
+        results = list(pool.map(lambda i: client.chat(f"q{i}"), range(12)))
+    assert len(results) == 12 and fake_completions.peak_in_flight == 3
+    assert client.stats()["peak_in_flight"] == 3 and fake_completions.connections <= 3
+
+
+def test_saturated_client_fails_fast(fake_completions, make_client):
+    fake_completions.delay = 0.5
+    client = make_client(timeout=5, max_concurrency=1, queue_timeout=0.05)
+    first = client.submit("slow")
+    time.sleep(0.1)
+    start = time.monotonic()
+    with pytest.raises(AIClientSaturated):
+        client.chat("queued")
+    assert time.monotonic() - start < 0.3
+    assert first.result(5)["choices"] and client.stats()["rejected"] == 1
+
+
+def test_deadline_bounds_a_slow_provider(fake_completions, make_client):
+    fake_completions.delay = 2.0
+    client = make_client(timeout=5)
+    start = time.monotonic()
+    with pytest.raises(AIError) as error:
+        client.chat("slow", timeout=0.3)
+    assert error.value.kind == "timeout" and time.monotonic() - start < 1.0
+    assert client.stats()["timeouts"] == 1 and client.stats()["in_flight"] == 0
+
+
+def test_http_errors_and_non_json_replies(fake_completions, make_client):
+    fake_completions.failures.extend([503, "garbage"])
+    client = make_client(timeout=5)
+    with pytest.raises(AIError) as error:
+        client.chat("x")
+    assert (error.value.kind, error.value.status_code) == ("http", 503)
+    with pytest.raises(AIError) as error:
+        client.chat("x")
+    assert error.value.kind == "response"
+    assert _content(client.chat("x"))["feedback"] == "Dobře"
+    assert client.stats()["errors"] == 2
+
+
+def test_monica_service_returns_completions_synchronously(app_module, fake_completions):
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url, timeout=2)
+    try:
+        response = service.evaluate_oral_answer("Co je Ohmův zákon?", "U = R * I", "napětí je odpor krát proud")
+        assert _content(response)["score"] == 80
+        prompt = fake_completions.requests[-1]["messages"][0]["content"]
+        assert "U = R * I" in prompt and fake_completions.requests[-1]["max_tokens"] == 500
+
+        fake_completions.failures.append(500)
+        assert service.generate_hint("Co je Ohmův zákon?")["error_kind"] == "http"
+        assert "error" in app_module.MonicaAIService("").chat("x")
+    finally:
+        service.client.close()
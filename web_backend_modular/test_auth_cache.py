@@ -0,0 +1,98 @@
+"""
+Tests for the verified-token and user context caches used by login_required.
+"""
+
+import time
+
+from auth_cache import TokenCache, TTLCache, UserContextCache
+from conftest import auth_headers
+
+
+def _register(client, username):
+    r = client.post("/api/auth/register", json={"username": username, "password": "pw123456"})
+    assert r.status_code == 201
+    return r.get_json()
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    cache.put("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+
+
+def test_token_cache_verifies_once_and_never_outlives_exp():
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return {"user_id": 1, "exp": time.time() + (0.01 if token == "short" else 3600)} if token != "bad" else None
+
+    tokens = TokenCache(verify, ttl=60)
+    assert tokens.payload("good") == tokens.payload("good")
+    assert tokens.payload("bad") is None and tokens.payload("bad") is None
+    tokens.payload("short")
+    time.sleep(0.02)
+    tokens.payload("short")
+    assert calls == ["good", "bad", "bad", "short", "short"]
+    assert "good" not in repr(tokens.cache._entries)  # keyed by hash only
+
+
+def test_user_context_load_racing_with_invalidate_is_not_cached():
+    contexts = UserContextCache(lambda user_id: contexts.invalidate(user_id) or {"id": user_id})
+    assert contexts.get(3) == {"id": 3}
+    assert len(contexts.cache) == 0
+
+
+def test_unknown_users_are_cached_as_missing():
+    loads = []
+    contexts = UserContextCache(lambda user_id: loads.append(user_id))
+    assert contexts.get(9) is None and contexts.get(9) is None
+    assert loads == [9]
+
+
+def test_authenticated_requests_reuse_token_and_user_context(app_module, client, count_queries, monkeypatch):
+    uid = _register(client, "ann")["user"]["id"]
+    headers = auth_headers(app_module, uid)
+    assert client.get("/api/auth/profile", headers=headers).get_json()["user"]["username"] == "ann"
+
+    verified = []
+    monkeypatch.setattr(app_module.token_cache, "verify", lambda token: verified.append(token))
+    count_queries.clear()
+    r = client.get("/api/auth/profile", headers=headers)
+    assert r.status_code == 200 and r.get_json()["user"]["battle_rating"] == 1500
+    assert verified == [] and count_queries == []
+
+
+def test_role_change_and_disable_invalidate_the_context(app_module, client):
+    uid = _register(client, "bob")["user"]["id"]
+    admin_token = auth_headers(app_module, uid, role="admin")
+    student = auth_headers(app_module, uid)
+    assert client.get("/api/admin/import/list", headers=admin_token).status_code == 403  # stored role wins
+
+    with app_module.app.app_context():
+        app_module.db.session.get(app_module.User, uid).role = "admin"
+        app_module.db.session.commit()
+    assert client.get("/api/auth/profile", headers=student).get_json()["user"]["role"] == "admin"
+
+    with app_module.app.app_context():
+        app_module.db.session.get(app_module.User, uid).is_active = False
+        app_module.db.session.commit()
+    r = client.get("/api/auth/profile", headers=student)
+    assert r.status_code == 403 and r.get_json()["error"] == "Account is disabled"
+
+
+def test_login_refreshes_github_user_context(app_module, client, monkeypatch, fake_github, github_store):
+    monkeypatch.setattr(app_module, "STORAGE_BACKEND", "github")
+    monkeypatch.setattr(app_module, "github_store", github_store)
+    uid = _register(client, "gh")["user"]["id"]
+    headers = auth_headers(app_module, uid)
+    assert client.get("/api/auth/profile", headers=headers).get_json()["user"]["last_login"] is None
+
+    assert client.post("/api/auth/login", json={"username": "gh", "password": "pw123456"}).status_code == 200
+    assert client.get("/api/auth/profile", headers=headers).get_json()["user"]["last_login"]
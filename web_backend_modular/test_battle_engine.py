@@ -0,0 +1,229 @@
+"""
+Tests for the asyncio battle rooms: scoring, timeouts, persistence and a
+full battle over a real WebSocket connection.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from battle_engine import (QUESTION_POINTS, SPEED_BONUS, BattleEngine, BattleQuestion, BattleRoom, Disconnected,
+                           rating_change, score_answer)
+from conftest import auth_headers
+
+QUESTIONS = [BattleQuestion(i, f"Q{i}", ["a", "b", "c"], i % 3) for i in range(3)]
+PLAYERS = {1: {"username": "ann", "rating": 1500}, 2: {"username": "bob", "rating": 1500}}
+
+
+class FakeConnection:
+    """In-memory peer: the test feeds `incoming` and reads `sent`."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.closed = False
+        self.got = asyncio.Event()
+
+    async def recv(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise Disconnected()
+        return message
+
+    async def send(self, message):
+        if self.closed:
+            raise Disconnected()
+        self.sent.append(message)
+        self.got.set()
+
+    async def close(self):
+        self.closed = True
+        self.incoming.put_nowait(None)
+
+    async def wait_for(self, kind, timeout=2.0):
+        async def scan():
+            while True:
+                for message in self.sent:
+                    if message["type"] == kind:
+                        return message
+                self.got.clear()
+                await self.got.wait()
+        return await asyncio.wait_for(scan(), timeout)
+
+
+def _engine(persisted, **kwargs):
+    tokens = {"t1": {"user_id": 1}, "t2": {"user_id": 2}}
+    options = dict(time_limit=0.5, join_timeout=0.5, hello_timeout=0.5, reveal_pause=0)
+    options.update(kwargs)
+    return BattleEngine(tokens.get, persisted.append, **options)
+
+
+def test_scoring_and_rating_change():
+    assert score_answer(False, 0.1, 10) == 0
+    assert score_answer(True, 0, 10) == QUESTION_POINTS + SPEED_BONUS
+    assert score_answer(True, 10, 10) == QUESTION_POINTS
+    assert rating_change(1500, 1500) == 16
+    assert rating_change(1000, 2000) == 31 and rating_change(2000, 1000) == 5
+
+
+def test_answers_outside_the_open_question_are_rejected():
+    room = BattleRoom("b", PLAYERS, QUESTIONS)
+    room.state, room.index, room.started_at = 'running', 2, 0.0
+    assert not room.answer(1, 2.0, 0, 1.0) and not room.answer(1, True, 0, 1.0)
+    assert not room.answer(1, 2, True, 1.0) and not room.answer(1, 2, "0", 1.0)
+    assert room.answer(1, 2, 0, 1.0) and not room.answer(1, 2, 1, 1.0)
+
+    room.index = -1  # reveal pause after the last question
+    assert not room.answer(2, -1, 0, 1.0) and room.answers[2][2] is None
+
+
+def test_battle_scores_on_the_server_and_persists_before_finishing():
+    persisted = []
+
+    async def run():
+        engine = _engine(persisted)
+        engine.bind()
+        assert engine.create_room("b1", dict(PLAYERS), QUESTIONS)
+        await asyncio.sleep(0)
+        ann, bob = FakeConnection(), FakeConnection()
+        handlers = [asyncio.create_task(engine.handle(conn)) for conn in (ann, bob)]
+        ann.incoming.put_nowait({"type": "hello", "token": "t1", "battle_id": "b1"})
+        bob.incoming.put_nowait({"type": "hello", "token": "t2", "battle_id": "b1"})
+        for index, question in enumerate(QUESTIONS):
+            await ann.wait_for("question")
+            await bob.wait_for("question")
+            ann.incoming.put_nowait({"type": "answer", "index": index, "answer": question.correct_answer})
+            ann.incoming.put_nowait({"type": "answer", "index": index, "answer": 99})  # second answer ignored
+            if index == 0:
+                bob.incoming.put_nowait({"type": "answer", "index": index, "answer": question.correct_answer + 1})
+            await ann.wait_for("reveal")
+            await bob.wait_for("reveal")
+            ann.sent.clear(), bob.sent.clear()
+        finished = await ann.wait_for("finished")
+        await asyncio.gather(*handlers)
+        return engine, finished, bob
+
+    engine, finished, bob = asyncio.run(run())
+    ann_row, bob_row = finished["results"]
+    assert ann_row["questions_correct"] == 3 and ann_row["is_winner"] and ann_row["rating_change"] == 16
+    assert bob_row["score"] == 0 and bob_row["rating_change"] == -16
+    assert persisted[0]["players"] == finished["results"] and persisted[0]["total_questions"] == 3
+    assert engine.stats() == {"rooms": 0, "created": 1, "finished": 1, "aborted": 0, "persist_failures": 0,
+                              "rejected": 0}
+    assert bob.closed
+
+
+def test_bad_hello_and_missing_opponent():
+    persisted = []
+
+    async def run():
+        engine = _engine(persisted)
+        engine.bind()
+        engine.create_room("b1", dict(PLAYERS), QUESTIONS)
+        await asyncio.sleep(0)
+        intruder, ann = FakeConnection(), FakeConnection()
+        intruder.incoming.put_nowait({"type": "hello", "token": "forged", "battle_id": "b1"})
+        await engine.handle(intruder)
+        handler = asyncio.create_task(engine.handle(ann))
+        ann.incoming.put_nowait({"type": "hello", "token": "t1", "battle_id": "b1"})
+        aborted = await ann.wait_for("aborted")
+        await handler
+        return engine, intruder, aborted
+
+    engine, intruder, aborted = asyncio.run(run())
+    assert intruder.sent == [{"type": "error", "error": "Invalid token"}] and intruder.closed
+    assert aborted["reason"] == "opponent_missing"
+    assert persisted == [] and engine.stats()["aborted"] == 1 and engine.stats()["rooms"] == 0
+
+
+def test_room_capacity_and_failed_persist():
+    def fail(result):
+        raise RuntimeError("database down")
+
+    async def run():
+        engine = BattleEngine(lambda token: {"user_id": int(token)}, fail, max_rooms=1, time_limit=0.05,
+                              reveal_pause=0)
+        engine.bind()
+        assert engine.create_room("b1", dict(PLAYERS), QUESTIONS[:1])
+        assert not engine.create_room("b2", dict(PLAYERS), QUESTIONS[:1])
+        await asyncio.sleep(0)
+        ann, bob = FakeConnection(), FakeConnection()
+        handlers = [asyncio.create_task(engine.handle(conn)) for conn in (ann, bob)]
+        ann.incoming.put_nowait({"type": "hello", "token": "1", "battle_id": "b1"})
+        bob.incoming.put_nowait({"type": "hello", "token": "2", "battle_id": "b1"})
+        aborted = await ann.wait_for("aborted")  # nobody answers: the question times out
+        await asyncio.gather(*handlers)
+        return engine, aborted
+
+    engine, aborted = asyncio.run(run())
+    assert aborted["reason"] == "result_not_saved"
+    assert engine.stats()["persist_failures"] == 1 and engine.stats()["rejected"] == 1
+
+
+def test_battle_over_websocket_updates_ratings(app_module, client):
+    connect = pytest.importorskip("websockets.sync.client").connect
+    ids = []
+    for name in ("ann", "bob"):
+        r = client.post("/api/auth/register", json={"username": name, "password": "pw123456"})
+        ids.append(r.get_json()["user"]["id"])
+    engine = BattleEngine(app_module.token_cache.payload, app_module.persist_battle_result, time_limit=2,
+                          reveal_pause=0)
+    engine.start_in_thread("127.0.0.1", 0)
+    try:
+        players = {uid: {"id": uid, "rating": 1500} for uid in ids}
+        assert engine.create_room("ranked_ws", players, QUESTIONS[:2])
+        url = f"ws://127.0.0.1:{engine.port}"
+        with connect(url) as ann, connect(url) as bob:
+            for ws, uid in ((ann, ids[0]), (bob, ids[1])):
+                token = auth_headers(app_module, uid)["Authorization"].split()[1]
+                ws.send(json.dumps({"type": "hello", "token": token, "battle_id": "ranked_ws"}))
+            for ws in (ann, bob):
+                assert json.loads(ws.recv(timeout=5))["type"] == "joined"
+            for index, question in enumerate(QUESTIONS[:2]):
+                for ws, answer in ((ann, question.correct_answer), (bob, question.correct_answer + 1)):
+                    assert json.loads(ws.recv(timeout=5))["type"] == "question"
+                    ws.send(json.dumps({"type": "answer", "index": index, "answer": answer}))
+                for ws in (ann, bob):
+                    kinds = [json.loads(ws.recv(timeout=5))["type"]]
+                    if kinds[0] == "answer_ack":
+                        kinds.append(json.loads(ws.recv(timeout=5))["type"])
+                    assert kinds[-1] == "reveal"
+            finished = json.loads(ann.recv(timeout=5))
+        assert finished["type"] == "finished" and finished["results"][0]["is_winner"]
+    finally:
+        engine.stop()
+
+    with app_module.app.app_context():
+        rows = app_module.BattleResult.query.filter_by(battle_id="ranked_ws").all()
+        assert sorted((r.user_id, r.rating_change) for r in rows) == [(ids[0], 16), (ids[1], -16)]
+        winner, loser = (app_module.db.session.get(app_module.User, uid) for uid in ids)
+        assert (winner.battle_rating, winner.battle_wins) == (1516, 1)
+        assert (loser.battle_rating, loser.battle_losses) == (1484, 1)
+
+
+def test_persisted_result_counts_for_players_with_null_ratings(app_module, client):
+    ids = []
+    for name in ("nell", "nick"):
+        r = client.post("/api/auth/register", json={"username": name, "password": "pw123456"})
+        ids.append(r.get_json()["user"]["id"])
+    with app_module.app.app_context():
+        for uid in ids:
+            user = app_module.db.session.get(app_module.User, uid)
+            user.battle_rating = user.battle_wins = user.battle_losses = None
+        app_module.db.session.commit()
+
+    app_module.persist_battle_result({
+        "battle_id": "null_ratings", "mode": "ranked", "total_questions": 1,
+        "players": [
+            {"user_id": ids[0], "opponent_id": ids[1], "score": 100, "questions_correct": 1,
+             "is_winner": True, "rating_change": 16},
+            {"user_id": ids[1], "opponent_id": ids[0], "score": 0, "questions_correct": 0,
+             "is_winner": False, "rating_change": -16},
+        ],
+    })
+
+    with app_module.app.app_context():
+        winner, loser = (app_module.db.session.get(app_module.User, uid) for uid in ids)
+        assert (winner.battle_rating, winner.battle_wins, winner.battle_losses) == (1516, 1, None)
+        assert (loser.battle_rating, loser.battle_wins, loser.battle_losses) == (1484, None, 1)
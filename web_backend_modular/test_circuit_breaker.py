@@ -0,0 +1,126 @@
+"""
+Tests for the Monica circuit breaker and the hedged /api/monica/evaluate
+fallback (fake clock for the breaker, fake completions server for the app).
+"""
+
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from conftest import auth_headers
+
+ANSWER = {"question": "Co je Ohmův zákon?", "correctAnswer": "U = R * I",
+          "userAnswer": "Napětí je odpor krát proud."}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_errors_open_the_breaker_and_probes_close_it():
+    clock = Clock()
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, open_seconds=30, probes=2, clock=clock)
+    for ok in (True, False, True):
+        assert breaker.allow()
+        breaker.record(ok, 0.1)
+    assert breaker.state == CLOSED  # too few calls to judge
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now += 31
+    assert breaker.allow() and breaker.allow() and not breaker.allow()  # two probes, no more
+    assert breaker.state == HALF_OPEN
+    breaker.record(True, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.allow() and breaker.allow()
+    breaker.cancel()  # a probe that never reached the provider gives its slot back
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED and breaker.stats()["times_opened"] == 2
+
+
+def test_slow_p95_opens_the_breaker_and_old_calls_age_out():
+    clock = Clock()
+    breaker = CircuitBreaker(slow_call_seconds=2.0, min_calls=10, window=60, clock=clock)
+    for _ in range(9):
+        breaker.record(False, 5.0)
+        clock.now += 10
+    assert breaker.state == CLOSED and breaker.stats()["calls"] == 6
+    clock.now += 60  # calls older than the window no longer count
+    for _ in range(9):
+        breaker.record(True, 0.2)
+    stats = breaker.stats()
+    assert (breaker.state, stats["calls"], stats["latency_p95"]) == (CLOSED, 9, 0.2)
+    breaker.record(True, 5.0)
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_stops_calling_the_provider(app_module, fake_completions):
+    breaker = CircuitBreaker(min_calls=3, open_seconds=60)
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url, breaker=breaker)
+    try:
+        fake_completions.failures.extend([500, 502, 503])
+        assert [service.chat("x")["error_kind"] for _ in range(3)] == ["http"] * 3
+        start = time.monotonic()
+        assert service.chat("x")["error_kind"] == "circuit_open"
+        assert time.monotonic() - start < 0.05 and len(fake_completions.requests) == 3
+    finally:
+        service.client.close()
+
+
+@pytest.fixture
+def evaluate_service(app_module, fake_completions, monkeypatch):
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url,
+                                         breaker=CircuitBreaker(min_calls=3, open_seconds=60))
+    monkeypatch.setattr(app_module, "monica_ai", service)
+    monkeypatch.setattr(app_module, "MONICA_ENABLED", True)
+    yield service
+    service.client.close()
+
+
+def test_evaluate_falls_back_locally_without_waiting(app_module, client, fake_completions, evaluate_service):
+    r = client.post("/api/auth/register", json={"username": "ann", "password": "pw123456"})
+    headers = auth_headers(app_module, r.get_json()["user"]["id"], "student")
+    assert client.post("/api/monica/evaluate", json=ANSWER, headers=headers).get_json()["method"] == "ai-monica"
+    with app_module.app.app_context():
+        assert app_module.MonicaUsage.query.filter_by(feature="answer_evaluation").count() == 1
+
+    fake_completions.failures.extend([500, 500])
+    for _ in range(2):
+        assert client.post("/api/monica/evaluate", json=ANSWER).get_json()["method"] == "local-evaluation"
+    assert evaluate_service.breaker.state == OPEN
+    fake_completions.delay = 2.0
+    start = time.monotonic()
+    assert client.post("/api/monica/evaluate", json=ANSWER).get_json()["method"] == "local-evaluation"
+    assert time.monotonic() - start < 0.5 and len(fake_completions.requests) == 3
+
+
+def test_hedge_answers_locally_and_upgrades_in_the_background(app_module, client, fake_completions,
+                                                              evaluate_service, monkeypatch):
+    monkeypatch.setattr(app_module, "MONICA_HEDGE_BUDGET", 0.5)
+    assert client.post("/api/monica/evaluate", json=ANSWER).get_json()["method"] == "ai-monica"  # within budget
+
+    fake_completions.delay = 1.0
+    start = time.monotonic()
+    hedged = client.post("/api/monica/evaluate", json={**ANSWER, "userAnswer": "Proud krát odpor."}).get_json()
+    assert time.monotonic() - start < 0.9
+    assert hedged["method"] == "local-evaluation" and hedged["upgradePending"]
+    url = f"/api/monica/evaluate/{hedged['evaluationId']}"
+    assert client.get(url).get_json()["status"] == "pending"
+
+    deadline = time.monotonic() + 5
+    while client.get(url).get_json()["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    entry = client.get(url).get_json()
+    assert entry["status"] == "upgraded" and entry["result"]["method"] == "ai-monica"
+    assert entry["result"]["evaluationId"] == hedged["evaluationId"]
+    assert client.get("/api/monica/evaluate/unknown").status_code == 404
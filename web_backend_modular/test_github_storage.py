@@ -0,0 +1,232 @@
+"""
+Unit tests for GitHubStorage against the local GitHub API stand-in (see conftest.py).
+"""
+
+import time
+
+import pytest
+
+from github_storage import GitHubConflictError, GitHubStorage
+
+
+def test_read_json_serves_fresh_cache_and_revalidates_with_etag(fake_github, github_store):
+    fake_github.put_file("data/questions.json", {"questions": [{"id": 1}]})
+
+    assert github_store.read_json("questions.json") == {"questions": [{"id": 1}]}
+    assert github_store.read_json("questions.json") == {"questions": [{"id": 1}]}
+    assert fake_github.count("GET", "/contents/") == 1
+
+    github_store.cache_ttl = 0
+    shared = github_store.read_json("questions.json", shared=True)
+    assert github_store.read_json("questions.json", shared=True) is shared
+    assert fake_github.count("GET", "/contents/") == 3  # two conditional GETs answered with 304
+
+
+def test_read_json_returns_private_copies_by_default(fake_github, github_store):
+    fake_github.put_file("data/users/_index.json", {"usernames": {}})
+    idx = github_store.read_json("users/_index.json")
+    idx["usernames"]["mallory"] = 9
+    assert github_store.read_json("users/_index.json") == {"usernames": {}}
+
+
+def test_commit_batch_writes_all_files_in_one_commit(fake_github, github_store):
+    commits_before = fake_github.commit_count()
+    github_store.commit_batch({"users/1.json": {"id": 1}, "users/_index.json": {"next_id": 2}}, "Register user")
+
+    assert fake_github.commit_count() == commits_before + 1
+    assert fake_github.read_file("data/users/1.json") == {"id": 1}
+    assert fake_github.read_file("data/users/_index.json") == {"next_id": 2}
+    # Cache is primed with the written content and its git blob sha
+    github_store.cache_ttl = 0
+    assert github_store.read_json("users/1.json") == {"id": 1}
+    assert fake_github.count("GET", "/contents/data/users/1.json") == 1
+
+
+def test_commit_batch_rebuilds_on_moved_branch(fake_github, github_store):
+    fake_github.before_ref_update = lambda fake: fake.inject_commit("data/other.json", {"x": 1})
+    github_store.commit_batch({"a.json": {"a": 1}}, "Write a")
+
+    assert fake_github.read_file("data/a.json") == {"a": 1}
+    assert fake_github.read_file("data/other.json") == {"x": 1}
+    assert fake_github.count("PATCH", "/git/refs/") == 2
+
+
+def test_commit_batch_rejects_stale_expected_sha(fake_github, github_store):
+    fake_github.put_file("data/users/_index.json", {"next_id": 1, "usernames": {}})
+    github_store.read_json("users/_index.json")
+    stale_sha = github_store.cached_sha("users/_index.json")
+    fake_github.put_file("data/users/_index.json", {"next_id": 2, "usernames": {"eve": 1}})
+
+    with pytest.raises(GitHubConflictError):
+        github_store.commit_batch({"users/_index.json": {"next_id": 9}}, "Stale write",
+                                  expected_shas={"users/_index.json": stale_sha})
+
+
+def test_create_user_allocates_ids_and_refuses_duplicates(fake_github, github_store):
+    first = github_store.create_user("anna", lambda uid: {"id": uid, "username": "anna"}, "Register user")
+    second = github_store.create_user("bert", lambda uid: {"id": uid, "username": "bert"}, "Register user")
+
+    assert (first["id"], second["id"]) == (1, 2)
+    assert github_store.create_user("anna", lambda uid: {"id": uid}, "Register user") is None
+    assert fake_github.read_file("data/users/_index.json") == {"next_id": 3, "usernames": {"anna": 1, "bert": 2}}
+    assert fake_github.commit_count() == 2
+
+
+def test_write_behind_flushes_all_users_in_one_commit(fake_github, github_store, tmp_path):
+    buffer = github_store.enable_write_behind(str(tmp_path), max_pending=3, max_age=3600)
+    github_store.append_progress(1, {"question_id": 10, "timestamp": "t1", "is_correct": True})
+    github_store.append_progress(2, {"question_id": 11, "timestamp": "t2", "is_correct": False})
+    assert fake_github.commit_count() == 0
+    assert len(github_store.read_progress(1)["entries"]) == 1  # pending entries are visible
+
+    github_store.append_progress(1, {"question_id": 12, "timestamp": "t3", "is_correct": True})
+    deadline = time.monotonic() + 5  # the background thread commits, not the appending request
+    while fake_github.commit_count() == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_github.commit_count() == 1
+    assert [e["question_id"] for e in fake_github.read_file("data/quiz_progress/1/000001.json")["entries"]] == [10, 12]
+    assert [e["question_id"] for e in fake_github.read_file("data/quiz_progress/2/000001.json")["entries"]] == [11]
+    buffer.close()
+
+
+def _legacy_questions():
+    return {
+        "quiz_tables": [{"id": 1, "name": "alpha", "display_name": "Alpha", "question_count": 99}],
+        "questions": [
+            {"id": 1, "table_name": "alpha", "question": "A1", "correct_answer": "B"},
+            {"id": 2, "table_name": "beta", "question": "B1", "correct_answer": 2},
+            {"id": 3, "table_name": "alpha", "question": "A2", "correct_answer": 0},
+        ],
+        "next_question_id": 4,
+    }
+
+
+def test_migration_splits_legacy_questions_into_shards(fake_github, github_store):
+    fake_github.put_file("data/questions.json", _legacy_questions())
+
+    assert github_store.migrate_questions_to_shards() is True
+    assert github_store.migrate_questions_to_shards() is False
+
+    manifest = fake_github.read_file("data/questions/_manifest.json")
+    alpha, beta = manifest["quiz_tables"]
+    assert (alpha["question_count"], alpha["id_min"], alpha["id_max"]) == (2, 1, 3)
+    assert (beta["name"], beta["question_count"], beta["shard"]) == ("beta", 1, "questions/table_2.json")
+    assert manifest["next_question_id"] == 4
+    assert [q["id"] for q in fake_github.read_file("data/questions/table_1.json")["questions"]] == [1, 3]
+    assert fake_github.read_file("data/questions.json") is not None  # legacy file kept
+
+
+def test_lookups_fetch_only_the_needed_shard(fake_github, github_store):
+    fake_github.put_file("data/questions.json", _legacy_questions())
+    github_store.migrate_questions_to_shards()
+    github_store.invalidate()
+    github_store.cache_ttl = 0
+
+    assert [t["question_count"] for t in github_store.question_tables()] == [2, 1]
+    q, bank = github_store.find_question(2)
+    assert q["question"] == "B1" and bank.correct_answer(q) == 2
+    assert fake_github.count("GET", "/contents/data/questions/table_1.json") == 0
+
+    # A second lookup only revalidates the manifest; its shard sha vouches for the in-memory bank
+    github_store.find_question(2)
+    assert fake_github.count("GET", "/contents/data/questions/table_2.json") == 1
+    assert [p["id"] for p in github_store.table_question_bank("alpha").table_payloads("alpha")] == [1, 3]
+
+
+def test_shard_commit_rejects_a_shard_changed_by_another_writer(fake_github, github_store):
+    fake_github.put_file("data/questions.json", _legacy_questions())
+    github_store.migrate_questions_to_shards()
+    manifest = github_store.read_question_manifest(shared=False, max_age=0)
+    manifest_sha = github_store.cached_sha("questions/_manifest.json")
+    shard = github_store.read_json("questions/table_1.json", max_age=0)
+    shard_sha = github_store.cached_sha("questions/table_1.json")
+    # Another writer adds a question to the shard without touching the manifest
+    fake_github.put_file("data/questions/table_1.json",
+                         {**shard, "questions": shard["questions"] + [{"id": 9, "question": "A3"}]})
+
+    with pytest.raises(GitHubConflictError):
+        github_store.commit_question_shards(manifest, {1: shard["questions"] + [{"id": 4, "question": "A4"}]},
+                                            "Import", manifest_sha, shard_shas={1: shard_sha})
+    assert [q["id"] for q in fake_github.read_file("data/questions/table_1.json")["questions"]] == [1, 3, 9]
+
+
+def test_shard_banks_are_bounded(fake_github, github_store):
+    fake_github.put_file("data/questions.json", _legacy_questions())
+    github_store.migrate_questions_to_shards()
+    github_store.cache_max_entries = 1
+
+    github_store.table_question_bank("alpha")
+    github_store.table_question_bank("beta")
+    assert list(github_store._shard_banks) == ["questions/table_2.json"]
+
+
+def test_write_json_uses_known_sha_without_extra_get(fake_github, github_store):
+    fake_github.put_file("data/users/1.json", {"id": 1, "role": "student"})
+    user = github_store.read_json_versioned("users/1.json")
+    gets_before = fake_github.count("GET")
+
+    github_store.write_json("users/1.json", {**user.data, "avatar": "x"}, "Save user 1", sha=user.sha)
+    github_store.write_json("users/1.json", {**user.data, "avatar": "y"}, "Save user 1")  # cached sha
+    assert fake_github.count("GET") == gets_before
+    assert fake_github.read_file("data/users/1.json")["avatar"] == "y"
+
+
+def test_write_json_merges_on_conflict(fake_github, github_store):
+    fake_github.put_file("data/users/1.json", {"id": 1, "role": "student"})
+    user = github_store.read_json_versioned("users/1.json")
+    fake_github.put_file("data/users/1.json", {"id": 1, "role": "admin"})
+
+    github_store.write_json("users/1.json", {**user.data, "last_login": "now"}, "Save user 1", sha=user.sha,
+                            merge=lambda remote, ours: {**remote, "last_login": ours["last_login"]})
+    assert fake_github.read_file("data/users/1.json") == {"id": 1, "role": "admin", "last_login": "now"}
+
+
+def test_progress_appends_roll_segments_and_keep_summary(fake_github, github_store):
+    github_store.progress_segment_size = 2
+    for i in range(5):
+        github_store.append_progress(7, {"question_id": 100 + i % 3, "timestamp": f"t{i}", "is_correct": i != 1})
+
+    summary = fake_github.read_file("data/quiz_progress/7/_summary.json")
+    assert (summary["segments"], summary["tail_count"], summary["total"], summary["correct"]) == (3, 1, 5, 4)
+    assert (summary["answered"], summary["wrong"]) == ([100, 101, 102], [101])
+    assert len(fake_github.read_file("data/quiz_progress/7/000002.json")["entries"]) == 2
+    # The last append only rewrote the tail segment and the summary
+    assert fake_github.read_file("data/quiz_progress/7/000003.json")["entries"][0]["timestamp"] == "t4"
+    assert [e["timestamp"] for e in github_store.read_progress(7)["entries"]] == ["t0", "t1", "t2", "t3", "t4"]
+
+
+def test_progress_revision_comes_from_stored_state_not_the_worker(fake_github, tmp_path):
+    def worker(name):
+        store = GitHubStorage("test-token", "owner", "repo", base_dir="data", api_url=fake_github.url)
+        store.enable_write_behind(str(tmp_path / name), max_pending=100, max_age=3600)
+        return store
+
+    a, b = worker("a"), worker("b")
+    a.append_progress(7, {"question_id": 1, "timestamp": "t0", "is_correct": True})
+    a.progress_buffer.flush()
+    assert a.progress_index(7).revision == b.progress_index(7).revision  # same summary sha
+
+    # Different unflushed answers on top of the same summary never share a revision
+    a.append_progress(7, {"question_id": 2, "timestamp": "t1", "is_correct": True})
+    b.append_progress(7, {"question_id": 3, "timestamp": "t1", "is_correct": False})
+    assert a.progress_index(7).revision != b.progress_index(7).revision
+    # ...and a rebuilt index agrees with one kept current by appends
+    revision = a.progress_index(7).revision
+    a._progress_indexes.clear()
+    assert a.progress_index(7).revision == revision
+    for store in (a, b):
+        store.progress_buffer.close()
+
+
+def test_legacy_progress_file_is_converted_on_first_append(fake_github, github_store):
+    fake_github.put_file("data/quiz_progress/3.json", {"entries": [
+        {"question_id": 1, "timestamp": "a", "is_correct": False},
+        {"question_id": 2, "timestamp": "b", "is_correct": True},
+    ]})
+    assert github_store.read_progress_summary(3)["wrong"] == [1]
+
+    github_store.append_progress(3, {"question_id": 2, "timestamp": "c", "is_correct": False})
+    summary = fake_github.read_file("data/quiz_progress/3/_summary.json")
+    assert (summary["total"], summary["answered"], summary["wrong"]) == (3, [1, 2], [1, 2])
+    assert fake_github.read_file("data/quiz_progress/3.json") is None
+    assert [e["timestamp"] for e in github_store.read_progress(3)["entries"]] == ["a", "b", "c"]
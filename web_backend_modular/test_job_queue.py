@@ -0,0 +1,147 @@
+"""
+Tests for the SQL job queue and the oral exam evaluation pipeline
+(submit -> keyword score -> AI upgrade by the workers -> polling / SSE).
+"""
+
+import json
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+from conftest import auth_headers
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorkers
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sqlite_queue(tmp_path):
+    return JobQueue(create_engine(f"sqlite:///{tmp_path / 'jobs.db'}"), lease=30, max_attempts=2, retry_delay=5,
+                    clock=Clock())
+
+
+def test_each_job_is_claimed_once_by_concurrent_workers(sqlite_queue):
+    ids = [sqlite_queue.enqueue("k", {"n": n}) for n in range(200)]
+    claimed, lock = [], threading.Lock()
+
+    def drain():
+        while True:
+            jobs = sqlite_queue.claim(limit=5)
+            if not jobs:
+                return
+            with lock:
+                claimed.extend(job["id"] for job in jobs)
+
+    threads = [threading.Thread(target=drain) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == ids
+    assert sqlite_queue.counts() == {QUEUED: 0, RUNNING: 200, DONE: 0, FAILED: 0}
+
+
+def test_retries_leases_and_pruning(sqlite_queue):
+    clock = sqlite_queue.clock
+    job_id = sqlite_queue.enqueue("k", {"n": 1})
+    assert sqlite_queue.claim()[0]["attempts"] == 1
+    sqlite_queue.fail(job_id, "provider down")
+    assert sqlite_queue.claim() == []  # waits retry_delay
+    clock.now += 5
+    assert sqlite_queue.claim()[0]["attempts"] == 2
+    assert sqlite_queue.claim() == []  # leased
+    clock.now += 30  # the worker died: the lease ran out
+    assert sqlite_queue.claim()[0]["attempts"] == 3
+    sqlite_queue.fail(job_id, "provider down")
+    assert sqlite_queue.get(job_id)["status"] == FAILED
+    assert sqlite_queue.get(job_id)["result"] == {"error": "provider down"}
+
+    done_id = sqlite_queue.enqueue("k", {"n": 2})
+    sqlite_queue.claim()
+    sqlite_queue.complete(done_id, {"status": "upgraded"})
+    clock.now += 100
+    assert sqlite_queue.prune(older_than=50) == 2 and sqlite_queue.get(done_id) is None
+
+
+@pytest.fixture
+def oral_exam(app_module, client, fake_completions, monkeypatch):
+    """Monica pointed at the fake server, a fresh queue on the app database and one question."""
+    service = app_module.MonicaAIService("test-key", base_url=fake_completions.url)
+    queue = JobQueue(app_module._app_engine, retry_delay=0)
+    queue.clear()
+    workers = JobWorkers(queue, {"oral_exam": app_module.run_oral_exam_job}, workers=4, poll_interval=0.05)
+    monkeypatch.setattr(app_module, "monica_ai", service)
+    monkeypatch.setattr(app_module, "MONICA_ENABLED", True)
+    monkeypatch.setattr(app_module, "job_queue", queue)
+    monkeypatch.setattr(app_module, "job_workers", workers)
+    monkeypatch.setattr(app_module, "ORAL_EXAM_WORKERS", 0)  # started by the tests, not by the first request
+    r = client.post("/api/auth/register", json={"username": "ann", "password": "pw123456"})
+    uid = r.get_json()["user"]["id"]
+    with app_module.app.app_context():
+        question = app_module.Question(table_name="t1", question_text="Co říká Ohmův zákon?",
+                                       answer_a="napětí je odpor krát proud", answer_b="b", answer_c="c",
+                                       correct_answer=0)
+        app_module.db.session.add(question)
+        app_module.db.session.commit()
+        question_id = question.id
+    yield {"headers": auth_headers(app_module, uid, "student"), "question_id": question_id, "uid": uid,
+           "queue": queue, "workers": workers}
+    workers.stop()
+    service.client.close()
+
+
+def _submit(client, oral_exam, transcript="Napětí je odpor krát proud."):
+    return client.post("/api/oral-exam/submit-audio", headers=oral_exam["headers"],
+                       json={"question_id": oral_exam["question_id"], "transcript": transcript}).get_json()
+
+
+def test_submit_returns_the_keyword_score_and_workers_upgrade_it(app_module, client, fake_completions, oral_exam):
+    submitted = _submit(client, oral_exam)
+    assert submitted["status"] == "pending" and submitted["evaluation"]["method"] == "keywords"
+    assert submitted["evaluation"]["score"] == 100 and fake_completions.requests == []
+    url = f"/api/oral-exam/result/{submitted['job_id']}"
+    assert client.get(url, headers=oral_exam["headers"]).get_json()["status"] == "pending"
+    other = auth_headers(app_module, oral_exam["uid"] + 1, "student")
+    assert client.get(url, headers=other).status_code in (401, 404)  # someone else's job
+
+    oral_exam["workers"].start()
+    deadline = time.monotonic() + 5
+    while client.get(url, headers=oral_exam["headers"]).get_json()["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    result = client.get(url, headers=oral_exam["headers"]).get_json()
+    assert result["status"] == "upgraded" and result["evaluation"]["method"] == "ai-monica"
+    with app_module.app.app_context():
+        exam = app_module.db.session.get(app_module.OralExam, submitted["oral_exam_id"])
+        assert (exam.score, exam.feedback, exam.grammar_score) == (80, "Dobře", 85)
+        assert app_module.MonicaUsage.query.filter_by(feature="oral_exam").count() == 1
+
+    fake_completions.reply = lambda body: "Bez JSON"
+    submitted = _submit(client, oral_exam)
+    with client.get(f"/api/oral-exam/result/{submitted['job_id']}/events", headers=oral_exam["headers"]) as r:
+        events = [json.loads(line[len("data: "):]) for line in r.get_data(as_text=True).splitlines()
+                  if line.startswith("data: ")]
+    assert r.mimetype == "text/event-stream"
+    assert events[-1]["status"] == "local" and events[-1]["evaluation"]["method"] == "keywords"
+
+
+def test_hundreds_of_submissions_per_second(app_module, client, fake_completions, oral_exam):
+    count = 300
+    start = time.monotonic()
+    job_ids = [_submit(client, oral_exam, f"Napětí je odpor krát proud ({n})")["job_id"] for n in range(count)]
+    rate = count / (time.monotonic() - start)
+    assert len(set(job_ids)) == count and rate > 100, f"{rate:.0f} submissions/s"
+
+    oral_exam["workers"].start()
+    deadline = time.monotonic() + 30
+    while oral_exam["queue"].counts()[DONE] < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert oral_exam["queue"].counts() == {QUEUED: 0, RUNNING: 0, DONE: count, FAILED: 0}
+    assert len(fake_completions.requests) == count and oral_exam["workers"].stats()["errors"] == 0
@@ -0,0 +1,173 @@
+"""
+Tests for the materialized battle leaderboards and /api/battle/leaderboard.
+"""
+
+import random
+import threading
+from datetime import datetime, timedelta
+
+from conftest import auth_headers
+from leaderboard import Leaderboard, RankedBoard
+
+DAY = 86400.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100 * DAY
+
+    def __call__(self):
+        return self.now
+
+
+def _player(uid, rating, wins=0, losses=0):
+    return {'id': uid, 'username': f"p{uid}", 'avatar': '👤', 'rating': rating, 'wins': wins, 'losses': losses}
+
+
+def test_ranked_board_moves_and_ranks():
+    board = RankedBoard()
+    board.load({1: (-1600,), 2: (-1500,), 3: (-1700,)})
+    assert [board.rank(uid) for uid in (3, 1, 2)] == [1, 2, 3]
+    board.set(2, (-1800,))
+    board.set(4, (-1600,))  # tie with player 1: lower id first
+    board.set(3, None)
+    assert board.top(10) == [2, 1, 4] and board.rank(4) == 3 and board.rank(3) is None
+    assert board.top(1, offset=2) == [4] and len(board) == 3
+
+
+def test_ranked_board_blocks_match_a_sorted_list():
+    rng = random.Random(7)
+    board, keys = RankedBoard(block_size=2), {}
+    board.load({uid: (rng.randint(0, 20),) for uid in range(10)})
+    keys.update(board._keys)
+    for _ in range(2000):  # splits, emptied blocks and ties all happen at this block size
+        uid = rng.randint(0, 40)
+        key = None if rng.random() < 0.3 else (rng.randint(0, 20),)
+        board.set(uid, key)
+        if key is None:
+            keys.pop(uid, None)
+        else:
+            keys[uid] = key
+        expected = [uid for _, uid in sorted((k, u) for u, k in keys.items())]
+        probe = rng.randint(0, 40)
+        assert board.rank(probe) == (expected.index(probe) + 1 if probe in keys else None)
+        offset = rng.randint(0, len(expected))
+        assert board.top(5, offset) == expected[offset:offset + 5]
+    assert board.top(len(keys) + 1) == expected and len(board) == len(keys)
+
+
+def test_exact_rank_outside_the_first_page():
+    board = Leaderboard(clock=Clock())
+    board.load([_player(uid, 1000 + uid) for uid in range(1, 501)], [])
+    page = board.page('all', limit=10, user_id=42)
+    assert [row['rating'] for row in page['rows']][:2] == [1500, 1499]
+    assert page['current_user_rank'] == 459 and page['total_players'] == 500  # rating 1000 is not above the floor
+    board.record(42, True, False, 600)
+    assert board.rank(42) == 1 and board.page('all', limit=1)['rows'][0]['wins'] == 1
+
+
+def test_period_boards_roll_with_time():
+    clock = Clock()
+    board = Leaderboard(clock=clock)
+    now = clock.now
+    results = [
+        (now - 2 * DAY, 1, True, 16), (now - 2 * DAY, 2, False, -16),
+        (now - 20 * DAY, 2, True, 20), (now - 20 * DAY, 1, False, -20),
+        (now - 21 * DAY, 2, True, 18), (now - 21 * DAY, 3, False, -18),
+        (now - 40 * DAY, 3, True, 30),  # older than a month
+    ]
+    board.load([_player(1, 1500), _player(2, 1520), _player(3, 1480)], results)
+    week = board.page('week')
+    assert [(r['user_id'], r['wins'], r['losses'], r['rating_change']) for r in week['rows']] == [
+        (1, 1, 0, 16), (2, 0, 1, -16)]
+    assert [r['user_id'] for r in board.page('month')['rows']] == [2, 1, 3]
+    assert board.rank(3, 'week') is None
+
+    clock.now += 6 * DAY  # the week-old battle drops out, a new one comes in
+    board.record(3, True, False, 12)
+    assert [r['user_id'] for r in board.page('week')['rows']] == [3]
+    assert board.stats() == {'players': 3, 'week': 1, 'month': 3}
+    board.record(1, True, False, 0, update_player=False)  # unranked: period boards only
+    assert board.players[1]['wins'] == 0 and board.page('week')['rows'][1]['user_id'] == 1
+
+
+def test_draws_are_not_losses_on_any_board():
+    clock = Clock()
+    board = Leaderboard(clock=clock)
+    now = clock.now
+    board.load([_player(1, 1500, wins=1, losses=0)], [(now - DAY, 1, True, 16), (now - DAY, 1, False, 0)])
+    board.record(1, False, False, 0)  # another draw
+    board.record(1, False, True, -16)
+
+    lifetime, week = board.page('all')['rows'][0], board.page('week')['rows'][0]
+    assert (lifetime['wins'], lifetime['losses'], lifetime['win_rate']) == (1, 1, 50.0)
+    assert (week['wins'], week['losses'], week['win_rate']) == (1, 1, 50.0)
+
+
+def test_null_rating_and_counts_load_as_a_new_player():
+    board = Leaderboard(clock=Clock())
+    board.load([{'id': 1, 'username': 'old', 'avatar': None, 'rating': None, 'wins': None, 'losses': None},
+                _player(2, 1400)], [])
+    assert board.page('all')['rows'][0] == {'rank': 1, 'user_id': 1, 'username': 'old', 'avatar': None,
+                                            'rating': 1500, 'wins': 0, 'losses': 0, 'win_rate': 0.0}
+    board.record(1, True, False, 10)
+    assert board.players[1]['rating'] == 1510
+
+
+def test_stale_boards_are_served_while_they_rebuild_in_the_background(app_module, monkeypatch):
+    board = Leaderboard()
+    board.load([_player(1, 1600)], [])
+    board.loaded_at -= 1000
+    monkeypatch.setattr(app_module, "leaderboard", board)
+    monkeypatch.setattr(app_module, "LEADERBOARD_REFRESH", 300)
+    release, loads = threading.Event(), []
+
+    def slow_load():
+        release.wait(5)
+        loads.append(threading.current_thread().name)
+        board.load([_player(1, 1600), _player(2, 1700)], [])
+
+    monkeypatch.setattr(app_module, "load_leaderboard", slow_load)
+    assert app_module.current_leaderboard() is board and board.stats()['players'] == 1
+    app_module.current_leaderboard()  # the rebuild is still running: not queued twice
+    release.set()
+    app_module._leaderboard_refresh.result(5)
+    assert loads == ["leaderboard_0"] and board.page('all')['rows'][0]['user_id'] == 2
+
+
+def test_leaderboard_endpoint_is_served_from_the_boards(app_module, client, count_queries, monkeypatch):
+    monkeypatch.setattr(app_module, "leaderboard", Leaderboard())
+    ids = []
+    for name in ("ann", "bob", "cyd"):
+        r = client.post("/api/auth/register", json={"username": name, "password": "pw123456"})
+        ids.append(r.get_json()["user"]["id"])
+    ann, bob, cyd = ids
+    with app_module.app.app_context():
+        db, User, BattleResult = app_module.db, app_module.User, app_module.BattleResult
+        db.session.get(User, bob).battle_rating = 1600
+        db.session.add(BattleResult(battle_id="old", user_id=cyd, opponent_id=ann, mode="ranked", is_winner=True,
+                                    rating_change=20, timestamp=datetime.utcnow() - timedelta(days=10)))
+        db.session.commit()
+    headers = auth_headers(app_module, ann)
+
+    r = client.get("/api/battle/leaderboard", headers=headers)
+    body = r.get_json()
+    assert [row["username"] for row in body["leaderboard"]] == ["bob", "ann", "cyd"]
+    assert body["current_user_rank"] == 2 and body["total_players"] == 3
+    assert client.get("/api/battle/leaderboard?period=week", headers=headers).get_json()["total_players"] == 0
+    month = client.get("/api/battle/leaderboard?period=month", headers=headers).get_json()
+    assert month["leaderboard"][0]["username"] == "cyd" and month["current_user_rank"] is None
+
+    app_module.persist_battle_result({"battle_id": "b1", "mode": "ranked", "total_questions": 5, "players": [
+        {"user_id": ann, "opponent_id": cyd, "score": 500, "questions_correct": 5, "is_winner": True,
+         "rating_change": 150},
+        {"user_id": cyd, "opponent_id": ann, "score": 0, "questions_correct": 0, "is_winner": False,
+         "rating_change": -150}]})
+    count_queries.clear()
+    body = client.get("/api/battle/leaderboard", headers=headers).get_json()
+    assert count_queries == []  # no sort, no query: the token and user context are cached too
+    assert body["current_user_rank"] == 1 and body["leaderboard"][0]["rating"] == 1650
+    week = client.get("/api/battle/leaderboard?period=week&limit=1", headers=headers).get_json()
+    assert week["leaderboard"] == [{"rank": 1, "username": "ann", "avatar": "👤", "rating": 1650,
+                                    "rating_change": 150, "wins": 1, "losses": 0, "win_rate": 100.0}]
+    assert week["total_players"] == 2
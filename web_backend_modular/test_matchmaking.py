@@ -0,0 +1,135 @@
+"""
+Tests for the rating-bucketed matchmaking queue and its endpoints.
+"""
+
+import threading
+
+from conftest import auth_headers
+from matchmaking import Matchmaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _matchmaker(clock, **kwargs):
+    return Matchmaker(bucket_width=50, base_window=50, widen_per_second=10, max_window=400, clock=clock, **kwargs)
+
+
+def test_close_ratings_pair_on_join_and_both_see_the_match():
+    clock = Clock()
+    made = []
+    mm = _matchmaker(clock, on_match=made.append)
+    assert mm.join(1, 1500, {"username": "ann"})["status"] == "waiting"
+    second = mm.join(2, 1540, {"username": "bob"})
+    assert second["status"] == "matched" and second["opponent"]["username"] == "ann"
+    first = mm.poll(1)
+    assert first["battle_id"] == second["battle_id"] and first["opponent"] == {
+        "username": "bob", "id": 2, "rating": 1540, "waited": 0.0}
+    assert mm.join(1, 1500)["battle_id"] == first["battle_id"]  # joining again is idempotent
+    assert len(made) == 1 and mm.stats()["waiting"] == 0
+
+
+def test_on_match_runs_outside_the_lock_and_the_opponent_sees_starting():
+    clock = Clock()
+    entered, release = threading.Event(), threading.Event()
+
+    def open_room(match):
+        entered.set()
+        release.wait(5)  # slow question loading
+
+    mm = _matchmaker(clock, on_match=open_room)
+    mm.join(1, 1500)
+    joined = {}
+    worker = threading.Thread(target=lambda: joined.update(mm.join(2, 1510)))
+    worker.start()
+    assert entered.wait(5)
+    # Other players are served meanwhile; the opponent waits for the room
+    assert mm.join(3, 2000)["status"] == "waiting" and mm.stats()["pending_matches"] == 2
+    starting = mm.poll(1)
+    assert starting["status"] == "starting" and not mm.cancel(1)
+    release.set()
+    worker.join(5)
+    assert joined["status"] == "matched" and joined["battle_id"] == starting["battle_id"]
+    assert mm.poll(1)["status"] == "matched"
+
+
+def test_window_widens_with_wait_time():
+    clock = Clock()
+    mm = _matchmaker(clock)
+    mm.join(1, 1500)
+    assert mm.join(2, 1700)["window"] == 50
+    clock.now += 10
+    assert mm.poll(2)["status"] == "waiting"  # window 150 < 200
+    clock.now += 6
+    status = mm.poll(1)  # window 210 covers the newcomer
+    assert status["status"] == "matched" and status["opponent"]["id"] == 2
+    assert mm.window(1000) == 400
+
+
+def test_nearest_rating_wins_over_queue_order():
+    clock = Clock()
+    mm = _matchmaker(clock)
+    mm.join(1, 1350)
+    mm.join(2, 1700)
+    clock.now += 20
+    mm.poll(1), mm.poll(2)
+    assert mm.join(3, 1680)["opponent"]["id"] == 2
+
+
+def test_cancel_and_stale_players_leave_the_queue():
+    clock = Clock()
+    mm = _matchmaker(clock, stale_after=30, match_ttl=30)
+    mm.join(1, 1500)
+    assert mm.cancel(1) and not mm.cancel(1)
+    assert mm.poll(1) == {"status": "idle"}
+
+    mm.join(2, 1500)
+    clock.now += 31
+    assert mm.join(3, 1500)["status"] == "waiting"  # 2 stopped polling
+    assert mm.stats()["evicted"] == 1
+
+    mm.join(4, 1500)
+    assert not mm.cancel(4)  # already matched with 3
+    clock.now += 31
+    assert mm.poll(4) == {"status": "idle"}  # match expired
+
+
+def test_matchmaking_endpoints(app_module, client, monkeypatch):
+    ids = []
+    for name in ("ann", "bob"):
+        r = client.post("/api/auth/register", json={"username": name, "password": "pw123456"})
+        ids.append(r.get_json()["user"]["id"])
+    ann, bob = (auth_headers(app_module, uid) for uid in ids)
+    monkeypatch.setattr(app_module, "matchmaker", Matchmaker())
+
+    r = client.post("/api/battle/matchmaking/join", headers=ann)
+    assert r.status_code == 202 and r.get_json()["status"] == "waiting"
+    assert client.get("/api/battle/matchmaking/poll", headers=ann).status_code == 202
+    r = client.post("/api/battle/matchmaking/join", headers=bob)
+    assert r.status_code == 200 and r.get_json()["opponent"]["username"] == "ann"
+    r = client.post("/api/battle/matchmaking/cancel", headers=ann)
+    assert r.status_code == 409 and r.get_json()["opponent"]["username"] == "bob"
+
+    monkeypatch.setattr(app_module, "matchmaker", Matchmaker())
+    client.post("/api/battle/matchmaking/join", headers=ann)
+    assert client.post("/api/battle/matchmaking/cancel", headers=ann).get_json() == {"status": "cancelled"}
+    assert client.get("/api/battle/matchmaking/poll", headers=ann).get_json() == {"status": "idle"}
+
+
+def test_join_with_a_null_rating_queues_at_the_default(app_module, client, monkeypatch):
+    r = client.post("/api/auth/register", json={"username": "nora", "password": "pw123456"})
+    uid = r.get_json()["user"]["id"]
+    with app_module.app.app_context():
+        app_module.db.session.get(app_module.User, uid).battle_rating = None
+        app_module.db.session.commit()
+    matchmaker = Matchmaker()
+    monkeypatch.setattr(app_module, "matchmaker", matchmaker)
+
+    r = client.post("/api/battle/matchmaking/join", headers=auth_headers(app_module, uid))
+    assert r.status_code == 202 and r.get_json()["status"] == "waiting"
+    assert matchmaker._waiting[uid].rating == 1500
@@ -0,0 +1,135 @@
+"""
+Tests for password hashing on the bounded hashing pool.
+"""
+
+import threading
+
+import pytest
+
+from password_hashing import (HASHERS, HashingPool, HashingPoolSaturated, PasswordPolicy, hash_password,
+                              parse_hash, parse_params, verify_password)
+
+
+def test_hash_format_is_unchanged_and_verification_is_exact():
+    digest = hash_password("secret", "salt", iterations=1000)
+    assert len(digest) == 64 and int(digest, 16) >= 0
+    assert verify_password("secret", "salt", digest, iterations=1000)
+    assert not verify_password("Secret", "salt", digest, iterations=1000)
+    assert not verify_password("secret", "salt", "", iterations=1000)
+
+
+def test_pool_rejects_work_beyond_workers_plus_queue():
+    pool = HashingPool(workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    results = []
+    running = threading.Thread(target=lambda: results.append(pool.run(blocker)))
+    running.start()
+    started.wait(5)
+    queued = threading.Thread(target=lambda: results.append(pool.run(lambda: "queued")))
+    queued.start()
+    while pool.stats()["queue_depth"] < 2:
+        pass
+
+    with pytest.raises(HashingPoolSaturated) as exc:
+        pool.run(lambda: "rejected")
+    assert exc.value.retry_after == 3
+
+    release.set()
+    running.join(5)
+    queued.join(5)
+    assert sorted(results) == ["done", "queued"]
+    assert pool.stats() == {"workers": 1, "max_queue": 1, "queue_depth": 0, "peak_queue_depth": 2,
+                            "completed": 2, "rejected": 1}
+    pool.shutdown()
+
+
+def test_login_answers_503_with_retry_after_when_pool_is_full(app_module, client, monkeypatch):
+    r = client.post("/api/auth/register", json={"username": "kim", "password": "pw123456"})
+    assert r.status_code == 201
+    assert client.post("/api/auth/login", json={"username": "kim", "password": "pw123456"}).status_code == 200
+    assert client.post("/api/auth/login", json={"username": "kim", "password": "nope"}).status_code == 401
+
+    saturated = HashingPool(workers=1, max_queue=0)
+    saturated.depth = 1  # the single worker is busy
+    monkeypatch.setattr(app_module, "password_pool", saturated)
+    r = client.post("/api/auth/login", json={"username": "kim", "password": "pw123456"})
+    assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+    assert saturated.stats()["rejected"] == 1
+
+
+def test_encoded_hashes_round_trip_for_each_available_algorithm():
+    for policy in (PasswordPolicy("pbkdf2_sha256", {"i": 1000}), PasswordPolicy("scrypt", {"n": 1024, "r": 8, "p": 1})):
+        salt, stored = policy.hash("secret")
+        algorithm, params, stored_salt, digest = parse_hash(stored)
+        assert (algorithm, params, stored_salt) == (policy.algorithm, policy.params, salt)
+        assert len(digest) == 64
+        assert policy.verify("secret", stored) and not policy.verify("Secret", stored)
+        assert not policy.needs_rehash(stored)
+
+
+def test_legacy_digest_verifies_and_is_flagged_for_rehash():
+    policy = PasswordPolicy("scrypt", parse_params("n=1024,r=8,p=1"))
+    legacy = hash_password("secret", "salt")
+    assert policy.verify("secret", legacy, "salt")
+    assert not policy.verify("secret", legacy, "other-salt")
+    ok, upgrade = policy.verify_and_update("secret", legacy, "salt")
+    assert ok and upgrade[1].startswith("scrypt$n=1024,p=1,r=8$")
+    assert policy.verify_and_update("nope", legacy, "salt") == (False, None)
+
+
+def test_policy_cost_change_triggers_rehash_and_bad_params_do_not_verify():
+    _, stored = PasswordPolicy("pbkdf2_sha256", {"i": 1000}).hash("secret")
+    stronger = PasswordPolicy("pbkdf2_sha256", {"i": 2000})
+    ok, upgrade = stronger.verify_and_update("secret", stored)
+    assert ok and upgrade[1].startswith("pbkdf2_sha256$i=2000$")
+    assert not stronger.verify("secret", "pbkdf2_sha256$x=1$salt$" + "0" * 64)
+    assert not stronger.verify("secret", "unknown$i=1$salt$" + "0" * 64)
+
+
+def test_unavailable_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        PasswordPolicy("bcrypt")
+    if HASHERS["argon2id"].available():
+        assert PasswordPolicy("argon2id").params == {"t": 3, "m": 65536, "p": 2}
+    else:
+        with pytest.raises(ValueError):
+            PasswordPolicy("argon2id")
+
+
+def test_login_upgrades_legacy_sql_hash(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "password_policy", PasswordPolicy("pbkdf2_sha256", {"i": 1000}))
+    with app_module.app.app_context():
+        user = app_module.User(username="old", email="old@example.com", salt="salt",
+                               password_hash=hash_password("secret", "salt"))
+        app_module.db.session.add(user)
+        app_module.db.session.commit()
+
+    assert client.post("/api/auth/login", json={"username": "old", "password": "secret"}).status_code == 200
+    with app_module.app.app_context():
+        user = app_module.User.query.filter_by(username="old").first()
+        assert user.password_hash.startswith("pbkdf2_sha256$i=1000$" + user.salt + "$")
+        stored = user.password_hash
+    assert client.post("/api/auth/login", json={"username": "old", "password": "secret"}).status_code == 200
+    with app_module.app.app_context():
+        assert app_module.User.query.filter_by(username="old").first().password_hash == stored
+
+
+def test_github_login_upgrades_legacy_hash(app_module, client, monkeypatch, fake_github, github_store):
+    monkeypatch.setattr(app_module, "STORAGE_BACKEND", "github")
+    monkeypatch.setattr(app_module, "github_store", github_store)
+    monkeypatch.setattr(app_module, "password_policy", PasswordPolicy("scrypt", {"n": 1024, "r": 8, "p": 1}))
+    created = github_store.create_user("gh", lambda new_id: {
+        "id": new_id, "username": "gh", "email": "gh@example.com", "role": "student",
+        "salt": "salt", "password_hash": hash_password("secret", "salt"), "is_active": True}, "Register gh")
+
+    assert client.post("/api/auth/login", json={"username": "gh", "password": "secret"}).status_code == 200
+    user = github_store.read_user_by_id(created["id"])
+    assert user["password_hash"].startswith("scrypt$n=1024,p=1,r=8$" + user["salt"] + "$")
+    assert user["last_login"]
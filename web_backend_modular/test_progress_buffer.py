@@ -0,0 +1,57 @@
+"""
+Tests for the write-behind progress buffer: appends stay local, the
+background thread flushes and backs off after failures.
+"""
+
+import threading
+import time
+
+from progress_buffer import ProgressWriteBuffer
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_threshold_wakes_the_flush_thread_instead_of_flushing_inline(tmp_path):
+    release = threading.Event()
+    batches = []
+
+    def write_batch(pending):
+        release.wait(5)  # a slow GitHub commit
+        batches.append((threading.current_thread().name, pending))
+
+    buffer = ProgressWriteBuffer(write_batch, str(tmp_path), max_pending=2, max_age=3600).start()
+    buffer.append(1, {"question_id": 1, "timestamp": "t1"})
+    buffer.append(1, {"question_id": 2, "timestamp": "t2"})  # returns without waiting for the commit
+    assert batches == []
+
+    release.set()
+    assert _wait_for(lambda: batches)
+    assert batches == [("progress-flush", {1: [{"question_id": 1, "timestamp": "t1"},
+                                               {"question_id": 2, "timestamp": "t2"}]})]
+    buffer.close()
+
+
+def test_failed_flush_backs_off_and_keeps_the_entries(tmp_path):
+    calls = []
+
+    def write_batch(pending):
+        calls.append(sum(len(entries) for entries in pending.values()))
+        if len(calls) == 1:
+            raise RuntimeError("GitHub is down")
+
+    buffer = ProgressWriteBuffer(write_batch, str(tmp_path), max_pending=1, max_age=3600,
+                                 retry_delay=1.0).start()
+    buffer.append(1, {"question_id": 1, "timestamp": "t1"})
+    assert _wait_for(lambda: calls)
+    for i in range(2, 6):  # over the threshold, but within the backoff: no retry per answer
+        buffer.append(1, {"question_id": i, "timestamp": f"t{i}"})
+    assert calls == [1]
+
+    assert _wait_for(lambda: len(calls) == 2)  # retried once the delay has passed
+    assert calls == [1, 5] and buffer.pending_for(1) == []
+    buffer.close()
@@ -0,0 +1,112 @@
+"""
+Tests for random question sampling from cached per-table id arrays.
+"""
+
+import random
+
+from conftest import auth_headers
+from question_sampler import QuestionIdSampler
+
+
+def test_sampler_draws_distinct_ids_and_caches_the_array():
+    loads = []
+
+    def load(table):
+        loads.append(table)
+        return range(1, 101) if table == "big" else [7]
+
+    sampler = QuestionIdSampler(load, rng=random.Random(1))
+    first = sampler.sample("big", 10)
+    assert len(set(first)) == 10 and set(first) <= set(range(1, 101))
+    assert sorted(sampler.sample("big")) == list(range(1, 101))
+    assert sampler.sample("small", 5) == [7]
+    assert loads == ["big", "small"]
+
+    sampler.invalidate("big")
+    sampler.sample("big", 1)
+    assert loads == ["big", "small", "big"]
+
+
+def test_sampler_reloads_after_ttl():
+    loads = []
+    sampler = QuestionIdSampler(lambda table: loads.append(table) or [1, 2], ttl=0)
+    sampler.sample("t", 1)
+    sampler.sample("t", 1)
+    assert len(loads) == 2
+
+
+def _add_questions(app_module, table, count):
+    with app_module.app.app_context():
+        for i in range(count):
+            app_module.db.session.add(app_module.Question(
+                table_name=table, question_text=f"{table} {i}", answer_a="a", answer_b="b", answer_c="c",
+                correct_answer=0))
+        app_module.db.session.commit()
+
+
+def test_random_mode_samples_by_id_and_sees_new_and_deleted_questions(app_module, client):
+    headers = auth_headers(app_module, 1)
+    app_module.question_sampler.invalidate()
+    _add_questions(app_module, "gamma", 30)
+    _add_questions(app_module, "delta", 5)
+
+    def random_ids(limit):
+        r = client.get(f"/api/quiz/questions/gamma?mode=random&limit={limit}", headers=headers)
+        assert r.status_code == 200
+        return [q["id"] for q in r.get_json()["questions"]]
+
+    with app_module.app.app_context():
+        gamma_ids = {q.id for q in app_module.Question.query.filter_by(table_name="gamma")}
+    ids = random_ids(10)
+    assert len(set(ids)) == 10 and set(ids) <= gamma_ids
+    assert set(random_ids(100)) == gamma_ids
+
+    # Rows deleted behind the cached array: the sampler reloads instead of returning fewer questions
+    with app_module.app.app_context():
+        app_module.Question.query.filter(app_module.Question.id.in_(sorted(gamma_ids)[:25])).delete()
+        app_module.db.session.commit()
+    assert len(random_ids(5)) == 5
+
+    # Questions added by this worker invalidate the table's array
+    _add_questions(app_module, "gamma", 3)
+    assert len(random_ids(100)) == 8
+
+
+def test_question_changes_refresh_the_sampled_ids_after_commit(app_module):
+    sampler = app_module.question_sampler
+    with app_module.app.app_context():
+        _add_questions(app_module, "eps", 2)
+        _add_questions(app_module, "zeta", 1)
+        assert len(sampler.sample("eps")) == 2 and len(sampler.sample("zeta")) == 1
+
+        question = app_module.Question(table_name="eps", question_text="new", answer_a="a", answer_b="b",
+                                       answer_c="c", correct_answer=0)
+        app_module.db.session.add(question)
+        app_module.db.session.flush()
+        assert question.id not in sampler.sample("eps")  # not committed yet
+        app_module.db.session.commit()
+        assert question.id in sampler.sample("eps")
+
+        question.table_name = "zeta"
+        app_module.db.session.commit()
+        assert question.id not in sampler.sample("eps") and question.id in sampler.sample("zeta")
+
+        question.question_text = "edited"  # ids unchanged: the arrays stay cached
+        loads = []
+        original = sampler.load_ids
+        sampler.load_ids = lambda table: loads.append(table) or original(table)
+        try:
+            app_module.db.session.commit()
+            sampler.sample("zeta")
+            assert loads == []
+
+            app_module.db.session.delete(question)
+            app_module.db.session.rollback()
+            sampler.sample("zeta")
+            assert loads == []
+
+            app_module.db.session.delete(question)
+            app_module.db.session.commit()
+            assert question.id not in sampler.sample("zeta") and loads == ["zeta"]
+        finally:
+            sampler.load_ids = original
@@ -0,0 +1,98 @@
+"""
+Quiz mode parity: the GitHub backend must filter 'unanswered', 'wrong' and
+'review' exactly like the SQL backend.
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import auth_headers
+
+QUESTIONS = [
+    {"id": i, "table_name": "alpha", "question": f"Q{i}", "answer_a": "a", "answer_b": "b", "answer_c": "c",
+     "correct_answer": i % 3}
+    for i in range(1, 9)
+] + [{"id": 9, "table_name": "beta", "question": "Q9", "answer_a": "a", "answer_b": "b", "answer_c": "c",
+      "correct_answer": 0}]
+
+# (question_id, selected_answer): q2 wrong then right, q5 right then wrong, q9 is another table
+ANSWERS = [(1, 1), (2, 0), (2, 2), (4, 1), (5, 2), (5, 0), (7, 0), (9, 1)]
+
+
+def _seed_sql(app_module):
+    with app_module.app.app_context():
+        for q in QUESTIONS:
+            app_module.db.session.add(app_module.Question(
+                id=q["id"], table_name=q["table_name"], question_text=q["question"],
+                answer_a=q["answer_a"], answer_b=q["answer_b"], answer_c=q["answer_c"],
+                correct_answer=q["correct_answer"]))
+        app_module.db.session.commit()
+
+
+def _seed_github(app_module, monkeypatch, fake_github, github_store):
+    fake_github.put_file("data/questions.json", {
+        "quiz_tables": [{"id": 1, "name": "alpha"}, {"id": 2, "name": "beta"}],
+        "questions": QUESTIONS,
+        "next_question_id": 10,
+    })
+    github_store.migrate_questions_to_shards()
+    monkeypatch.setattr(app_module, "STORAGE_BACKEND", "github")
+    monkeypatch.setattr(app_module, "github_store", github_store)
+
+
+def _mode_results(client, headers):
+    results = {}
+    for mode in ("normal", "unanswered", "wrong", "review"):
+        for limit in ("", "&limit=2"):
+            r = client.get(f"/api/quiz/questions/alpha?mode={mode}{limit}", headers=headers)
+            assert r.status_code == 200
+            results[(mode, limit)] = [q["id"] for q in r.get_json()["questions"]]
+    return results
+
+
+def _review_later(app_module, monkeypatch, client, headers, days):
+    later = time.time() + days * 86400
+    with monkeypatch.context() as m:
+        m.setattr(app_module, "time", SimpleNamespace(time=lambda: later))
+        r = client.get("/api/quiz/questions/alpha?mode=review", headers=headers)
+    return [q["id"] for q in r.get_json()["questions"]]
+
+
+def _answer_all(client, headers):
+    for qid, selected in ANSWERS:
+        r = client.post("/api/quiz/submit-answer", json={"question_id": qid, "selected_answer": selected},
+                        headers=headers)
+        assert r.status_code == 200
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+def test_github_mode_filters_match_sql(app_module, client, monkeypatch, fake_github, github_store, tmp_path,
+                                       write_behind):
+    headers = auth_headers(app_module, 5)
+    _seed_sql(app_module)
+    _answer_all(client, headers)
+    sql_results = _mode_results(client, headers)
+    sql_review_later = _review_later(app_module, monkeypatch, client, headers, days=2)
+
+    _seed_github(app_module, monkeypatch, fake_github, github_store)
+    if write_behind:
+        github_store.enable_write_behind(str(tmp_path), max_pending=100, max_age=3600)
+    assert _mode_results(client, headers)[("unanswered", "")] == list(range(1, 9))
+    _answer_all(client, headers)
+    github_results = _mode_results(client, headers)
+
+    assert sql_results[("unanswered", "")] == [3, 6, 8]
+    assert sql_results[("wrong", "")] == [2, 5, 7]
+    assert sql_results[("review", "")] == [3, 6, 8]  # nothing due yet, only unscheduled questions
+    assert github_results == sql_results
+    # Two days later: lapses (10 min) before the 1-day intervals, each by due time, then new questions
+    assert sql_review_later == [5, 7, 1, 2, 4, 3, 6, 8]
+    assert _review_later(app_module, monkeypatch, client, headers, days=2) == sql_review_later
+    if write_behind:
+        github_store.progress_buffer.close()
+        # Flushed summary gives the same answer as the in-memory index did
+        github_store.invalidate()
+        github_store._progress_indexes.clear()
+        assert _mode_results(client, headers) == sql_results
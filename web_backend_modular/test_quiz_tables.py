@@ -0,0 +1,80 @@
+"""
+Tests for the quiz_tables catalog behind /api/quiz/tables.
+"""
+
+from conftest import auth_headers
+
+
+def _question(app_module, table, i=0):
+    return app_module.Question(table_name=table, question_text=f"{table} {i}", answer_a="a", answer_b="b",
+                               answer_c="c", correct_answer=0)
+
+
+def _tables(client, headers, etag=None):
+    extra = {"If-None-Match": etag} if etag else {}
+    return client.get("/api/quiz/tables", headers={**headers, **extra})
+
+
+def test_counts_follow_inserts_deletes_and_moves(app_module, client):
+    db = app_module.db
+    headers = auth_headers(app_module, 1)
+    with app_module.app.app_context():
+        db.session.add_all([_question(app_module, "physics", i) for i in range(3)] + [_question(app_module, "math_basics")])
+        db.session.commit()
+
+    r = _tables(client, headers)
+    assert r.get_json()["tables"] == [
+        {"name": "math_basics", "display_name": "Math Basics", "question_count": 1},
+        {"name": "physics", "display_name": "Physics", "question_count": 3},
+    ]
+
+    with app_module.app.app_context():
+        physics = app_module.Question.query.filter_by(table_name="physics").order_by(app_module.Question.id).all()
+        db.session.delete(physics[0])
+        physics[1].table_name = "math_basics"
+        db.session.commit()
+        counts = {t.name: t.question_count for t in app_module.QuizTable.query}
+    assert counts == {"physics": 1, "math_basics": 2}
+
+    with app_module.app.app_context():
+        db.session.delete(app_module.Question.query.filter_by(table_name="physics").one())
+        db.session.commit()
+    assert [t["name"] for t in _tables(client, headers).get_json()["tables"]] == ["math_basics"]
+
+
+def test_listing_uses_cached_catalog_and_answers_304(app_module, client, count_queries):
+    headers = auth_headers(app_module, 1)
+    with app_module.app.app_context():
+        app_module.db.session.add_all([_question(app_module, f"table_{i}") for i in range(20)])
+        app_module.db.session.commit()
+
+    first = _tables(client, headers)
+    etag = first.headers["ETag"]
+    assert len(first.get_json()["tables"]) == 20
+
+    count_queries.clear()
+    again = _tables(client, headers)
+    assert again.get_json() == first.get_json()
+    assert len(count_queries) == 1  # only the catalog version lookup, no per-table COUNT(*)
+
+    not_modified = _tables(client, headers, etag)
+    assert not_modified.status_code == 304 and not_modified.data == b""
+
+    with app_module.app.app_context():
+        app_module.db.session.add(_question(app_module, "table_0", 1))
+        app_module.db.session.commit()
+    changed = _tables(client, headers, etag)
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert changed.get_json()["tables"][0]["question_count"] == 2
+
+
+def test_catalog_is_built_from_existing_questions(app_module, client):
+    with app_module.app.app_context():
+        app_module.db.session.execute(app_module.Question.__table__.insert(), [
+            {"table_name": "legacy", "question_text": f"q{i}", "answer_a": "a", "answer_b": "b", "answer_c": "c",
+             "correct_answer": 0} for i in range(4)])
+        app_module.db.session.commit()
+        assert app_module.QuizTable.query.count() == 0
+
+    r = _tables(client, auth_headers(app_module, 1))
+    assert r.get_json()["tables"] == [{"name": "legacy", "display_name": "Legacy", "question_count": 4}]
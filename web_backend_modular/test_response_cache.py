@@ -0,0 +1,87 @@
+"""
+Tests for ETag / If-None-Match handling of the quiz read endpoints.
+"""
+
+from conftest import auth_headers
+from response_cache import ResponseCache
+from test_quiz_modes import _seed_github, _seed_sql
+
+
+def test_lru_is_bounded_by_entries_and_bytes():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"12")            # over the entry bound: evicts b (least recently used)
+    assert cache.get("b") is None and len(cache) == 2
+    cache.put("d", b"123456789")     # over the byte bound: evicts until it fits
+    assert cache.get("d") == b"123456789" and len(cache) == 1
+    cache.put("e", b"x" * 11)        # larger than the whole cache: not stored
+    assert cache.get("e") is None
+    assert ResponseCache.etag(("q", 1)) == ResponseCache.etag(("q", 1)) != ResponseCache.etag(("q", 2))
+
+
+def _get(client, url, headers, etag=None):
+    return client.get(url, headers={**headers, **({"If-None-Match": etag} if etag else {})})
+
+
+def test_sql_questions_answer_304_before_loading_questions(app_module, client, count_queries):
+    headers = auth_headers(app_module, 5)
+    _seed_sql(app_module)
+    url = "/api/quiz/questions/alpha?mode=normal&limit=3"
+
+    first = _get(client, url, headers)
+    etag = first.headers["ETag"]
+    assert [q["id"] for q in first.get_json()["questions"]] == [1, 2, 3]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    count_queries.clear()
+    not_modified = _get(client, url, headers, etag)
+    assert not_modified.status_code == 304 and not_modified.data == b""
+    assert len(count_queries) == 1 and "quiz_catalog" in count_queries[0]
+
+    # Different query args, different entity
+    assert _get(client, "/api/quiz/questions/alpha?mode=normal", headers).headers["ETag"] != etag
+
+    # Editing a question changes the bank version
+    with app_module.app.app_context():
+        app_module.db.session.get(app_module.Question, 2).question_text = "Q2 edited"
+        app_module.db.session.commit()
+    changed = _get(client, url, headers, etag)
+    assert changed.status_code == 200 and changed.get_json()["questions"][1]["text"] == "Q2 edited"
+
+
+def test_per_user_modes_are_keyed_by_user_and_progress(app_module, client):
+    _seed_sql(app_module)
+    url = "/api/quiz/questions/alpha?mode=unanswered"
+    anna, bert = auth_headers(app_module, 5), auth_headers(app_module, 6)
+
+    etag = _get(client, url, anna).headers["ETag"]
+    assert _get(client, url, bert).headers["ETag"] != etag
+    assert _get(client, url, anna, etag).status_code == 304
+
+    client.post("/api/quiz/submit-answer", json={"question_id": 1, "selected_answer": 1}, headers=anna)
+    fresh = _get(client, url, anna, etag)
+    assert fresh.status_code == 200 and 1 not in [q["id"] for q in fresh.get_json()["questions"]]
+    assert "ETag" not in _get(client, "/api/quiz/questions/alpha?mode=random&limit=2", anna).headers
+
+
+def test_github_questions_revalidate_without_fetching_the_shard(app_module, client, monkeypatch, fake_github,
+                                                               github_store, tmp_path):
+    _seed_github(app_module, monkeypatch, fake_github, github_store)
+    github_store.enable_write_behind(str(tmp_path), max_pending=100, max_age=3600)
+    headers = auth_headers(app_module, 5)
+
+    etag = _get(client, "/api/quiz/questions/alpha", headers).headers["ETag"]
+    github_store.invalidate()
+    shard_gets = fake_github.count("GET", "/contents/data/questions/table_")
+    assert _get(client, "/api/quiz/questions/alpha", headers, etag).status_code == 304
+    assert fake_github.count("GET", "/contents/data/questions/table_") == shard_gets
+    assert fake_github.count("GET", "/contents/data/questions/_manifest.json") >= 1
+
+    wrong_url = "/api/quiz/questions/alpha?mode=wrong"
+    wrong_etag = _get(client, wrong_url, headers).headers["ETag"]
+    client.post("/api/quiz/submit-answer", json={"question_id": 4, "selected_answer": 0}, headers=headers)
+    fresh = _get(client, wrong_url, headers, wrong_etag)  # buffered answer, summary sha unchanged
+    assert fresh.status_code == 200 and [q["id"] for q in fresh.get_json()["questions"]] == [4]
+    github_store.progress_buffer.close()
@@ -0,0 +1,68 @@
+"""
+Unit tests for the SM-2 scheduler and the in-memory review queue.
+"""
+
+from progress_log import ProgressIndex, summary_from_entries
+from review_scheduler import (DAY_SECONDS, LAPSE_INTERVAL_DAYS, MIN_EASE, ReviewQueue, Schedule,
+                              next_schedule)
+
+
+def test_intervals_grow_with_correct_answers_and_reset_on_a_lapse():
+    s1 = next_schedule(None, True, 0.0)
+    s2 = next_schedule(s1, True, 1.0)
+    s3 = next_schedule(s2, True, 2.0)
+    assert (s1.interval, s2.interval) == (1.0, 6.0)
+    assert s3.interval == 6.0 * s3.ease and s3.repetitions == 3
+
+    lapse = next_schedule(s3, False, 3.0)
+    assert (lapse.interval, lapse.repetitions) == (LAPSE_INTERVAL_DAYS, 0)
+    assert lapse.ease < s3.ease
+    assert next_schedule(lapse, True, 4.0).interval == 1.0
+
+
+def test_fast_answers_raise_ease_and_ease_has_a_floor():
+    assert next_schedule(None, True, 0.0, response_time=2).ease > next_schedule(None, True, 0.0, response_time=30).ease
+    s = None
+    for i in range(20):
+        s = next_schedule(s, False, float(i))
+    assert s.ease == MIN_EASE
+
+
+def test_queue_returns_due_ids_most_overdue_first():
+    queue = ReviewQueue()
+    queue.record(1, True, 0.0)                 # due after 1 day
+    queue.record(2, False, 100.0)              # due after 10 minutes
+    queue.record(3, True, 50.0)
+    assert queue.due(60.0) == []
+    assert queue.due(DAY_SECONDS + 60) == [2, 1, 3]
+    assert queue.due(DAY_SECONDS + 60, eligible={1, 3}, limit=1) == [1]
+
+    queue.record(2, True, 200.0)               # rescheduled: 1 day after its second answer
+    assert queue.due(DAY_SECONDS + 60) == [1, 3]
+    assert len(queue._order) == 3
+
+
+def test_replayed_answers_do_not_advance_a_schedule():
+    queue = ReviewQueue()
+    first = queue.record(7, True, 10.0)
+    assert queue.record(7, True, 10.0) is None
+    assert queue.schedules[7] == first
+
+
+def test_summary_schedules_round_trip_into_the_index():
+    entries = [
+        {"question_id": 4, "timestamp": "2026-01-01T10:00:00", "is_correct": False},
+        {"question_id": 4, "timestamp": "2026-01-01T10:05:00", "is_correct": True},
+        {"question_id": 9, "timestamp": "2026-01-01T11:00:00", "is_correct": True, "response_time": 3},
+        {"question_id": 9, "timestamp": "legacy", "is_correct": False},  # no usable time: counted, not scheduled
+    ]
+    summary, _ = summary_from_entries(entries)
+    index = ProgressIndex(summary)
+    assert Schedule.from_json(summary["review"]["9"]).repetitions == 1
+    assert set(index.schedule.schedules) == {4, 9}
+
+    payloads = [{"id": i} for i in (4, 5, 9)]
+    by_id = {p["id"]: p for p in payloads}
+    later = index.schedule.schedules[9].due + 1
+    assert [p["id"] for p in index.review(payloads, by_id, later)] == [4, 9, 5]
+    assert [p["id"] for p in index.review(payloads, by_id, later, limit=1)] == [4]
@@ -0,0 +1,138 @@
+"""
+Tests for the shared store backends and the limiter/caches running on them.
+"""
+
+import multiprocessing
+import time
+
+import pytest
+from flask import Flask
+from flask_limiter import Limiter
+
+from auth_cache import TokenCache, UserContextCache
+from conftest import FakeRedis
+from response_cache import ResponseCache
+from shared_store import MemoryStore, RedisStore, SQLiteStore, open_store
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore(prefix="t:")
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "store.db"), prefix="t:")
+    return RedisStore(FakeRedis(), prefix="t:")
+
+
+def test_values_expire_after_their_ttl(store):
+    store.set("a", b"1")
+    store.set("b", b"2", ttl=0.05)
+    assert store.get("a") == b"1" and store.get("b") == b"2"
+    assert store.ttl("a") is None and 0 < store.ttl("b") <= 0.05
+    time.sleep(0.06)
+    assert store.get("b") is None and store.ttl("b") is None
+    store.delete("a")
+    assert store.get("a") is None
+
+
+def test_counters_take_their_ttl_only_when_created(store):
+    assert store.incr("hits", ttl=0.1) == 1
+    time.sleep(0.05)
+    assert store.incr("hits", 2, ttl=0.1) == 3
+    assert store.ttl("hits") < 0.06
+    time.sleep(0.06)
+    assert store.get("hits") is None
+    assert store.incr("hits", ttl=0.1) == 1
+
+
+def test_redis_counters_are_created_with_their_ttl_in_one_transaction():
+    fake = FakeRedis()
+    store = RedisStore(fake)
+    assert store.incr("hits", ttl=60) == 1 and store.incr("hits", 2, ttl=60) == 3
+    assert fake.commands == ["MULTI", "SET", "INCRBY", "EXEC"] * 2
+    assert 59 < store.ttl("hits") <= 60
+    assert store.incr("plain") == 1 and store.ttl("plain") is None
+
+
+def test_clear_removes_only_the_prefix(store):
+    store.set("user:1", b"x")
+    store.set("user:2", b"y")
+    store.set("token:1", b"z")
+    assert store.clear("user:") == 2
+    assert store.get("user:1") is None and store.get("token:1") == b"z"
+
+
+def test_open_store_picks_the_backend(tmp_path):
+    assert isinstance(open_store("memory://"), MemoryStore)
+    sqlite_store = open_store(f"sqlite:///{tmp_path / 's.db'}", prefix="p:")
+    assert isinstance(sqlite_store, SQLiteStore) and sqlite_store.prefix == "p:"
+    with pytest.raises(ValueError):
+        open_store("memcached://localhost")
+
+
+def _increment(path, times):
+    store = SQLiteStore(path)
+    for _ in range(times):
+        store.incr("shared", ttl=60)
+
+
+def test_sqlite_counter_is_exact_across_processes(tmp_path):
+    path = str(tmp_path / "store.db")
+    SQLiteStore(path)
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_increment, args=(path, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    assert SQLiteStore(path).get("shared") == b"200"
+
+
+def _worker_app(store):
+    app = Flask(__name__)
+    limiter = Limiter(key_func=lambda: "client", storage_uri="shared://", storage_options={"store": store})
+    limiter.init_app(app)
+
+    @app.route("/")
+    @limiter.limit("3 per minute")
+    def index():
+        return "ok"
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_limit_is_enforced_across_workers(tmp_path, backend):
+    if backend == "sqlite":
+        stores = [SQLiteStore(str(tmp_path / "limits.db")) for _ in range(2)]
+    else:
+        fake = FakeRedis()
+        stores = [RedisStore(fake), RedisStore(fake)]
+    workers = [_worker_app(store) for store in stores]
+    statuses = [workers[i % 2].get("/").status_code for i in range(5)]
+    assert statuses == [200, 200, 200, 429, 429]
+
+
+def test_caches_are_shared_and_invalidated_across_workers():
+    fake = FakeRedis()
+    loads = []
+    contexts = [UserContextCache(lambda uid: loads.append(uid) or {"id": uid, "role": "student"},
+                                 store=RedisStore(fake)) for _ in range(2)]
+    assert contexts[0].get(1) == contexts[1].get(1) == {"id": 1, "role": "student"}
+    assert loads == [1]
+    contexts[1].invalidate(1)
+    contexts[0].get(1)
+    assert loads == [1, 1]
+
+    tokens = [TokenCache(lambda token: {"user_id": 1, "exp": time.time() + 60}, store=RedisStore(fake))
+              for _ in range(2)]
+    tokens[0].payload("tok")
+    tokens[1].verify = lambda token: pytest.fail("verified twice")
+    assert tokens[1].payload("tok")["user_id"] == 1
+
+    responses = [ResponseCache(store=RedisStore(fake)) for _ in range(2)]
+    responses[0].put("etag", b"body")
+    assert responses[1].get("etag") == b"body"
+    responses[1].clear()
+    assert responses[0].get("etag") is None
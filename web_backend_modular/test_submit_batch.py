@@ -0,0 +1,76 @@
+"""
+Tests for /api/quiz/submit-answers (batched answer submission).
+"""
+
+from conftest import auth_headers
+from test_quiz_modes import ANSWERS, _seed_github, _seed_sql
+
+
+def _batch(client, headers, answers, **extra):
+    return client.post("/api/quiz/submit-answers", headers=headers, json={
+        "session_id": "s1", **extra,
+        "answers": [{"question_id": qid, "selected_answer": sel, "response_time": 4} for qid, sel in answers],
+    })
+
+
+def test_sql_batch_uses_one_bulk_insert_and_one_commit(app_module, client, count_queries):
+    _seed_sql(app_module)
+    headers = auth_headers(app_module, 5)
+
+    count_queries.clear()
+    r = _batch(client, headers, ANSWERS + [(999, 0)])
+    body = r.get_json()
+    assert r.status_code == 200
+    assert [(x["question_id"], x.get("correct")) for x in body["results"]] == [
+        (1, True), (2, False), (2, True), (4, True), (5, True), (5, False), (7, False), (9, False), (999, None)]
+    assert body["results"][-1]["error"] == "Question not found"
+    assert (body["saved"], body["correct"]) == (8, 4)
+    assert sum("INSERT INTO quiz_progress" in st for st in count_queries) == 1
+    assert sum(st.startswith("SELECT") and "FROM questions" in st for st in count_queries) == 1
+
+    with app_module.app.app_context():
+        rows = app_module.QuizProgress.query.order_by(app_module.QuizProgress.id).all()
+        assert [(p.question_id, p.is_correct, p.quiz_session_id) for p in rows][:3] == [
+            (1, True, "s1"), (2, False, "s1"), (2, True, "s1")]
+        states = {s.question_id: s for s in app_module.ReviewState.query}
+        assert states[2].repetitions == 1 and states[5].repetitions == 0  # in-batch order respected
+
+    # Same outcome as submitting one by one
+    r = client.get("/api/quiz/questions/alpha?mode=wrong", headers=headers)
+    assert [q["id"] for q in r.get_json()["questions"]] == [2, 5, 7]
+
+
+def test_batch_validation(app_module, client):
+    headers = auth_headers(app_module, 5)
+    assert client.post("/api/quiz/submit-answers", headers=headers, json={}).status_code == 400
+    assert client.post("/api/quiz/submit-answers", headers=headers,
+                       json={"answers": [{"question_id": 1}]}).status_code == 400
+    too_many = [(1, 0)] * (app_module.MAX_SUBMIT_BATCH + 1)
+    assert _batch(client, headers, too_many).status_code == 400
+
+
+def test_github_batch_is_one_progress_commit(app_module, client, monkeypatch, fake_github, github_store):
+    _seed_github(app_module, monkeypatch, fake_github, github_store)
+    headers = auth_headers(app_module, 5)
+    commits = fake_github.commit_count()
+
+    body = _batch(client, headers, ANSWERS).get_json()
+    assert body["saved"] == 8
+    assert fake_github.commit_count() == commits + 1
+    entries = fake_github.read_file("data/quiz_progress/5/000001.json")["entries"]
+    assert [e["question_id"] for e in entries] == [qid for qid, _ in ANSWERS]
+    r = client.get("/api/quiz/questions/alpha?mode=unanswered", headers=headers)
+    assert [q["id"] for q in r.get_json()["questions"]] == [3, 6, 8]
+
+
+def test_github_batch_is_one_spool_write(app_module, client, monkeypatch, fake_github, github_store, tmp_path):
+    _seed_github(app_module, monkeypatch, fake_github, github_store)
+    buffer = github_store.enable_write_behind(str(tmp_path), max_pending=100, max_age=3600)
+    spool_writes = []
+    original = buffer._spool_write
+    monkeypatch.setattr(buffer, "_spool_write", lambda lines: spool_writes.append(len(lines)) or original(lines))
+
+    _batch(client, auth_headers(app_module, 5), ANSWERS)
+    assert spool_writes == [len(ANSWERS)]
+    assert len(buffer.pending_for(5)) == len(ANSWERS)
+    buffer.close()
@@ -0,0 +1,46 @@
+"""
+Tests for the Czech text normalization shared by the local answer evaluators.
+"""
+
+import re
+
+from text_normalize import answer_tokens, common_words, normalize_text, tokens, words
+
+
+def _regex_normalize(text):
+    """The evaluator's former normalization, with the full Czech and Slovak diacritics"""
+    text = text.lower()
+    for czech, ascii_char in zip('áäčďéěíĺľňóôŕřšťúůýž', 'aacdeeillnoorrstuuyz'):
+        text = text.replace(czech, ascii_char)
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text)).strip()
+
+
+def test_folds_case_diacritics_and_punctuation():
+    assert words('Příliš ŽLUŤOUČKÝ kůň úpěl ďábelské ódy.') == \
+        ['prilis', 'zlutoucky', 'kun', 'upel', 'dabelske', 'ody']
+    assert words('Ľadový vietor, štvorka „ôsmich“ – päť!') == ['ladovy', 'vietor', 'stvorka', 'osmich', 'pat']
+    assert normalize_text('  ČSN 34 2600 ed. 2\t(návěstidlo)\n') == 'csn 34 2600 ed 2 navestidlo'
+    assert words('') == [] and words(None) == [] and normalize_text('') == ''
+
+
+def test_matches_the_regex_normalization_outside_cp1250():
+    texts = [
+        'Napětí U ≤ 50 V → bezpečné',  # math and arrows: not in cp1250
+        'Греческое α и кириллица Ж; snake_case',
+        'Emoji 🚆 a ěščř',  # above the table: lower() still applies
+        'Zcela obyčejná věta, s čárkou a tečkou.',
+    ]
+    for text in texts:
+        assert normalize_text(text) == _regex_normalize(text), text
+
+
+def test_answer_tokens_are_cached_and_common_words_skip_duplicates():
+    answer_tokens.cache_clear()
+    correct = 'Návěstidlo dovoluje jízdu; návěstidlo zakazuje posun.'
+    assert answer_tokens(correct) == tokens(correct) == {'navestidlo', 'dovoluje', 'jizdu', 'zakazuje', 'posun'}
+    assert answer_tokens(correct) is answer_tokens(correct)
+    assert answer_tokens.cache_info().hits >= 1
+
+    assert common_words(correct, 'NÁVĚSTIDLO, návěstidlo a jízdu') == {'navestidlo', 'jizdu'}
+    assert common_words(correct, '') == frozenset()
+    assert common_words(None, 'jízdu') == frozenset()
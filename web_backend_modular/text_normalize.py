@@ -0,0 +1,95 @@
+"""
+Czech text normalization for the local answer evaluators.
+
+Answers are compared word by word after folding case and diacritics and
+dropping punctuation, all in one translate pass over a mapping built once at
+import: letters map to their lower case, every Czech and Slovak letter with
+a diacritic to its ASCII letter, and every character that is neither a word
+character nor whitespace (what the regex [^\\w\\s] matches) to a space, so
+split() yields the words.
+
+Most answers fit the Central European Windows code page (cp1250 has every
+Czech and Slovak letter and the typographic quotes and dashes): they are
+encoded to it and folded by bytes.translate over a 256-byte table, about
+twice as fast as str.translate. Other text goes through the full table, a
+tuple indexed by code point (much faster for translate than a dict) covering
+code points below U+3000: Latin, Greek, Cyrillic, punctuation, math symbols
+and arrows. Characters above it (emoji, CJK) are left to lower() and a
+precompiled regex, both skipped when translate leaves an all-ASCII string.
+
+The correct answers are the same few thousand texts over and over, so their
+word sets are cached (answer_tokens); only the user's answer is normalized
+per request.
+"""
+
+import re
+from functools import lru_cache
+from typing import FrozenSet, List
+
+_DIACRITICS = {
+    'á': 'a', 'ä': 'a', 'č': 'c', 'ď': 'd', 'é': 'e', 'ě': 'e', 'í': 'i', 'ĺ': 'l', 'ľ': 'l',
+    'ň': 'n', 'ó': 'o', 'ô': 'o', 'ŕ': 'r', 'ř': 'r', 'š': 's', 'ť': 't', 'ú': 'u', 'ů': 'u',
+    'ý': 'y', 'ž': 'z',
+}
+_TABLE_SIZE = 0x3000  # up to CJK
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+
+
+def _build_table():
+    table = [(char.lower() if len(char.lower()) == 1 else char) if char.isalnum() or char == '_' or char.isspace()
+             else ' ' for char in map(chr, range(_TABLE_SIZE))]
+    for czech, ascii_char in _DIACRITICS.items():
+        table[ord(czech)] = table[ord(czech.upper())] = ascii_char
+    return tuple(table)
+
+
+_TABLE = _build_table()
+
+
+def _build_cp1250_table():
+    table = bytearray(b' ' * 256)  # bytes cp1250 leaves undefined never come out of encode()
+    for byte in range(256):
+        try:
+            table[byte] = _TABLE[ord(bytes([byte]).decode('cp1250'))].encode('cp1250')[0]
+        except UnicodeDecodeError:
+            pass
+    return bytes(table)
+
+
+_CP1250_TABLE = _build_cp1250_table()
+
+
+def _fold(text: str) -> str:
+    try:
+        folded = text.encode('cp1250').translate(_CP1250_TABLE)
+    except UnicodeEncodeError:  # beyond Central European letters: the slower per-character table
+        folded = text.translate(_TABLE)
+        return folded if folded.isascii() else _PUNCTUATION.sub(' ', folded.lower())
+    return folded.decode('ascii') if folded.isascii() else folded.decode('cp1250')
+
+
+def words(text: str) -> List[str]:
+    """Lower-cased words of `text` without diacritics, punctuation treated as a separator"""
+    return _fold(text).split() if text else []
+
+
+def normalize_text(text: str) -> str:
+    """Normalized words of `text` joined by single spaces"""
+    return ' '.join(words(text))
+
+
+def tokens(text: str) -> FrozenSet[str]:
+    """Distinct normalized words of `text`"""
+    return frozenset(words(text))
+
+
+@lru_cache(maxsize=8192)
+def answer_tokens(text: str) -> FrozenSet[str]:
+    """tokens() of a correct answer, cached: the same answers are scored again and again"""
+    return tokens(text)
+
+
+def common_words(correct_answer: str, text: str) -> FrozenSet[str]:
+    """Words of the correct answer that also occur in `text` (no set is built for `text`)"""
+    correct_words = answer_tokens(correct_answer or '')
+    return correct_words.intersection(_fold(text).split()) if text and correct_words else frozenset()